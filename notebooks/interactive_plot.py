@@ -1,290 +1,354 @@
-import marimo
-
-__generated_with = "0.14.16"
-app = marimo.App(width="full")
-
-
-@app.cell
-def _():
-    import marimo as mo
-    import numpy as np
-    import os
-    from glob import glob
-
-    from modules.data_loader import load_data
-    from modules.plotting import plot_data
-    from modules.signal_processing import apply_lowpass_filter, apply_highpass_filter, apply_notch_filter, apply_moving_average,  apply_rms_envelope, apply_rectification, apply_resampling, apply_fft
-    return (
-        apply_fft,
-        apply_highpass_filter,
-        apply_lowpass_filter,
-        apply_moving_average,
-        apply_notch_filter,
-        apply_rectification,
-        apply_rms_envelope,
-        glob,
-        load_data,
-        mo,
-        np,
-        os,
-        plot_data,
-    )
-
-
-@app.cell
-def _(glob, mo, os):
-    # CSVファイル一覧を取得
-    csv_files = glob("data/15Subjects-7Gestures/*/*.csv")
-    csv_files.sort()
-    
-    # ファイル選択のための辞書を作成（表示名: パス）
-    file_options = {}
-    for file_path in csv_files:
-        # ファイル名のみを取得して表示用の名前を作成
-        basename = os.path.basename(file_path)
-        dirname = os.path.basename(os.path.dirname(file_path))
-        display_name = f"{dirname}/{basename}"
-        file_options[display_name] = file_path
-    
-    # デフォルトファイルを設定
-    default_display = "S0/emg-fistdwn-S0.csv"
-    if default_display not in file_options:
-        default_display = list(file_options.keys())[0]
-    
-    # ファイル選択ドロップダウン
-    file_selector = mo.ui.dropdown(
-        options=file_options,
-        value=default_display,
-        label="CSVファイルを選択",
-        searchable=True
-    )
-    
-    mo.vstack([
-        mo.md("### 📁 ファイル選択"),
-        file_selector
-    ])
-
-    return file_selector
-
-
-@app.cell
-def _(file_selector, load_data, mo, np, os):
-    SAMPLING_RATE = 200 
-
-    raw_data = load_data(file_selector.value)
-
-    if not raw_data.empty:
-        # 200Hzの時間軸を作成（0秒スタート）
-        time_interval = 1.0 / SAMPLING_RATE  # 0.005秒間隔
-        raw_data.index = np.arange(len(raw_data)) * time_interval
-        total_duration = raw_data.index[-1]
-
-        selected_file_name = os.path.basename(file_selector.value)
-        info_message = f"""
-        📊 **データ読み込み完了**
-        - 選択ファイル: {selected_file_name}
-        - サンプル数: {len(raw_data)}
-        - 総時間: {total_duration:.2f} 秒
-        - サンプリング周波数: {SAMPLING_RATE} Hz
-        - 時間間隔: {time_interval:.3f} 秒
-        """
-    else:
-        total_duration = 0.0
-        info_message = "❌ データの読み込みに失敗しました"
-
-    mo.md(info_message)
-
-    return SAMPLING_RATE, raw_data, total_duration
-
-
-@app.cell
-def _(mo, total_duration):
-    # UIコンポーネントの定義
-    # 信号処理のパラメータ
-    # ローパスフィルタ
-    lowpass_cutoff_input = mo.ui.slider(1.0, 100.0, step=0.1, value=5.0, label="ローパスフィルタのカットオフ周波数 [Hz]")
-    # ハイパスフィルタ
-    highpass_cutoff_input = mo.ui.slider(1.0, 100.0, step=0.1, value=5.0, label="ハイパスフィルタのカットオフ周波数 [Hz]")
-    # ノッチフィルタ
-    notch_freq_input = mo.ui.number(1.0, 100.0, step=0.1, value = 50.0, label="ノッチフィルタの周波数 [Hz]")
-    # 移動平均
-    window_slider = mo.ui.slider(1, 101, step=2, value=21, label="移動平均の窓長")
-    # RMSエンベロープ
-    rms_window_slider = mo.ui.slider(1, 200, step=1, value=40.0, label="RNSエンベロープの窓長さ")
-    # 時間範囲選択
-    time_range_slider = mo.ui.range_slider(start=0,
-                                           stop=total_duration,
-                                           step=0.1,
-                                           value=(0, min(5.0, total_duration)),
-                                           label=f"表示範囲(秒) -:{total_duration:.2f}s"
-                                          )
-
-    # フィルタ選択
-    filter_selection = mo.ui.multiselect(
-        options=["ローパスフィルタ", 
-                 "ハイパスフィルタ",
-                 "ノッチフィルタ",
-                 "移動平均",
-                 "全波整流",
-                 "半波整流",
-                 "RMSエンベロープ"
-                ],
-        value=["ローパスフィルタ"],
-        label="適用するフィルタを選択"
-    )
-
-    mo.vstack([
-        mo.md("### 🎛️ フィルタ設定"),
-        filter_selection,
-        lowpass_cutoff_input,
-        highpass_cutoff_input,
-        notch_freq_input,
-        window_slider,
-        rms_window_slider,
-        time_range_slider
-    ])
-
-    return (
-        filter_selection,
-        highpass_cutoff_input,
-        lowpass_cutoff_input,
-        notch_freq_input,
-        rms_window_slider,
-        time_range_slider,
-        window_slider,
-    )
-
-
-@app.cell
-def _(
-    SAMPLING_RATE,
-    apply_fft,
-    apply_highpass_filter,
-    apply_lowpass_filter,
-    apply_moving_average,
-    apply_notch_filter,
-    apply_rectification,
-    apply_rms_envelope,
-    filter_selection,
-    highpass_cutoff_input,
-    lowpass_cutoff_input,
-    mo,
-    notch_freq_input,
-    plot_data,
-    raw_data,
-    rms_window_slider,
-    time_range_slider,
-    window_slider,
-):
-    if raw_data.empty:
-        result = mo.md("❌ データがありません")
-    else:
-        # フィルタ処理
-        processed_data = raw_data.copy()
-
-        # 選択されたフィルタを順番に適用
-        if "ローパスフィルタ" in filter_selection.value:
-            processed_data = apply_lowpass_filter(
-                processed_data,
-                cutoff=lowpass_cutoff_input.value,
-                fs=SAMPLING_RATE
-            )
-        if "ハイパスフィルタ" in filter_selection.value:
-            processed_data = apply_highpass_filter(
-                processed_data,
-                cutoff=highpass_cutoff_input.value,
-                fs=SAMPLING_RATE
-            )
-        if "ノッチフィルタ" in filter_selection.value:
-            processed_data = apply_notch_filter(
-                processed_data,
-                fs=SAMPLING_RATE,
-                notch_freq=notch_freq_input.value,
-                quality=30
-            )
-        if "移動平均" in filter_selection.value:
-            processed_data = apply_moving_average(
-                processed_data,
-                window_slider.value
-            )
-        if "全波整流" in filter_selection.value:
-            processed_data = apply_rectification(
-                processed_data,
-                method="full"
-            )
-        if "半波整流" in filter_selection.value:
-            processed_data = apply_rectification(
-                processed_data,
-                method="half"
-            )
-        if "RMSエンベロープ" in filter_selection.value:
-            processed_data = apply_rms_envelope(
-                processed_data,
-                window_size=int(rms_window_slider.value)
-            )
-
-        # 時間範囲でスライス
-        start_time, end_time = time_range_slider.value
-        time_mask = (processed_data.index >= start_time) & (processed_data.index <= end_time)
-        sliced_data = processed_data[time_mask]
-
-        # デバッグ情報
-        info_text = f"""
-        📈 **処理情報**
-        - 適用フィルタ: {', '.join(filter_selection.value) if filter_selection.value else 'なし'}
-        - 表示時間範囲: {start_time:.2f}s - {end_time:.2f}s
-        - 表示データ点数: {len(sliced_data)} / {len(processed_data)}
-        """    
-
-        # プロット作成
-        if not sliced_data.empty:
-            # 時間領域のプロット
-            time_domain_fig = plot_data(
-                sliced_data,
-                title=f"時間領域: EMG信号 ({start_time:.2f}s - {end_time:.2f}s)"
-            )
-
-            # 周波数領域のプロット(FFT)
-            fft_data = apply_fft(sliced_data, fs=SAMPLING_RATE, return_magnitude=True)
-
-            # 周波数軸のラベルを更新
-            freq_domain_fig = plot_data(
-                fft_data,
-                title=f"周波数領域: FFT振幅スペクトル ({start_time:.2f}s - {end_time:.2f}s)"
-            )
-
-            # X軸のラベルを周波数に変更
-            freq_domain_fig.update_layout(
-                xaxis_title = '周波数 [Hz]',
-                yaxis_title = '振幅'
-            )
-
-            # 両方のプロットを縦に並べて表示
-            result_time_domain = mo.vstack([
-                mo.md("### 🕒 時間領域"),
-                mo.ui.plotly(time_domain_fig),
-            ])
-
-            result_freq_domain = mo.vstack([
-                mo.md("### 📊 周波数領域"),
-                mo.ui.plotly(freq_domain_fig)
-            ])
-
-            figures = mo.hstack([result_time_domain, result_freq_domain])
-
-            result = mo.vstack([
-                mo.md(info_text),
-                figures
-            ])
-        else:
-            result = mo.vstack([
-                mo.md(info_text),
-                mo.md("⚠️ 指定した時間範囲にデータがありません")
-            ])
-    result
-
-    return
-
-
-if __name__ == "__main__":
-    app.run()
+import marimo
+
+__generated_with = "0.14.16"
+app = marimo.App(width="full")
+
+
+@app.cell
+def _():
+    import marimo as mo
+    import os
+    from glob import glob
+
+    from modules.data_loader import load_data
+    from modules.plotting import plot_data
+    from modules.profiling import profiler
+    from modules.recording import Recording
+    from modules.signal_processing import Pipeline, StageCache, apply_fft, apply_welch
+    return (
+        Pipeline,
+        Recording,
+        StageCache,
+        apply_fft,
+        apply_welch,
+        glob,
+        load_data,
+        mo,
+        os,
+        plot_data,
+        profiler,
+    )
+
+
+@app.cell
+def _(StageCache):
+    # パイプラインの各ステージの出力をキャッシュし，変更されたステージより下流だけを再計算する
+    stage_cache = StageCache(maxsize=32)
+
+    # 描画した図を保持し，次回の描画ではデータだけを差し替えて再利用する
+    figure_store = {}
+    return figure_store, stage_cache
+
+
+@app.cell
+def _(glob, mo, os):
+    # CSVファイル一覧を取得
+    csv_files = glob("data/15Subjects-7Gestures/*/*.csv")
+    csv_files.sort()
+    
+    # ファイル選択のための辞書を作成（表示名: パス）
+    file_options = {}
+    for file_path in csv_files:
+        # ファイル名のみを取得して表示用の名前を作成
+        basename = os.path.basename(file_path)
+        dirname = os.path.basename(os.path.dirname(file_path))
+        display_name = f"{dirname}/{basename}"
+        file_options[display_name] = file_path
+    
+    # デフォルトファイルを設定
+    default_display = "S0/emg-fistdwn-S0.csv"
+    if default_display not in file_options:
+        default_display = list(file_options.keys())[0]
+    
+    # ファイル選択ドロップダウン
+    file_selector = mo.ui.dropdown(
+        options=file_options,
+        value=default_display,
+        label="CSVファイルを選択",
+        searchable=True
+    )
+    
+    mo.vstack([
+        mo.md("### 📁 ファイル選択"),
+        file_selector
+    ])
+
+    return file_selector
+
+
+@app.cell
+def _(file_selector, load_data, mo, os):
+    SAMPLING_RATE = 200 
+
+    # パケットのタイムスタンプから再構成した経過時間 [s]（0秒スタート）をインデックスとして読み込む
+    raw_data = load_data(file_selector.value, time_axis="seconds")
+
+    if not raw_data.empty:
+        time_interval = 1.0 / SAMPLING_RATE  # 0.005秒間隔
+        total_duration = raw_data.index[-1]
+        estimated_fs = raw_data.attrs["fs"]
+        n_gaps = len(raw_data.attrs["gaps"])
+
+        selected_file_name = os.path.basename(file_selector.value)
+        info_message = f"""
+        📊 **データ読み込み完了**
+        - 選択ファイル: {selected_file_name}
+        - サンプル数: {len(raw_data)}
+        - 総時間: {total_duration:.2f} 秒
+        - サンプリング周波数: {SAMPLING_RATE} Hz (タイムスタンプからの推定値: {estimated_fs:.1f} Hz)
+        - 時間間隔: {time_interval:.3f} 秒
+        - 欠損区間: {n_gaps} 件
+        """
+    else:
+        total_duration = 0.0
+        info_message = "❌ データの読み込みに失敗しました"
+
+    mo.md(info_message)
+
+    return SAMPLING_RATE, raw_data, total_duration
+
+
+@app.cell
+def _(mo, profiler, total_duration):
+    # UIコンポーネントの定義
+    # 信号処理のパラメータ
+    # ローパスフィルタ
+    lowpass_cutoff_input = mo.ui.slider(1.0, 100.0, step=0.1, value=5.0, label="ローパスフィルタのカットオフ周波数 [Hz]")
+    # ハイパスフィルタ
+    highpass_cutoff_input = mo.ui.slider(1.0, 100.0, step=0.1, value=5.0, label="ハイパスフィルタのカットオフ周波数 [Hz]")
+    # ノッチフィルタ
+    notch_freq_input = mo.ui.number(1.0, 100.0, step=0.1, value = 50.0, label="ノッチフィルタの周波数 [Hz]")
+    # 移動平均
+    window_slider = mo.ui.slider(1, 101, step=2, value=21, label="移動平均の窓長")
+    # RMSエンベロープ
+    rms_window_slider = mo.ui.slider(1, 200, step=1, value=40.0, label="RNSエンベロープの窓長さ")
+    # 時間範囲選択 (細部を見るときはグラフのズームではなくこのスライダーで範囲を狭めると，その範囲で間引き直される)
+    time_range_slider = mo.ui.range_slider(start=0,
+                                           stop=total_duration,
+                                           step=0.1,
+                                           value=(0, min(5.0, total_duration)),
+                                           label=f"表示範囲(秒) -:{total_duration:.2f}s"
+                                          )
+
+    # フィルタ選択
+    filter_selection = mo.ui.multiselect(
+        options=["ローパスフィルタ", 
+                 "ハイパスフィルタ",
+                 "ノッチフィルタ",
+                 "移動平均",
+                 "全波整流",
+                 "半波整流",
+                 "RMSエンベロープ"
+                ],
+        value=["ローパスフィルタ"],
+        label="適用するフィルタを選択"
+    )
+
+    # 周波数領域の表示方法
+    spectrum_method = mo.ui.dropdown(
+        options=["FFT振幅スペクトル", "Welch法パワースペクトル密度"],
+        value="FFT振幅スペクトル",
+        label="周波数領域の表示方法"
+    )
+
+    # 処理時間の計測 (環境変数 BIOSIGNAL_PROFILE=1 で起動した場合は最初から有効)
+    profile_switch = mo.ui.switch(value=profiler.enabled, label="処理時間の内訳を計測する")
+    # 確保メモリ量の計測はtracemallocで全体が遅くなるため，別のスイッチで明示した場合だけ行う
+    # (環境変数 BIOSIGNAL_PROFILE_MEMORY=1 で起動した場合は最初から有効)
+    profile_memory_switch = mo.ui.switch(value=profiler.trace_memory, label="確保メモリ量も計測する (遅くなります)")
+
+    mo.vstack([
+        mo.md("### 🎛️ フィルタ設定"),
+        filter_selection,
+        lowpass_cutoff_input,
+        highpass_cutoff_input,
+        notch_freq_input,
+        window_slider,
+        rms_window_slider,
+        time_range_slider,
+        spectrum_method,
+        profile_switch,
+        profile_memory_switch
+    ])
+
+    return (
+        filter_selection,
+        highpass_cutoff_input,
+        lowpass_cutoff_input,
+        notch_freq_input,
+        profile_memory_switch,
+        profile_switch,
+        rms_window_slider,
+        spectrum_method,
+        time_range_slider,
+        window_slider,
+    )
+
+
+@app.cell
+def _(
+    Pipeline,
+    Recording,
+    SAMPLING_RATE,
+    apply_fft,
+    apply_welch,
+    figure_store,
+    file_selector,
+    filter_selection,
+    highpass_cutoff_input,
+    lowpass_cutoff_input,
+    mo,
+    notch_freq_input,
+    plot_data,
+    profile_memory_switch,
+    profile_switch,
+    profiler,
+    raw_data,
+    rms_window_slider,
+    spectrum_method,
+    stage_cache,
+    time_range_slider,
+    window_slider,
+):
+    # 処理時間の計測の切り替え (確保メモリ量はメモリのスイッチも入っている場合だけ計測する)
+    trace_memory = profile_switch.value and profile_memory_switch.value
+    if profile_switch.value and (not profiler.enabled or profiler.trace_memory != trace_memory):
+        if profiler.enabled:
+            profiler.disable()
+        profiler.enable(trace_memory=trace_memory)
+    elif not profile_switch.value and profiler.enabled:
+        profiler.disable()
+
+    # この操作で呼ばれた処理の記録だけを集める
+    with profiler.capture() as profile_records:
+        if raw_data.empty:
+            result = mo.md("❌ データがありません")
+        else:
+            # フィルタ処理
+            # 選択されたフィルタを順番にパイプラインへ追加し，まとめて適用する
+            pipeline = Pipeline(fs=SAMPLING_RATE)
+            if "ローパスフィルタ" in filter_selection.value:
+                pipeline.add_lowpass(cutoff=lowpass_cutoff_input.value)
+            if "ハイパスフィルタ" in filter_selection.value:
+                pipeline.add_highpass(cutoff=highpass_cutoff_input.value)
+            if "ノッチフィルタ" in filter_selection.value:
+                pipeline.add_notch(notch_freq=notch_freq_input.value, quality=30)
+            if "移動平均" in filter_selection.value:
+                pipeline.add_moving_average(window_slider.value)
+            if "全波整流" in filter_selection.value:
+                pipeline.add_rectification(method="full")
+            if "半波整流" in filter_selection.value:
+                pipeline.add_rectification(method="half")
+            if "RMSエンベロープ" in filter_selection.value:
+                pipeline.add_rms_envelope(window_size=int(rms_window_slider.value))
+
+            # 記録とパラメータが同じステージはキャッシュから返される(表示範囲の変更では再計算されない)
+            recording = Recording.from_frame(raw_data, fs=SAMPLING_RATE)
+            processed = pipeline.run(recording, cache=stage_cache, recording_id=file_selector.value)
+
+            # 時間範囲でスライス
+            # 二分探索で範囲の両端を求め，コピーせずにビューとして切り出す(全長のマスクを作らない)
+            start_time, end_time = time_range_slider.value
+            with profiler.section("Recording.between", processed):
+                sliced_data = processed.between(start_time, end_time).to_frame()
+
+            # デバッグ情報
+            info_text = f"""
+            📈 **処理情報**
+            - 適用フィルタ: {', '.join(filter_selection.value) if filter_selection.value else 'なし'}
+            - 表示時間範囲: {start_time:.2f}s - {end_time:.2f}s
+            - 表示データ点数: {len(sliced_data)} / {len(processed)}
+            - ステージキャッシュ: 再開 {stage_cache.hits} 回 / 再計算したステージ {stage_cache.misses} 個
+            """    
+
+            # プロット作成
+            if not sliced_data.empty:
+                # 時間領域のプロット
+                # 各トレースをピークを残して画面幅程度の点数に間引く．
+                # 間引き直されるのは表示範囲のスライダーを動かしたときだけで，グラフ上のズームでは間引き直されない
+                # (mo.ui.plotlyはズームした範囲をPython側に返さないため)
+                time_domain_fig = plot_data(
+                    sliced_data,
+                    title=f"時間領域: EMG信号 ({start_time:.2f}s - {end_time:.2f}s)",
+                    max_points=2000,
+                    webgl=True,
+                    fig=figure_store.get("time_domain")
+                )
+                figure_store["time_domain"] = time_domain_fig
+
+                # 周波数領域のプロット(FFTまたはWelch法)
+                if spectrum_method.value == "Welch法パワースペクトル密度":
+                    freq_data = apply_welch(sliced_data, fs=SAMPLING_RATE)
+                    freq_y_title = 'パワースペクトル密度'
+                else:
+                    freq_data = apply_fft(sliced_data, fs=SAMPLING_RATE, return_magnitude=True)
+                    freq_y_title = '振幅'
+
+                # 周波数軸のラベルを更新
+                freq_domain_fig = plot_data(
+                    freq_data,
+                    title=f"周波数領域: {spectrum_method.value} ({start_time:.2f}s - {end_time:.2f}s)",
+                    webgl=True,
+                    fig=figure_store.get("freq_domain")
+                )
+                figure_store["freq_domain"] = freq_domain_fig
+
+                # X軸のラベルを周波数に変更
+                freq_domain_fig.update_layout(
+                    xaxis_title = '周波数 [Hz]',
+                    yaxis_title = freq_y_title
+                )
+
+                # 両方のプロットを縦に並べて表示(図のシリアライズ時間も計測する)
+                with profiler.section("mo.ui.plotly"):
+                    time_domain_plot = mo.ui.plotly(time_domain_fig)
+                    freq_domain_plot = mo.ui.plotly(freq_domain_fig)
+
+                result_time_domain = mo.vstack([
+                    mo.md("### 🕒 時間領域"),
+                    time_domain_plot,
+                ])
+
+                result_freq_domain = mo.vstack([
+                    mo.md("### 📊 周波数領域"),
+                    freq_domain_plot
+                ])
+
+                figures = mo.hstack([result_time_domain, result_freq_domain])
+
+                result = mo.vstack([
+                    mo.md(info_text),
+                    figures
+                ])
+            else:
+                result = mo.vstack([
+                    mo.md(info_text),
+                    mo.md("⚠️ 指定した時間範囲にデータがありません")
+                ])
+
+    # 処理時間の内訳(折りたたみ表示)
+    if profile_switch.value and profile_records:
+        profile_table = profiler.to_frame(profile_records)
+        profile_table["ms"] = (profile_table["seconds"] * 1000).round(2)
+        profile_table["input_kB"] = (profile_table["input_bytes"] / 1024).round(1)
+        profile_columns = ["name", "ms", "input_kB", "input_shape", "output_shape"]
+        if trace_memory:
+            profile_table["allocated_kB"] = (profile_table["allocated_bytes"] / 1024).round(1)
+            profile_columns.append("allocated_kB")
+        total_ms = profile_table.loc[profile_table["depth"] == 0, "ms"].sum()
+        result = mo.vstack([
+            result,
+            mo.accordion({
+                f"⏱️ 処理時間の内訳 (合計 {total_ms:.1f} ms)": mo.ui.table(
+                    profile_table[profile_columns],
+                    selection=None
+                )
+            })
+        ])
+    result
+
+    return
+
+
+if __name__ == "__main__":
+    app.run()
@@ -0,0 +1,131 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .data_loader import load_cached_arrays, read_frame
+from .signal_processing import Pipeline
+
+"""
+このファイルには複数の記録をまとめて処理するバッチ処理のプログラムを書きます．
+全記録のサンプルを1つの共有メモリ上の配列に並べ，各ワーカープロセスは担当する記録の範囲だけを
+その場で処理して出力用の共有メモリに書き込みます．データフレームをpickleしてプロセス間で送らないため，
+コア数に対してほぼ線形にスケールします．
+"""
+
+
+class BatchResult(NamedTuple):
+    """バッチ処理の結果"""
+    outputs: list[np.ndarray]  # 記録ごとの処理後の配列 (サンプル数 × チャンネル数)
+    timings: pd.DataFrame      # 記録ごとの処理時間 (列: path, n_samples, load_seconds, process_seconds)
+
+
+# ワーカープロセスごとに1度だけ設定される共有メモリと処理内容
+_worker_state: dict = {}
+
+
+def _init_worker(input_name: str, output_name: str, shape: tuple[int, int], pipeline: Pipeline) -> None:
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    _worker_state["shm"] = (input_shm, output_shm)
+    _worker_state["input"] = np.ndarray(shape, dtype=pipeline.dtype, buffer=input_shm.buf)
+    _worker_state["output"] = np.ndarray(shape, dtype=pipeline.dtype, buffer=output_shm.buf)
+    _worker_state["pipeline"] = pipeline
+
+
+def _process_range(task: tuple[int, int, int]) -> tuple[int, float]:
+    """共有メモリ上の [start, stop) の範囲を処理し，(記録番号, 処理時間) を返す"""
+    i, start, stop = task
+    t0 = time.perf_counter()
+    pipeline = _worker_state["pipeline"]
+    _worker_state["output"][start:stop] = pipeline.process(_worker_state["input"][start:stop])
+    return i, time.perf_counter() - t0
+
+
+def _load_values(path: str, use_cache: bool) -> np.ndarray:
+    """記録のサンプル配列だけを読み込む (キャッシュがあればメモリマップを使う)"""
+    cached = load_cached_arrays(path) if use_cache else None
+    if cached is not None:
+        return cached[1]
+    df = read_frame(path, use_cache=False)
+    return df.select_dtypes(include=[np.number]).to_numpy()
+
+
+def process_batch(paths: list[str], pipeline: Pipeline, n_workers: int | None = None,
+                  use_cache: bool = True) -> BatchResult:
+    """
+    複数の記録にパイプラインを適用し，CPUコアに分散して処理する．
+
+    :param paths: 処理するCSVファイルのパスのリスト
+    :param pipeline: 適用するパイプライン
+    :param n_workers: ワーカープロセス数．Noneの場合はCPUコア数
+    :param use_cache: Trueの場合，最新のバイナリキャッシュがあればそれを使う
+    :return: 記録ごとの処理結果と処理時間
+    """
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, len(paths)))
+
+    # --- 全記録を読み込み，1つの配列上の位置を決める ---
+    arrays = []
+    load_seconds = []
+    for path in paths:
+        t0 = time.perf_counter()
+        arrays.append(_load_values(path, use_cache))
+        load_seconds.append(time.perf_counter() - t0)
+
+    n_channels = {a.shape[1] for a in arrays}
+    if len(n_channels) > 1:
+        raise ValueError("全ての記録のチャンネル数が同じである必要があります．")
+
+    lengths = np.array([len(a) for a in arrays], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    total = int(offsets[-1])
+    shape = (total, n_channels.pop() if arrays else 0)
+
+    process_seconds = [0.0] * len(paths)
+    outputs = []
+
+    if n_workers == 1 or total == 0:
+        for i, values in enumerate(arrays):
+            t0 = time.perf_counter()
+            outputs.append(pipeline.process(values))
+            process_seconds[i] = time.perf_counter() - t0
+    else:
+        # 共有メモリはパイプラインの演算精度の型で確保する(float32の場合は半分になる)
+        nbytes = max(1, total * shape[1] * np.dtype(pipeline.dtype).itemsize)
+        input_shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        output_shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        try:
+            input_values = np.ndarray(shape, dtype=pipeline.dtype, buffer=input_shm.buf)
+            output_values = np.ndarray(shape, dtype=pipeline.dtype, buffer=output_shm.buf)
+            for i, values in enumerate(arrays):
+                input_values[offsets[i]:offsets[i + 1]] = values
+
+            # 長い記録から先に割り当てて負荷を均等にする
+            order = np.argsort(-lengths, kind="stable")
+            tasks = [(int(i), int(offsets[i]), int(offsets[i + 1])) for i in order]
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                     initargs=(input_shm.name, output_shm.name, shape, pipeline)) as executor:
+                for i, seconds in executor.map(_process_range, tasks):
+                    process_seconds[i] = seconds
+
+            outputs = [output_values[offsets[i]:offsets[i + 1]].copy() for i in range(len(paths))]
+            del input_values, output_values
+        finally:
+            input_shm.close()
+            input_shm.unlink()
+            output_shm.close()
+            output_shm.unlink()
+
+    timings = pd.DataFrame({
+        "path": list(paths),
+        "n_samples": lengths,
+        "load_seconds": load_seconds,
+        "process_seconds": process_seconds,
+    })
+    return BatchResult(outputs=outputs, timings=timings)
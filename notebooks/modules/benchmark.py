@@ -0,0 +1,277 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import plotly
+import scipy
+
+from .data_loader import build_binary_cache, build_corpus_index, load_cached_arrays, load_data
+from .plotting import plot_data
+from .signal_processing import (
+    apply_fft,
+    apply_highpass_filter,
+    apply_lowpass_filter,
+    apply_moving_average,
+    apply_notch_filter,
+    apply_rectification,
+    apply_resampling,
+    apply_rms_envelope,
+    apply_spectrogram,
+    apply_welch,
+)
+
+"""
+このファイルには信号処理・データ読み込み・描画の処理時間を測るベンチマークを書きます．
+データセットの実際の記録と，長さ・サンプリング周波数・チャンネル数を変えた合成信号について
+各関数の処理時間を測り，コミット間で比較できるようにJSONファイルに書き出します．
+
+使い方 (notebooksディレクトリで実行):
+    python -m modules.benchmark --quick
+    python -m modules.benchmark --output benchmark_results/new.json --compare benchmark_results/base.json
+"""
+
+# 合成信号の条件 (長さ [s], サンプリング周波数 [Hz], チャンネル数)．
+# 長さ・サンプリング周波数・チャンネル数をそれぞれ1つずつ変え，各処理のスケーリングを見られるようにする
+SYNTHETIC_CASES = [
+    (60, 200, 8), (600, 200, 8), (3600, 200, 8),
+    (60, 1000, 8), (60, 2000, 8), (3600, 2000, 8),
+    (60, 1000, 1), (60, 1000, 16), (60, 1000, 64),
+]
+QUICK_SYNTHETIC_CASES = [(60, 200, 8), (60, 2000, 8), (60, 1000, 64)]
+
+# 描画の間引き点数 (インタラクティブアプリと同じ)
+PLOT_MAX_POINTS = 2000
+
+
+def synthetic_emg(duration: float, fs: float, n_channels: int, seed: int = 0) -> pd.DataFrame:
+    """
+    ベンチマーク用の合成EMG信号を作る．ガウス雑音を数秒周期の包絡線で変調し，データセットと同じく整数に丸める．
+
+    :param duration: 信号の長さ [s]
+    :param fs: サンプリング周波数 [Hz]
+    :param n_channels: チャンネル数 [-]
+    :param seed: 乱数のシード [-]
+    :return: 経過時間 [s] をインデックスとするデータフレーム (列: emg1, emg2, ...)
+    """
+    rng = np.random.default_rng(seed)
+    n_samples = int(duration * fs)
+    t = np.arange(n_samples) / fs
+    envelope = 5 + 30 * np.abs(np.sin(2 * np.pi * t / 4))[:, np.newaxis]
+    values = np.clip(np.round(rng.standard_normal((n_samples, n_channels)) * envelope), -128, 127)
+    return pd.DataFrame(values.astype(np.int64), index=pd.Index(t, name="time"),
+                        columns=[f"emg{i + 1}" for i in range(n_channels)])
+
+
+def time_call(func, *args, repeat: int = 5, **kwargs) -> dict:
+    """
+    関数を1回空実行してからrepeat回実行し，処理時間の統計を返す．
+
+    :param func: 計測する関数
+    :param repeat: 計測の回数 [-]
+    :return: min_seconds, median_seconds, mean_seconds, repeat を持つ辞書
+    """
+    func(*args, **kwargs)
+    seconds = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(*args, **kwargs)
+        seconds.append(time.perf_counter() - t0)
+    return {
+        "min_seconds": float(np.min(seconds)),
+        "median_seconds": float(np.median(seconds)),
+        "mean_seconds": float(np.mean(seconds)),
+        "repeat": repeat,
+    }
+
+
+def _quiet_load_data(filepath: str, use_cache: bool, cache_dir: str | None = None) -> pd.DataFrame:
+    # load_dataの読み込みメッセージを計測ごとに出さない
+    with contextlib.redirect_stdout(io.StringIO()):
+        return load_data(filepath, use_cache=use_cache, cache_dir=cache_dir)
+
+
+def _processing_cases(fs: float) -> dict:
+    """サンプリング周波数fsの信号に対して計測する処理 (名前 → データを受け取る関数)"""
+    return {
+        "apply_lowpass_filter": lambda df: apply_lowpass_filter(df, cutoff=0.1 * fs, fs=fs),
+        "apply_highpass_filter": lambda df: apply_highpass_filter(df, cutoff=0.1 * fs, fs=fs),
+        "apply_notch_filter": lambda df: apply_notch_filter(df, notch_freq=50.0, fs=fs),
+        "apply_moving_average": lambda df: apply_moving_average(df, window_size=int(0.1 * fs)),
+        "apply_rectification": lambda df: apply_rectification(df, method="full"),
+        "apply_rms_envelope": lambda df: apply_rms_envelope(df, window_size=int(0.2 * fs)),
+        "apply_resampling_fft": lambda df: apply_resampling(df, fs, fs / 2, method="fft"),
+        "apply_resampling_polyphase": lambda df: apply_resampling(df, fs, fs / 2, method="polyphase"),
+        "apply_fft": lambda df: apply_fft(df, fs=fs),
+        "apply_welch": lambda df: apply_welch(df, fs=fs),
+        "apply_spectrogram": lambda df: apply_spectrogram(df, fs=fs),
+        "plot_data": lambda df: plot_data(df, max_points=PLOT_MAX_POINTS, webgl=True),
+    }
+
+
+def _record(name: str, case: str, df: pd.DataFrame, fs: float, timing: dict) -> dict:
+    n_samples, n_channels = df.shape
+    return {
+        "name": name,
+        "case": case,
+        "n_samples": n_samples,
+        "n_channels": n_channels,
+        "fs": fs,
+        "duration_seconds": n_samples / fs,
+        **timing,
+        "samples_per_second": n_samples * n_channels / timing["min_seconds"] if timing["min_seconds"] > 0 else None,
+    }
+
+
+def _environment() -> dict:
+    """結果と一緒に保存する実行環境の情報"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "pandas": pd.__version__,
+        "plotly": plotly.__version__,
+    }
+
+
+def run_benchmarks(data_dir: str = "data/15Subjects-7Gestures", n_recordings: int = 3, quick: bool = False,
+                   repeat: int = 5, fs: float = 200.0, build_cache: bool = True,
+                   cache_dir: str | None = None) -> dict:
+    """
+    実際の記録と合成信号について各処理の時間を計測する．
+    load_data_cacheはバイナリキャッシュから読み込む時間で，キャッシュがない記録では計測せず，
+    理由をskippedに残す (CSVの読み込み時間をキャッシュの結果として記録しないため)．
+
+    :param data_dir: データセットのルートディレクトリ
+    :param n_recordings: 計測に使う実際の記録の数 [-]
+    :param quick: Trueの場合，合成信号はQUICK_SYNTHETIC_CASESのみを使う
+    :param repeat: 各処理の計測回数 [-]
+    :param fs: 実際の記録のサンプリング周波数 [Hz]
+    :param build_cache: Trueの場合，バイナリキャッシュがない記録があれば計測の前にcache_dirへ作成する
+    :param cache_dir: バイナリキャッシュの保存先．省略時は，build_cacheがTrueなら一時ディレクトリに作成して
+                      計測後に削除し (データセットのディレクトリには書き込まない)，Falseなら記録の近くの既存の
+                      .npy_cache を使う
+    :return: {"environment": 実行環境, "results": 計測結果のリスト,
+              "skipped": 計測しなかった処理のリスト (name, case, reason)}
+    """
+    results = []
+    skipped = []
+
+    # --- 実際の記録 ---
+    paths = build_corpus_index(data_dir)["path"].head(n_recordings).tolist()
+    with contextlib.ExitStack() as stack:
+        if build_cache and cache_dir is None:
+            cache_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="benchmark_cache_",
+                                                                        ignore_cleanup_errors=True))
+        if build_cache and any(load_cached_arrays(path, cache_dir) is None for path in paths):
+            print(f"✅ キャッシュを作成しました: {build_binary_cache(data_dir, cache_dir)}")
+
+        for path in paths:
+            case = os.path.relpath(path, data_dir).replace(os.sep, "/")
+            df = _quiet_load_data(path, use_cache=False)
+            results.append(_record("load_data_csv", case, df, fs,
+                                   time_call(_quiet_load_data, path, use_cache=False, repeat=repeat)))
+            if load_cached_arrays(path, cache_dir) is not None:
+                results.append(_record("load_data_cache", case, df, fs,
+                                       time_call(_quiet_load_data, path, use_cache=True, cache_dir=cache_dir,
+                                                 repeat=repeat)))
+            else:
+                reason = "キャッシュを作成しない設定" if not build_cache else "int16で表せないためキャッシュがない"
+                skipped.append({"name": "load_data_cache", "case": case, "reason": reason})
+                print(f"⚠️ {case} はバイナリキャッシュがないため load_data_cache を計測しません ({reason})。")
+            results.append(_record("plot_data_full", case, df, fs,
+                                   time_call(plot_data, df, repeat=repeat)))
+            for name, func in _processing_cases(fs).items():
+                results.append(_record(name, case, df, fs, time_call(func, df, repeat=repeat)))
+            print(f"✅ {case} を計測しました。")
+
+    # --- 合成信号 ---
+    for duration, synthetic_fs, n_channels in (QUICK_SYNTHETIC_CASES if quick else SYNTHETIC_CASES):
+        case = f"synthetic_{duration}s_{synthetic_fs}Hz_{n_channels}ch"
+        df = synthetic_emg(duration, synthetic_fs, n_channels)
+        # 長い信号は計測回数を減らす
+        case_repeat = repeat if len(df) * n_channels <= 10_000_000 else 1
+        for name, func in _processing_cases(synthetic_fs).items():
+            results.append(_record(name, case, df, synthetic_fs, time_call(func, df, repeat=case_repeat)))
+        print(f"✅ {case} を計測しました。")
+
+    return {"environment": _environment(), "results": results, "skipped": skipped}
+
+
+def save_results(results: dict, output: str) -> str:
+    """
+    計測結果をJSONファイルに書き出す．
+
+    :param results: run_benchmarksの返り値
+    :param output: 出力ファイルのパス
+    :return: 出力ファイルのパス
+    """
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=1)
+    return output
+
+
+def compare_results(base_path: str, new_path: str, threshold: float = 1.2) -> pd.DataFrame:
+    """
+    2つの計測結果を比較し，処理時間の比 (new / base) を返す．
+
+    :param base_path: 基準となる結果のJSONファイル
+    :param new_path: 比較する結果のJSONファイル
+    :param threshold: この比を超えた処理を遅くなったとみなす [-]
+    :return: 列 name, case, base_seconds, new_seconds, ratio, regression を持つデータフレーム (比の大きい順)
+    """
+    frames = []
+    for path in [base_path, new_path]:
+        with open(path, encoding="utf-8") as f:
+            frames.append(pd.DataFrame(json.load(f)["results"])[["name", "case", "min_seconds"]])
+
+    merged = frames[0].merge(frames[1], on=["name", "case"], suffixes=("_base", "_new"))
+    merged = merged.rename(columns={"min_seconds_base": "base_seconds", "min_seconds_new": "new_seconds"})
+    merged["ratio"] = merged["new_seconds"] / merged["base_seconds"]
+    merged["regression"] = merged["ratio"] > threshold
+    return merged.sort_values("ratio", ascending=False, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="信号処理・データ読み込み・描画のベンチマーク")
+    parser.add_argument("--data-dir", default="../data/15Subjects-7Gestures")
+    parser.add_argument("--output", default=None, help="出力するJSONファイル (省略時は benchmark_results/<commit>.json)")
+    parser.add_argument("--n-recordings", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="合成信号の条件を減らして短時間で計測する")
+    parser.add_argument("--compare", default=None, help="比較する基準のJSONファイル")
+    parser.add_argument("--no-build-cache", action="store_true",
+                        help="バイナリキャッシュを作成しない (キャッシュがない記録のload_data_cacheは計測しない)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="バイナリキャッシュの保存先 (省略時は一時ディレクトリに作成し，計測後に削除する)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.data_dir, n_recordings=args.n_recordings, quick=args.quick, repeat=args.repeat,
+                             build_cache=not args.no_build_cache, cache_dir=args.cache_dir)
+    output = args.output or os.path.join("benchmark_results", f"{results['environment']['commit'] or 'latest'}.json")
+    print(f"✅ 計測結果を書き出しました: {save_results(results, output)}")
+
+    if args.compare is not None:
+        comparison = compare_results(args.compare, output)
+        print(comparison.to_string(index=False))
+        n_regressions = int(comparison["regression"].sum())
+        if n_regressions:
+            print(f"⚠️ {n_regressions} 件の処理が遅くなっています。")
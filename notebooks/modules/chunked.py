@@ -0,0 +1,162 @@
+import os
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+from scipy.signal import sosfilt
+
+from .data_loader import load_cached_arrays
+from .signal_processing import Pipeline
+
+"""
+このファイルにはメモリに収まらない長時間の記録を，ブロックごとに処理するプログラムを書きます．
+入力はメモリマップした .npy (バイナリキャッシュ) か，少しずつ読み込むCSVで，パイプラインを重なりのある
+ブロックに適用し，各ブロックの中央部分だけを .npy ファイルに順に書き込みます．
+重なりの長さはフィルタのインパルス応答の長さから決めるため，信号全体を一度に処理した結果と許容誤差内で一致します．
+"""
+
+# 1ブロックで処理するサンプル数 (重なりを除く) と，CSVを読み込む行数の既定値
+CHUNK_BLOCK_SIZE = 1_000_000
+CSV_CHUNK_ROWS = 200_000
+
+
+def impulse_response_length(sos: np.ndarray, tol: float = 1e-9, max_length: int = 2 ** 24) -> int:
+    """
+    IIRフィルタのインパルス応答が実質的に減衰するまでのサンプル数を求める．
+    応答の絶対値の総和に対して，それ以降の絶対値の和がtol以下になる最初のサンプル番号を返す．
+
+    :param sos: 2次セクション係数 [-]
+    :param tol: 許容する残りの応答の割合 [-]
+    :param max_length: 調べる最大のサンプル数 [-]
+    :return: インパルス応答の長さ [-]
+    """
+    sos = np.array(sos, dtype=np.float64)
+    n = 256
+    while True:
+        impulse = np.zeros(n)
+        impulse[0] = 1.0
+        magnitude = np.abs(sosfilt(sos, impulse))
+        # remaining[k] = sum(|h[k:]|)
+        remaining = np.cumsum(magnitude[::-1])[::-1]
+        below = np.flatnonzero(remaining <= tol * remaining[0])
+        # 後半で十分に減衰していれば，応答長をこの長さで評価できる
+        if below.size and below[0] < n // 2:
+            return int(below[0])
+        if n >= max_length:
+            raise ValueError("インパルス応答が max_length 以内に減衰しません．")
+        n *= 2
+
+
+def pipeline_overlap(pipeline: Pipeline, tol: float = 1e-9) -> int:
+    """
+    ブロックの端の影響が中央部分に及ばないために必要な，片側の重なりのサンプル数を求める．
+    連続するIIRステージ(1つのカスケードに結合される)はインパルス応答の長さ，移動平均・RMSは窓長の半分を
+    ステージごとに足し合わせる．
+
+    :param pipeline: 適用するパイプライン
+    :param tol: インパルス応答の打ち切りの許容誤差 [-]
+    :return: 片側の重なりのサンプル数 [-]
+    """
+    overlap = 0
+    for stage in pipeline.fused_stages():
+        if stage.name == "sos":
+            overlap += impulse_response_length(stage.params["sos"], tol=tol)
+        elif stage.name in ("moving_average", "rms_envelope"):
+            overlap += stage.params["window_size"] // 2 + 1
+        elif stage.name != "rectification":
+            # 重なりの長さが分からないステージは，誤った結果を書き出さないよう先に止める
+            raise ValueError(f"未対応のステージ {stage.name} です．")
+    return overlap
+
+
+def _count_csv_rows(filepath: str) -> int:
+    """ヘッダーを除いたCSVの行数をバイト列の改行の数から数える"""
+    n_lines = 0
+    last = b"\n"
+    with open(filepath, "rb") as f:
+        while block := f.read(1 << 24):
+            n_lines += block.count(b"\n")
+            last = block[-1:]
+    # 最終行に改行がない場合も1行と数える
+    return n_lines + (last != b"\n") - 1
+
+
+def _open_source(source: str | np.ndarray, chunk_rows: int) -> tuple[int, int, Iterator[np.ndarray]]:
+    """入力を (サンプル数, チャンネル数, 先頭から順に配列を返すイテレータ) として開く"""
+    if isinstance(source, str) and source.endswith(".csv"):
+        cached = load_cached_arrays(source)
+        if cached is not None:
+            source = cached[1]
+        else:
+            n_samples = _count_csv_rows(source)
+            n_channels = len(pd.read_csv(source, index_col=0, nrows=0).columns)
+            reader = pd.read_csv(source, index_col=0, chunksize=chunk_rows)
+            return n_samples, n_channels, (chunk.to_numpy() for chunk in reader)
+    elif isinstance(source, str):
+        source = np.load(source, mmap_mode="r")
+
+    values = source if source.ndim == 2 else source[:, np.newaxis]
+    chunks = (values[start:start + chunk_rows] for start in range(0, len(values), chunk_rows))
+    return values.shape[0], values.shape[1], chunks
+
+
+def process_chunked(source: str | np.ndarray, pipeline: Pipeline, output_path: str,
+                    block_size: int = CHUNK_BLOCK_SIZE, overlap: int | None = None, tol: float = 1e-9,
+                    chunk_rows: int = CSV_CHUNK_ROWS) -> np.ndarray:
+    """
+    長い記録にパイプラインをブロックごとに適用し，結果を .npy ファイルに順に書き込む．
+    メモリに載るのは (block_size + 2 × overlap) サンプル程度で，記録全体は読み込まない．
+
+    :param source: 入力．.npy ファイル (メモリマップで読む)，CSVファイル (バイナリキャッシュがあればそれを使い，
+                   なければchunk_rows行ずつ読む)，または配列 (サンプル数 × チャンネル数)
+    :param pipeline: 適用するパイプライン
+    :param output_path: 出力する .npy ファイルのパス
+    :param block_size: 1ブロックで出力するサンプル数 [-]
+    :param overlap: ブロックの片側の重なりのサンプル数．Noneの場合はpipeline_overlapで求める [-]
+    :param tol: 重なりを決めるインパルス応答の打ち切りの許容誤差 [-]
+    :param chunk_rows: 入力を一度に読むサンプル数 [-]
+    :return: 出力ファイルを読み取り専用でメモリマップした配列 (サンプル数 × チャンネル数，型はpipeline.dtype)
+    """
+    if not isinstance(block_size, int) or block_size <= 0:
+        raise ValueError("ブロックサイズblock_sizeは正の整数である必要があります．")
+    if overlap is None:
+        overlap = pipeline_overlap(pipeline, tol=tol)
+
+    n_samples, n_channels, chunks = _open_source(source, chunk_rows)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    output = np.lib.format.open_memmap(output_path, mode="w+", dtype=pipeline.dtype,
+                                       shape=(n_samples, n_channels))
+
+    # buffer には入力の [buffer_start, buffer_start + len(buffer)) が入っている
+    buffer = np.empty((0, n_channels), dtype=np.float64)
+    buffer_start = 0
+    position = 0
+    exhausted = False
+    while position < n_samples:
+        stop = min(position + block_size, n_samples)
+        needed = min(stop + overlap, n_samples)
+        # ブロックの右側の重なりまで読み込む
+        while buffer_start + len(buffer) < needed and not exhausted:
+            chunk = next(chunks, None)
+            if chunk is None:
+                exhausted = True
+                break
+            buffer = np.concatenate((buffer, np.asarray(chunk, dtype=np.float64)))
+        if buffer_start + len(buffer) < needed:
+            raise ValueError("入力のサンプル数が想定より少なくなっています．")
+
+        # 左右に重なりを付けたブロックを処理し，中央部分だけを書き込む
+        block_start = max(position - overlap, 0)
+        block = buffer[block_start - buffer_start:needed - buffer_start]
+        processed = pipeline.process(block)
+        output[position:stop] = processed[position - block_start:stop - block_start]
+
+        # 次のブロックの左側の重なりより前は捨てる
+        position = stop
+        keep_from = max(position - overlap, 0)
+        buffer = buffer[keep_from - buffer_start:]
+        buffer_start = keep_from
+
+    output.flush()
+    del output
+    return np.load(output_path, mmap_mode="r")
@@ -1,29 +1,435 @@
-import pandas as pd
-
-"""
-このファイルにはデータ読み込み関連の処理を書きます．
-今回はCSVファイルを読み込む処理を書きます．
-"""
-
-def load_data(filepath: str) -> pd.DataFrame:
-    """
-    CSVファイルを読み込み，Pandasデータフレームとして返す．
-
-    :param filepath: CSVファイルのパス
-    :return: 読み込まれたデータ，エラー時は空のDFを返す．
-    """
-    try:
-        # CSVを読み込んでデータフレームに変換する
-        df = pd.read_csv(filepath, index_col=0)
-
-        # インデックスをナノ秒単位のUnixスタンプとして日付形式に変換
-        df.index = pd.to_datetime(df.index, unit='ns')
-
-        print(f"✅ {filepath} を正常に読み込みました。")
-        return df
-    except FileNotFoundError:
-        print(f"❌ エラー: {filepath} が見つかりません。")
-        return pd.DataFrame()
-    except Exception as e:
-        print(f"❌ エラー: データの読み込み中に問題が発生しました - {e}")
-        return pd.DataFrame()
\ No newline at end of file
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .profiling import profiled
+
+"""
+このファイルにはデータ読み込み関連の処理を書きます．
+今回はCSVファイルを読み込む処理を書きます．
+"""
+
+# --- バイナリキャッシュ ---
+# CSVを毎回パースする代わりに，各記録を int16 のサンプル配列と int64 のタイムスタンプ配列として
+# .npy形式で保存しておき，メモリマップで読み込む．
+CACHE_DIRNAME = ".npy_cache"
+CACHE_INDEX_FILENAME = "index.json"
+CACHE_VERSION = 1
+
+# データセットのタイムスタンプはマイクロ秒単位のUnix時刻で，パケットごとに付与されるため
+# 連続する複数のサンプルが同じタイムスタンプを持つ
+TIMESTAMP_UNIT = "us"
+TIME_AXIS_MODES = ["datetime", "seconds"]
+
+# サンプルの型．EMGの値は8ビット程度の整数なので，"int16" にするとCSVと同じ "int64" の1/4のメモリで保持できる
+SAMPLE_DTYPES = ["int64", "int16"]
+
+
+def _fits_int16(values: np.ndarray) -> bool:
+    """配列が整数型で，全ての値がint16の範囲に収まるか"""
+    info = np.iinfo(np.int16)
+    return np.issubdtype(values.dtype, np.integer) and not (
+        values.size and (values.min() < info.min or values.max() > info.max))
+
+
+def file_signature(filepath: str) -> dict:
+    """
+    キャッシュの鮮度判定に使うファイルの更新時刻とサイズを返す．
+
+    :param filepath: ファイルのパス
+    :return: キー source_mtime_ns, source_size を持つ辞書
+    """
+    stat = os.stat(filepath)
+    return {"source_mtime_ns": stat.st_mtime_ns, "source_size": stat.st_size}
+
+
+def build_binary_cache(data_dir: str, cache_dir: str | None = None) -> str:
+    """
+    データディレクトリ以下の全CSVファイルをバイナリキャッシュに変換し，インデックスファイルを書き出す．
+    既に最新のキャッシュがある記録は変換をスキップする．
+
+    :param data_dir: データセットのルートディレクトリ (例: data/15Subjects-7Gestures)
+    :param cache_dir: キャッシュの保存先．省略時は data_dir/.npy_cache．
+                      それ以外の場所に保存した場合は，読み込み時にも同じcache_dirを指定する
+    :return: インデックスファイルのパス
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(data_dir, CACHE_DIRNAME)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    index_path = os.path.join(cache_dir, CACHE_INDEX_FILENAME)
+    old_recordings = _read_cache_index(index_path).get("recordings", {}) if os.path.exists(index_path) else {}
+
+    recordings = {}
+    for root, dirs, files in os.walk(data_dir):
+        # キャッシュディレクトリ自身は走査しない
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != cache_dir)
+        for filename in sorted(files):
+            if not filename.endswith(".csv"):
+                continue
+            source_path = os.path.join(root, filename)
+            rel_path = os.path.relpath(source_path, data_dir).replace(os.sep, "/")
+            signature = file_signature(source_path)
+
+            entry = old_recordings.get(rel_path)
+            if entry is not None and all(entry.get(k) == v for k, v in signature.items()):
+                recordings[rel_path] = entry
+                continue
+
+            df = pd.read_csv(source_path, index_col=0)
+            values = df.to_numpy()
+            if not _fits_int16(values):
+                print(f"⚠️ {source_path} はint16で表せないためキャッシュしません。")
+                continue
+
+            stem = rel_path[:-len(".csv")]
+            samples_file = f"{stem}.samples.npy"
+            timestamps_file = f"{stem}.timestamps.npy"
+            os.makedirs(os.path.dirname(os.path.join(cache_dir, samples_file)), exist_ok=True)
+            np.save(os.path.join(cache_dir, samples_file), np.ascontiguousarray(values, dtype=np.int16))
+            np.save(os.path.join(cache_dir, timestamps_file), df.index.to_numpy(dtype=np.int64))
+
+            recordings[rel_path] = {
+                "samples": samples_file,
+                "timestamps": timestamps_file,
+                "columns": [str(col) for col in df.columns],
+                "index_name": df.index.name,
+                "n_samples": len(df),
+                **signature,
+            }
+
+    with open(index_path, "w", encoding="utf-8") as f:
+        # source_dirはcache_dirを指定して読み込むときに，CSVのパスからエントリを引くために使う
+        json.dump({"version": CACHE_VERSION, "source_dir": os.path.abspath(data_dir), "recordings": recordings},
+                  f, ensure_ascii=False, indent=1)
+    return index_path
+
+
+@lru_cache(maxsize=8)
+def _read_cache_index_cached(index_path: str, mtime_ns: int) -> dict:
+    with open(index_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _read_cache_index(index_path: str) -> dict:
+    """インデックスファイルを読み込む(更新されていなければ前回の読み込み結果を再利用する)"""
+    return _read_cache_index_cached(index_path, os.stat(index_path).st_mtime_ns)
+
+
+def _cache_entry(source_path: str, cache_dir: str, data_dir: str) -> dict | None:
+    """
+    キャッシュディレクトリのインデックスから，CSVファイルに対応する最新のエントリを返す．
+
+    :return: エントリ．インデックスがない・古い・CSVが更新されている場合はNone
+    """
+    index_path = os.path.join(cache_dir, CACHE_INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        return None
+    index = _read_cache_index(index_path)
+    rel_path = os.path.relpath(source_path, index.get("source_dir", data_dir)).replace(os.sep, "/")
+    entry = index.get("recordings", {}).get(rel_path)
+    if index.get("version") != CACHE_VERSION or entry is None:
+        return None
+    signature = file_signature(source_path)
+    return entry if all(entry.get(k) == v for k, v in signature.items()) else None
+
+
+def _find_cache_entry(filepath: str, cache_dir: str | None = None) -> tuple[str, dict] | None:
+    """
+    CSVファイルに対応する最新のキャッシュエントリを探す．
+    cache_dirを省略した場合は，CSVのあるディレクトリとその親ディレクトリにある .npy_cache を探索する．
+
+    :param filepath: CSVファイルのパス
+    :param cache_dir: build_binary_cacheで指定したキャッシュの保存先
+    :return: (キャッシュディレクトリ, エントリ)．最新のキャッシュがなければNone
+    """
+    source_path = os.path.abspath(filepath)
+    if cache_dir is not None:
+        entry = _cache_entry(source_path, cache_dir, os.path.dirname(os.path.abspath(cache_dir)))
+        return None if entry is None else (cache_dir, entry)
+
+    data_dir = os.path.dirname(source_path)
+    for _ in range(2):
+        candidate = os.path.join(data_dir, CACHE_DIRNAME)
+        if os.path.exists(os.path.join(candidate, CACHE_INDEX_FILENAME)):
+            entry = _cache_entry(source_path, candidate, data_dir)
+            return None if entry is None else (candidate, entry)
+        data_dir = os.path.dirname(data_dir)
+    return None
+
+
+def load_cached_arrays(filepath: str, cache_dir: str | None = None) -> tuple[np.ndarray, np.ndarray] | None:
+    """
+    CSVファイルに対応するキャッシュをメモリマップで読み込む．
+
+    :param filepath: CSVファイルのパス
+    :param cache_dir: build_binary_cacheで指定したキャッシュの保存先．省略時はCSVの近くの .npy_cache を探す
+    :return: (タイムスタンプ配列 int64, サンプル配列 int16 (サンプル数 × チャンネル数))．最新のキャッシュがなければNone
+    """
+    found = _find_cache_entry(filepath, cache_dir)
+    if found is None:
+        return None
+    cache_dir, entry = found
+    timestamps = np.load(os.path.join(cache_dir, entry["timestamps"]), mmap_mode="r")
+    samples = np.load(os.path.join(cache_dir, entry["samples"]), mmap_mode="r")
+    return timestamps, samples
+
+
+def _load_from_cache(filepath: str, dtype: str = "int64", cache_dir: str | None = None) -> pd.DataFrame | None:
+    """最新のキャッシュがあれば，CSVを読み込んだ場合と同じデータフレームを返す (サンプルの型はdtype)"""
+    found = _find_cache_entry(filepath, cache_dir)
+    if found is None:
+        return None
+    cache_dir, entry = found
+    # コピーオンライトのメモリマップで読み込む．書き換えた部分だけがプロセス内に複製され，キャッシュは変わらない
+    timestamps = np.load(os.path.join(cache_dir, entry["timestamps"]), mmap_mode="c")
+    samples = np.load(os.path.join(cache_dir, entry["samples"]), mmap_mode="c")
+
+    # 既定ではCSVから読み込んだ場合と同じ列の型(int64)に揃える(ここでだけ複製する)．
+    # "int16" の場合はメモリマップした配列を複製せずにそのまま使う
+    index = pd.Index(timestamps, name=entry["index_name"])
+    return pd.DataFrame(samples.astype(dtype, copy=False), index=index, columns=entry["columns"], copy=False)
+
+
+class TimeAxis(NamedTuple):
+    """パケットのタイムスタンプから再構成した時間軸"""
+    times: np.ndarray  # 先頭サンプルからの経過時間 (狭義単調増加, float64) [s]
+    t0: float          # 先頭サンプルのUnix時刻 [s]
+    fs: float          # 推定したサンプリング周波数 [Hz]
+    gaps: np.ndarray   # 欠損とみなした区間 (区間数 × 2: 開始時刻 [s], 長さ [s])
+
+
+def reconstruct_time_axis(timestamps: np.ndarray, unit: str = TIMESTAMP_UNIT, gap_factor: float = 4.0) -> TimeAxis:
+    """
+    パケットのタイムスタンプから，サンプルごとの狭義単調増加な時間軸を再構成する．
+    同じタイムスタンプを持つサンプルは，そのタイムスタンプと次のタイムスタンプの間に等間隔で配置する．
+
+    :param timestamps: 各サンプルのタイムスタンプ (整数) [-]
+    :param unit: タイムスタンプの単位. "s", "ms", "us" または "ns" [-]
+    :param gap_factor: サンプル間隔が中央値のgap_factor倍を超える区間を欠損として報告する [-]
+    :return: 再構成した時間軸
+    """
+    scales = {"s": 1.0, "ms": 1e-3, "us": 1e-6, "ns": 1e-9}
+    if unit not in scales:
+        raise ValueError("unitは 's', 'ms', 'us' または 'ns' である必要があります．")
+    stamps = np.asarray(timestamps, dtype=np.int64)
+    n_samples = len(stamps)
+    if n_samples == 0:
+        return TimeAxis(np.empty(0), 0.0, 0.0, np.empty((0, 2)))
+
+    # 逆行したタイムスタンプは直前の値に揃える
+    stamps = np.maximum.accumulate(stamps)
+    t0 = float(stamps[0]) * scales[unit]
+    seconds = (stamps - stamps[0]) * scales[unit]
+
+    # 同じタイムスタンプの連続(パケット)ごとに，先頭位置とサンプル数を求める
+    starts = np.flatnonzero(np.concatenate(([True], np.diff(stamps) != 0)))
+    counts = np.diff(np.append(starts, n_samples))
+    packet_times = seconds[starts]
+
+    if len(starts) > 1:
+        # 最後のパケットは，それまでの1サンプルあたりの間隔の中央値で補う
+        per_sample = np.diff(packet_times) / counts[:-1]
+        next_times = np.append(packet_times[1:], packet_times[-1] + np.median(per_sample) * counts[-1])
+    else:
+        next_times = packet_times + counts  # タイムスタンプが1種類しかない場合は1秒間隔とみなす
+
+    # パケット内でのサンプルの位置 (0, 1, ..., count-1) に応じて線形補間する
+    position = np.arange(n_samples) - np.repeat(starts, counts)
+    step = np.repeat((next_times - packet_times) / counts, counts)
+    times = np.repeat(packet_times, counts) + position * step
+
+    intervals = np.diff(times)
+    fs = float(1.0 / np.median(intervals)) if len(intervals) else 0.0
+    gap_idx = np.flatnonzero(intervals > gap_factor * np.median(intervals)) if len(intervals) else np.empty(0, int)
+    gaps = np.column_stack((times[gap_idx], intervals[gap_idx]))
+
+    return TimeAxis(times=times, t0=t0, fs=fs, gaps=gaps)
+
+
+def read_frame(filepath: str, use_cache: bool = True, time_axis: str = "datetime",
+               dtype: str = "int64", cache_dir: str | None = None) -> pd.DataFrame:
+    """
+    メッセージを出さずに1つの記録を読み込む (load_dataとload_corpusの共通処理)．
+    load_dataと異なり，読み込めない場合は空のDFを返さずに例外をそのまま送出するため，
+    他のモジュールから多数の記録を読み込む処理に使う．引数はload_dataを参照．
+
+    :return: 読み込まれたデータ
+    """
+    if time_axis not in TIME_AXIS_MODES:
+        raise ValueError("time_axisは 'datetime' または 'seconds' である必要があります．")
+    if dtype not in SAMPLE_DTYPES:
+        raise ValueError("dtypeは 'int64' または 'int16' である必要があります．")
+
+    df = _load_from_cache(filepath, dtype, cache_dir) if use_cache else None
+    if df is None:
+        # CSVを読み込んでデータフレームに変換する
+        df = pd.read_csv(filepath, index_col=0)
+        if dtype == "int16":
+            if not _fits_int16(df.to_numpy()):
+                raise ValueError(f"{filepath} の値はint16で表せません．")
+            df = df.astype(np.int16)
+
+    if time_axis == "seconds":
+        # 単調増加する経過時間 [s] をfloat64のインデックスとし，推定したサンプリング周波数などをattrsに残す
+        axis = reconstruct_time_axis(df.index.to_numpy())
+        df.index = pd.Index(axis.times, name="time")
+        df.attrs.update({"t0": axis.t0, "fs": axis.fs, "gaps": axis.gaps})
+    else:
+        # インデックスをマイクロ秒単位のUnixスタンプとして日付形式に変換
+        df.index = pd.to_datetime(df.index, unit=TIMESTAMP_UNIT)
+    return df
+
+
+@profiled
+def load_data(filepath: str, use_cache: bool = True, time_axis: str = "datetime",
+              dtype: str = "int64", cache_dir: str | None = None) -> pd.DataFrame:
+    """
+    CSVファイルを読み込み，Pandasデータフレームとして返す．
+    build_binary_cacheで作成した最新のキャッシュがあれば，CSVをパースせずにキャッシュから読み込む．
+
+    :param filepath: CSVファイルのパス
+    :param use_cache: Trueの場合，最新のバイナリキャッシュがあればそれを使う
+    :param time_axis: インデックスの形式．"datetime" はタイムスタンプをそのまま日時に変換する．
+                      "seconds" はreconstruct_time_axisで再構成した経過時間 [s] (float64) を使い，
+                      推定したサンプリング周波数・先頭時刻・欠損区間を df.attrs の "fs", "t0", "gaps" に格納する
+    :param dtype: サンプルの型. "int64" または "int16" (メモリ使用量が1/4になる) [-]
+    :param cache_dir: build_binary_cacheで指定したキャッシュの保存先．省略時はCSVの近くの .npy_cache を探す
+    :return: 読み込まれたデータ，エラー時は空のDFを返す．
+    """
+    try:
+        df = read_frame(filepath, use_cache, time_axis, dtype, cache_dir)
+        print(f"✅ {filepath} を正常に読み込みました。")
+        if time_axis == "seconds":
+            print(f"   推定サンプリング周波数: {df.attrs['fs']:.1f} Hz, 欠損区間: {len(df.attrs['gaps'])} 件")
+        return df
+    except FileNotFoundError:
+        print(f"❌ エラー: {filepath} が見つかりません。")
+        return pd.DataFrame()
+    except Exception as e:
+        print(f"❌ エラー: データの読み込み中に問題が発生しました - {e}")
+        return pd.DataFrame()
+
+
+# --- データセット全体の読み込み ---
+# ファイル名 emg-<ジェスチャ>-S<被験者番号>.csv と，データセットのREADMEにあるジェスチャの分類
+RECORDING_NAME_PATTERN = re.compile(r"^emg-(?P<gesture>[a-z]+)-S(?P<subject>\d+)\.csv$")
+GESTURE_CLASSES = {
+    "fistdwn": "Closed Hand",
+    "fistout": "Closed Hand",
+    "opendwn": "Open Hand",
+    "openout": "Open Hand",
+    "twodwn": "Victory Sign",
+    "twout": "Victory Sign",
+    "tap": "Tap Action",
+    "right": "Wrist Extension",
+    "left": "Wrist Flexion",
+    "neut": "Neutral",
+}
+
+
+def parse_recording_name(filepath: str) -> tuple[int, str] | None:
+    """
+    ファイル名から被験者番号とジェスチャ名を取り出す．
+
+    :param filepath: CSVファイルのパス (例: data/15Subjects-7Gestures/S0/emg-fistdwn-S0.csv)
+    :return: (被験者番号, ジェスチャ名)．命名規則に合わない場合はNone
+    """
+    match = RECORDING_NAME_PATTERN.match(os.path.basename(filepath))
+    if match is None:
+        return None
+    return int(match.group("subject")), match.group("gesture")
+
+
+def build_corpus_index(data_dir: str = "data/15Subjects-7Gestures") -> pd.DataFrame:
+    """
+    データセット内の記録の一覧を作成する．
+
+    :param data_dir: データセットのルートディレクトリ
+    :return: 列 subject, gesture, gesture_class, path を持つデータフレーム (被験者・ジェスチャ順)
+    """
+    rows = []
+    for root, dirs, files in os.walk(data_dir):
+        dirs[:] = [d for d in dirs if d != CACHE_DIRNAME]
+        for filename in files:
+            parsed = parse_recording_name(filename)
+            if parsed is None:
+                continue
+            subject, gesture = parsed
+            rows.append({
+                "subject": subject,
+                "gesture": gesture,
+                "gesture_class": GESTURE_CLASSES.get(gesture, gesture),
+                "path": os.path.join(root, filename),
+            })
+
+    index = pd.DataFrame(rows, columns=["subject", "gesture", "gesture_class", "path"])
+    return index.sort_values(["subject", "gesture"], ignore_index=True)
+
+
+def load_corpus(data_dir: str = "data/15Subjects-7Gestures",
+                subjects: list[int] | None = None,
+                gestures: list[str] | None = None,
+                gesture_classes: list[str] | None = None,
+                n_workers: int | None = None,
+                use_cache: bool = True,
+                dtype: str = "int64",
+                cache_dir: str | None = None) -> pd.DataFrame:
+    """
+    データセットから選択した記録をプロセスプールで並列に読み込み，1つのデータフレームに連結して返す．
+
+    返り値のインデックスは (subject, gesture, gesture_class, timestamp) のMultiIndexで，
+    列は各記録のEMGチャンネル．記録ごとに信号処理する場合は
+    `corpus.groupby(level=["subject", "gesture"])` を使う．
+
+    :param data_dir: データセットのルートディレクトリ
+    :param subjects: 読み込む被験者番号のリスト．Noneの場合は全員
+    :param gestures: 読み込むジェスチャ名のリスト (例: ["fistdwn", "neut"])．Noneの場合は全て
+    :param gesture_classes: 読み込むジェスチャ分類のリスト (例: ["Closed Hand"])．Noneの場合は全て
+    :param n_workers: 並列に読み込むプロセス数．Noneの場合はCPUコア数
+    :param use_cache: Trueの場合，最新のバイナリキャッシュがあればそれを使う
+    :param dtype: サンプルの型. "int64" または "int16" [-]
+    :param cache_dir: build_binary_cacheで指定したキャッシュの保存先．省略時は data_dir/.npy_cache
+    :return: 連結されたデータ．該当する記録がない場合は空のDF
+    """
+    index = build_corpus_index(data_dir)
+    if subjects is not None:
+        index = index[index["subject"].isin(subjects)]
+    if gestures is not None:
+        index = index[index["gesture"].isin(gestures)]
+    if gesture_classes is not None:
+        index = index[index["gesture_class"].isin(gesture_classes)]
+    if index.empty:
+        return pd.DataFrame()
+
+    paths = index["path"].tolist()
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, len(paths)))
+
+    if n_workers == 1:
+        frames = [read_frame(path, use_cache, dtype=dtype, cache_dir=cache_dir) for path in paths]
+    else:
+        n = len(paths)
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            frames = list(executor.map(read_frame, paths, [use_cache] * n, ["datetime"] * n, [dtype] * n,
+                                       [cache_dir] * n, chunksize=4))
+
+    keys = list(index[["subject", "gesture", "gesture_class"]].itertuples(index=False, name=None))
+    corpus = pd.concat(frames, keys=keys, names=["subject", "gesture", "gesture_class", "timestamp"])
+    print(f"✅ {len(paths)} 件の記録を読み込みました。")
+    return corpus
+
+
+if __name__ == "__main__":
+    import sys
+
+    # 使い方: python -m modules.data_loader data/15Subjects-7Gestures
+    target_dir = sys.argv[1] if len(sys.argv) > 1 else "data/15Subjects-7Gestures"
+    print(f"✅ キャッシュを作成しました: {build_binary_cache(target_dir)}")
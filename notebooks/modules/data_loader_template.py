@@ -1,18 +1,18 @@
-import pandas as pd
-
-
-# --- 課題1: データ読み込み関数の実装 ---
-
-def load_data(filepath: str) -> pd.DataFrame:
-    """
-    CSVファイルを読み込み，Pandasデータフレームとして返す．
-
-    ヒント: Pandasの`read_csv`関数を使ってみよう．
-           ファイルが見つからない場合に備えて，try-catch構文も調べて見よう
-           FileNotFoundError，Exceptionを使います．
-
-    :param filepath: CSVファイルのパス
-    :return: 読み込まれたデータ，エラー時は空のDFを返す．
-    """
-    # === ここに処理を書いてみよう ===
+import pandas as pd
+
+
+# --- 課題1: データ読み込み関数の実装 ---
+
+def load_data(filepath: str) -> pd.DataFrame:
+    """
+    CSVファイルを読み込み，Pandasデータフレームとして返す．
+
+    ヒント: Pandasの`read_csv`関数を使ってみよう．
+           ファイルが見つからない場合に備えて，try-catch構文も調べて見よう
+           FileNotFoundError，Exceptionを使います．
+
+    :param filepath: CSVファイルのパス
+    :return: 読み込まれたデータ，エラー時は空のDFを返す．
+    """
+    # === ここに処理を書いてみよう ===
     pass # この行は実装後に削除してください
\ No newline at end of file
@@ -0,0 +1,161 @@
+import json
+import os
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrowはエクスポートを使う場合だけ必要
+    pa = None
+
+from .data_loader import TIMESTAMP_UNIT, build_corpus_index, read_frame, reconstruct_time_axis
+from .signal_processing import Pipeline
+
+"""
+このファイルにはデータセットを列指向形式(Parquet)に書き出し，読み込むプログラムを書きます．
+生データまたは前処理後のデータを被験者・ジェスチャごとに分割(subject=<番号>/gesture=<名前>/)して保存し，
+元のタイムスタンプと前処理のパラメータも残すため，CSVのデータセットの代わりに使えます．
+読み込み時は必要なチャンネル(列)と被験者・ジェスチャだけを読むため，CSV全体をパースし直す必要がありません．
+pyarrowが必要です (pip install -r requirements.txt でインストールされます)．
+"""
+
+EXPORT_METADATA_FILENAME = "_export.json"
+EXPORT_METADATA_KEY = b"biosignal_export"
+PARTITION_COLUMNS = ["subject", "gesture"]
+# チャンネル以外の列 (time: 経過時間 [s]，timestamp: 元のパケットのタイムスタンプ [us])
+TIME_COLUMNS = ["time", "timestamp"]
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("Parquetの書き出し・読み込みにはpyarrowが必要です．"
+                          "`pip install pyarrow` でインストールしてください．")
+
+
+def _pipeline_params(pipeline: Pipeline | None) -> dict | None:
+    """メタデータに保存する前処理のパラメータ"""
+    if pipeline is None:
+        return None
+    return {
+        "fs": pipeline.fs,
+        "dtype": pipeline.dtype,
+        "stages": [{"name": name, **params} for name, params in pipeline.stages],
+    }
+
+
+def export_corpus(output_dir: str, data_dir: str = "data/15Subjects-7Gestures", pipeline: Pipeline | None = None,
+                  subjects: list[int] | None = None, gestures: list[str] | None = None,
+                  compression: str = "zstd", use_cache: bool = True, overwrite: bool = False) -> str:
+    """
+    データセットの記録をParquetのデータセットとして書き出す．
+    各記録は output_dir/subject=<番号>/gesture=<名前>/part-0.parquet に，列 time (経過時間 [s])，
+    timestamp (元のパケットのタイムスタンプ [us]) と各チャンネルを持つ表として保存される．
+    先頭サンプルのUnix時刻 t0 [s] と推定したサンプリング周波数は各ファイルのメタデータに残る．
+
+    :param output_dir: 出力先のディレクトリ
+    :param data_dir: データセットのルートディレクトリ
+    :param pipeline: 指定した場合，各記録にこのパイプラインを適用したデータを書き出す．Noneの場合は生データ(int16)
+    :param subjects: 書き出す被験者番号のリスト．Noneの場合は全員
+    :param gestures: 書き出すジェスチャ名のリスト．Noneの場合は全て
+    :param compression: Parquetの圧縮方式 (例: "zstd", "snappy", "none")
+    :param use_cache: Trueの場合，最新のバイナリキャッシュがあればそれを使う
+    :param overwrite: Trueの場合，以前にexport_corpusで書き出したディレクトリを削除してから書き出す．
+                      Falseの場合，空でないディレクトリには書き出さない
+    :return: 出力先のディレクトリ
+    """
+    _require_pyarrow()
+    if os.path.isdir(output_dir) and os.listdir(output_dir):
+        # 古いパーティションが新しいものと混ざらないよう，空でないディレクトリには追記しない
+        if not overwrite:
+            raise FileExistsError(f"{output_dir} は空ではありません．上書きする場合はoverwrite=Trueを指定してください．")
+        if not os.path.exists(os.path.join(output_dir, EXPORT_METADATA_FILENAME)):
+            raise FileExistsError(f"{output_dir} はexport_corpusの出力先ではないため削除できません．")
+        shutil.rmtree(output_dir)
+
+    index = build_corpus_index(data_dir)
+    if subjects is not None:
+        index = index[index["subject"].isin(subjects)]
+    if gestures is not None:
+        index = index[index["gesture"].isin(gestures)]
+
+    metadata = {
+        "kind": "raw" if pipeline is None else "processed",
+        "pipeline": _pipeline_params(pipeline),
+        "source": os.path.abspath(data_dir),
+    }
+    schema_metadata = {EXPORT_METADATA_KEY: json.dumps(metadata, ensure_ascii=False).encode("utf-8")}
+
+    for row in index.itertuples(index=False):
+        df = read_frame(row.path, use_cache=use_cache, dtype="int16" if pipeline is None else "int64")
+        # 元のタイムスタンプを残したまま，load_data(time_axis="seconds")と同じ経過時間の軸を求める
+        stamps = df.index.as_unit(TIMESTAMP_UNIT).asi8
+        axis = reconstruct_time_axis(stamps)
+        if pipeline is not None:
+            df = pipeline.run(df)
+
+        columns = {"time": pa.array(axis.times), "timestamp": pa.array(stamps)}
+        for column in df.columns:
+            columns[str(column)] = pa.array(df[column].to_numpy())
+        table = pa.table(columns).replace_schema_metadata({
+            **schema_metadata,
+            b"gesture_class": row.gesture_class.encode("utf-8"),
+            b"t0": repr(axis.t0).encode("utf-8"),
+            b"fs_estimate": repr(axis.fs).encode("utf-8"),
+        })
+
+        partition_dir = os.path.join(output_dir, f"subject={row.subject}", f"gesture={row.gesture}")
+        os.makedirs(partition_dir, exist_ok=True)
+        pq.write_table(table, os.path.join(partition_dir, "part-0.parquet"), compression=compression)
+
+    with open(os.path.join(output_dir, EXPORT_METADATA_FILENAME), "w", encoding="utf-8") as f:
+        json.dump({**metadata, "n_recordings": len(index)}, f, ensure_ascii=False, indent=1)
+    print(f"✅ {len(index)} 件の記録を {output_dir} に書き出しました。")
+    return output_dir
+
+
+def read_export_metadata(dataset_dir: str) -> dict:
+    """
+    export_corpusで書き出したデータセットのメタデータ (種類・前処理のパラメータなど) を返す．
+
+    :param dataset_dir: export_corpusの出力先のディレクトリ
+    """
+    with open(os.path.join(dataset_dir, EXPORT_METADATA_FILENAME), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_corpus(dataset_dir: str, channels: list[str] | None = None, subjects: list[int] | None = None,
+                gestures: list[str] | None = None) -> pd.DataFrame:
+    """
+    export_corpusで書き出したデータセットから，指定したチャンネル・被験者・ジェスチャだけを読み込む．
+    被験者・ジェスチャの絞り込みはディレクトリ単位で行われ，該当しないファイルは開かない．
+
+    :param dataset_dir: export_corpusの出力先のディレクトリ
+    :param channels: 読み込むチャンネル名のリスト (例: ["emg1", "emg2"])．Noneの場合は全て．
+                     元のタイムスタンプが必要な場合は "timestamp" を含める
+    :param subjects: 読み込む被験者番号のリスト．Noneの場合は全員
+    :param gestures: 読み込むジェスチャ名のリスト．Noneの場合は全て
+    :return: インデックス (subject, gesture, time) のデータフレーム．該当する記録がない場合は空のDF
+    """
+    _require_pyarrow()
+    # "_" で始まるファイル (_export.json) はデータセットに含まれない
+    dataset = ds.dataset(dataset_dir, format="parquet", partitioning="hive")
+
+    expression = None
+    if subjects is not None:
+        expression = ds.field("subject").isin([int(s) for s in subjects])
+    if gestures is not None:
+        gesture_filter = ds.field("gesture").isin(list(gestures))
+        expression = gesture_filter if expression is None else expression & gesture_filter
+
+    if channels is None:
+        channels = [name for name in dataset.schema.names if name not in PARTITION_COLUMNS + TIME_COLUMNS]
+    table = dataset.to_table(columns=PARTITION_COLUMNS + ["time"] + list(channels), filter=expression)
+    if table.num_rows == 0:
+        return pd.DataFrame()
+
+    df = table.to_pandas()
+    df["gesture"] = df["gesture"].astype(str)
+    return df.set_index(PARTITION_COLUMNS + ["time"]).sort_index()
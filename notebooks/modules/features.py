@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import rfft, rfftfreq
+
+from .signal_processing import Pipeline
+
+"""
+このファイルにはジェスチャ分類のための特徴量抽出のプログラムを書きます．
+信号を重なりのあるウィンドウに分割し，全チャンネルについて一度に時間領域・周波数領域の特徴量を計算します．
+ウィンドウの分割はコピーを作らないストライドビューで行い，Pythonのループを使いません．
+"""
+
+# 特徴量名と意味
+# mav: 平均絶対値, rms: 二乗平均平方根, wl: 波形長, zc: ゼロ交差数, ssc: 傾き符号変化数,
+# var: 分散, mnf: 平均周波数, mdf: 中央周波数
+FEATURE_NAMES = ["mav", "rms", "wl", "zc", "ssc", "var", "mnf", "mdf"]
+
+
+def sliding_windows(values: np.ndarray, window_size: int, step: int) -> np.ndarray:
+    """
+    2次元配列を重なりのあるウィンドウに分割したストライドビューを返す(データはコピーされない)．
+
+    :param values: 入力配列 (サンプル数 × チャンネル数) [-]
+    :param window_size: ウィンドウサイズ [-]
+    :param step: ウィンドウをずらす間隔 [-]
+    :return: 読み取り専用のビュー (ウィンドウ数 × チャンネル数 × ウィンドウサイズ) [-]
+    """
+    if not isinstance(window_size, int) or window_size <= 0:
+        raise ValueError("ウィンドウサイズwindow_sizeは正の整数である必要があります．")
+    if not isinstance(step, int) or step <= 0:
+        raise ValueError("ずらす間隔stepは正の整数である必要があります．")
+    if values.shape[0] < window_size:
+        return np.empty((0, values.shape[1], window_size), dtype=values.dtype)
+    return sliding_window_view(values, window_size, axis=0)[::step]
+
+
+def feature_names(channels: list[str], features: list[str] | None = None) -> list[str]:
+    """
+    extract_featuresの出力列に対応する名前を返す (例: "emg1_mav")．
+
+    :param channels: チャンネル名のリスト
+    :param features: 特徴量名のリスト．Noneの場合はFEATURE_NAMES
+    :return: 特徴量の列名のリスト (特徴量ごとに全チャンネルが並ぶ)
+    """
+    features = FEATURE_NAMES if features is None else features
+    return [f"{channel}_{feature}" for feature in features for channel in channels]
+
+
+def extract_features(data: pd.DataFrame | np.ndarray, fs: float, window_size: int, step: int,
+                     features: list[str] | None = None, threshold: float = 0.0) -> np.ndarray:
+    """
+    重なりのあるウィンドウごとに，全チャンネルのEMG特徴量を計算する．
+
+    :param data: 入力データ (データフレームの場合は数値列のみを使う) [-]
+    :param fs: サンプリング周波数 [Hz]
+    :param window_size: ウィンドウサイズ [-]
+    :param step: ウィンドウをずらす間隔 [-]
+    :param features: 計算する特徴量名のリスト．Noneの場合はFEATURE_NAMES
+    :param threshold: ゼロ交差数・傾き符号変化数でノイズを無視するためのしきい値 [-]
+    :return: 特徴量行列 float32 (ウィンドウ数 × (特徴量数 × チャンネル数))．列の並びはfeature_namesと同じ
+    """
+    if isinstance(data, pd.DataFrame):
+        data = data.select_dtypes(include=[np.number]).to_numpy()
+    values = np.asarray(data, dtype=np.float64)
+
+    return window_features(sliding_windows(values, window_size, step), fs, features=features, threshold=threshold)
+
+
+def window_features(windows: np.ndarray, fs: float, features: list[str] | None = None,
+                    threshold: float = 0.0) -> np.ndarray:
+    """
+    切り出し済みのウィンドウ (ウィンドウ数 × チャンネル数 × ウィンドウサイズ) の特徴量をまとめて計算する．
+    別々の記録・ストリームから集めたウィンドウを1回の呼び出しで処理する場合に使う．
+
+    :param windows: ウィンドウの配列 [-]
+    :param fs: サンプリング周波数 [Hz]
+    :param features: 計算する特徴量名のリスト．Noneの場合はFEATURE_NAMES
+    :param threshold: ゼロ交差数・傾き符号変化数でノイズを無視するためのしきい値 [-]
+    :return: 特徴量行列 float32 (ウィンドウ数 × (特徴量数 × チャンネル数))．列の並びはfeature_namesと同じ
+    """
+    if fs <= 0:
+        raise ValueError("サンプリング周波数fsは正の値である必要があります．")
+    features = FEATURE_NAMES if features is None else features
+    unknown = [f for f in features if f not in FEATURE_NAMES]
+    if unknown:
+        raise ValueError(f"未対応の特徴量です: {unknown}")
+
+    n_windows, n_channels, window_size = windows.shape
+    result = np.empty((n_windows, len(features) * n_channels), dtype=np.float32)
+    if n_windows == 0:
+        return result
+
+    # 差分系の特徴量で共有する中間結果
+    diffs = np.diff(windows, axis=-1) if {"wl", "ssc"} & set(features) else None
+    spectrum = None
+    if {"mnf", "mdf"} & set(features):
+        # apply_fftと同じく窓関数なしの片側スペクトルから，パワースペクトルを求める
+        power = np.abs(rfft(windows, axis=-1, workers=-1)) ** 2
+        freqs = rfftfreq(window_size, 1 / fs)
+        total_power = power.sum(axis=-1)
+        spectrum = (power, freqs, np.where(total_power > 0, total_power, 1.0))
+
+    for k, name in enumerate(features):
+        if name == "mav":
+            value = np.mean(np.abs(windows), axis=-1)
+        elif name == "rms":
+            value = np.sqrt(np.mean(np.square(windows), axis=-1))
+        elif name == "wl":
+            value = np.sum(np.abs(diffs), axis=-1)
+        elif name == "zc":
+            left, right = windows[..., :-1], windows[..., 1:]
+            crossing = (left * right < 0) & (np.abs(left - right) >= threshold)
+            value = np.count_nonzero(crossing, axis=-1)
+        elif name == "ssc":
+            slope_change = -diffs[..., :-1] * diffs[..., 1:]
+            value = np.count_nonzero(slope_change > threshold, axis=-1)
+        elif name == "var":
+            value = np.var(windows, axis=-1, ddof=1) if window_size > 1 else np.zeros((n_windows, n_channels))
+        elif name == "mnf":
+            power, freqs, total_power = spectrum
+            value = (power @ freqs) / total_power
+        elif name == "mdf":
+            power, freqs, total_power = spectrum
+            # 累積パワーが全体の半分に達する最初の周波数
+            cumulative = np.cumsum(power, axis=-1)
+            value = freqs[np.argmax(cumulative >= 0.5 * total_power[..., np.newaxis], axis=-1)]
+        result[:, k * n_channels:(k + 1) * n_channels] = value
+
+    return result
+
+
+def extract_corpus_features(corpus: pd.DataFrame, fs: float, window_size: int, step: int,
+                            pipeline: Pipeline | None = None, features: list[str] | None = None,
+                            threshold: float = 0.0) -> tuple[np.ndarray, pd.DataFrame]:
+    """
+    load_corpusで読み込んだデータセット全体から，記録ごとに特徴量を抽出して連結する．
+    ウィンドウが記録の境界をまたがないよう，記録ごとに処理する．
+
+    :param corpus: load_corpusの返り値
+    :param fs: サンプリング周波数 [Hz]
+    :param window_size: ウィンドウサイズ [-]
+    :param step: ウィンドウをずらす間隔 [-]
+    :param pipeline: 特徴量抽出の前に適用するパイプライン．Noneの場合は生データを使う
+    :param features: 計算する特徴量名のリスト．Noneの場合はFEATURE_NAMES
+    :param threshold: ゼロ交差数・傾き符号変化数のしきい値 [-]
+    :return: (特徴量行列 float32, 各ウィンドウのラベル (列: subject, gesture, gesture_class, start))
+    """
+    matrices = []
+    labels = []
+    for (subject, gesture, gesture_class), recording in corpus.groupby(
+            level=["subject", "gesture", "gesture_class"], sort=False):
+        values = recording.to_numpy(dtype=np.float64)
+        if pipeline is not None:
+            values = pipeline.process(values)
+        matrix = extract_features(values, fs, window_size, step, features=features, threshold=threshold)
+        matrices.append(matrix)
+        labels.append(pd.DataFrame({
+            "subject": subject,
+            "gesture": gesture,
+            "gesture_class": gesture_class,
+            "start": np.arange(len(matrix)) * step,
+        }))
+
+    n_columns = len(FEATURE_NAMES if features is None else features) * corpus.shape[1]
+    if not matrices:
+        return np.empty((0, n_columns), dtype=np.float32), pd.DataFrame(
+            columns=["subject", "gesture", "gesture_class", "start"])
+    return np.vstack(matrices), pd.concat(labels, ignore_index=True)
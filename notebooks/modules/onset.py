@@ -0,0 +1,196 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .signal_processing import Pipeline
+
+"""
+このファイルには筋活動の開始(オンセット)・終了(オフセット)を検出するプログラムを書きます．
+整流とRMSエンベロープで求めた包絡線を，被験者ごとの安静時(neut)の記録から推定したしきい値と比較し，
+ヒステリシスと最小持続時間の条件で活動区間を求めます．全チャンネルを配列演算でまとめて処理します．
+"""
+
+SEGMENT_COLUMNS = ["channel", "onset", "offset", "onset_time", "offset_time", "duration", "peak"]
+
+# 安静時の記録のジェスチャ名
+BASELINE_GESTURE = "neut"
+
+
+class Baseline(NamedTuple):
+    """安静時の包絡線の統計量 (チャンネルごと)"""
+    level: np.ndarray   # 中央値 [-]
+    spread: np.ndarray  # 標準偏差に換算した中央絶対偏差 (1.4826 × MAD) [-]
+
+
+def activity_envelope(values: np.ndarray, fs: float, window_size: int,
+                      highpass_cutoff: float | None = None) -> np.ndarray:
+    """
+    全波整流とRMSエンベロープ(apply_rectification, apply_rms_envelopeと同じ処理)で活動の包絡線を求める．
+
+    :param values: 入力配列 (サンプル数 × チャンネル数) [-]
+    :param fs: サンプリング周波数 [Hz]
+    :param window_size: RMSエンベロープのウィンドウサイズ [-]
+    :param highpass_cutoff: 指定した場合，整流の前にこのカットオフ周波数のハイパスフィルタで基線の揺れを除く [Hz]
+    :return: 包絡線 (サンプル数 × チャンネル数) [-]
+    """
+    pipeline = Pipeline(fs)
+    if highpass_cutoff is not None:
+        pipeline.add_highpass(highpass_cutoff)
+    pipeline.add_rectification("full").add_rms_envelope(window_size)
+    return pipeline.process(values)
+
+
+def estimate_baseline(envelope: np.ndarray) -> Baseline:
+    """
+    安静時の包絡線から，外れ値に強い中央値と中央絶対偏差でチャンネルごとの基線を推定する．
+
+    :param envelope: 安静時の包絡線 (サンプル数 × チャンネル数) [-]
+    :return: 基線の統計量
+    """
+    if len(envelope) == 0:
+        raise ValueError("基線の推定には1サンプル以上の包絡線が必要です．")
+    level = np.median(envelope, axis=0)
+    spread = 1.4826 * np.median(np.abs(envelope - level), axis=0)
+    return Baseline(level=level, spread=spread)
+
+
+def _hysteresis(envelope: np.ndarray, on_threshold: np.ndarray, off_threshold: np.ndarray) -> np.ndarray:
+    """
+    包絡線がon_thresholdを超えたら活動開始，off_thresholdを下回ったら活動終了とするヒステリシス判定．
+    各時刻で直前の「開始」と「終了」のどちらが新しいかを累積最大値で求め，ループを使わない．
+    """
+    index = np.arange(len(envelope))[:, np.newaxis]
+    last_on = np.maximum.accumulate(np.where(envelope > on_threshold, index, -1), axis=0)
+    last_off = np.maximum.accumulate(np.where(envelope < off_threshold, index, -1), axis=0)
+    return last_on > last_off
+
+
+def _segments(active: np.ndarray, min_samples: int, gap_samples: int) -> tuple[np.ndarray, ...]:
+    """
+    活動判定 (サンプル数 × チャンネル数) から区間を求め，短い途切れをつなぎ，短い区間を除く．
+
+    :return: (チャンネル番号, 開始サンプル, 終了サンプル(含まない)) の配列．チャンネル・開始順
+    """
+    n_samples, n_channels = active.shape
+    # チャンネルごとに両端を非活動で挟み，立ち上がりと立ち下がりを求める (チャンネル優先の順に並ぶ)
+    padded = np.zeros((n_channels, n_samples + 2), dtype=np.int8)
+    padded[:, 1:-1] = active.T
+    edges = np.diff(padded, axis=1)
+    channels, starts = np.nonzero(edges == 1)
+    _, stops = np.nonzero(edges == -1)
+
+    if gap_samples > 0 and len(starts) > 1:
+        # 同じチャンネルで前の区間との途切れがgap_samples未満なら1つの区間にまとめる
+        new_segment = np.ones(len(starts), dtype=bool)
+        new_segment[1:] = (channels[1:] != channels[:-1]) | (starts[1:] - stops[:-1] >= gap_samples)
+        first = np.flatnonzero(new_segment)
+        channels, starts = channels[first], starts[first]
+        stops = np.maximum.reduceat(stops, first)
+
+    keep = stops - starts >= min_samples
+    return channels[keep], starts[keep], stops[keep]
+
+
+def detect_onsets(data: pd.DataFrame | np.ndarray, fs: float, baseline: Baseline, window_size: int = 40,
+                  on_factor: float = 5.0, off_factor: float = 2.5, min_duration: float = 0.1,
+                  min_gap: float = 0.05, highpass_cutoff: float | None = None) -> pd.DataFrame:
+    """
+    1つの記録から筋活動の区間を検出する．
+    しきい値は 基線の中央値 + 係数 × 基線のばらつき で，開始(on_factor)と終了(off_factor)に別の値を使う．
+
+    :param data: 入力データ (データフレームの場合は数値列のみを使う) [-]
+    :param fs: サンプリング周波数 [Hz]
+    :param baseline: estimate_baselineで求めた安静時の基線
+    :param window_size: RMSエンベロープのウィンドウサイズ [-]
+    :param on_factor: 活動開始のしきい値の係数 [-]
+    :param off_factor: 活動終了のしきい値の係数 (on_factor以下) [-]
+    :param min_duration: これより短い区間は除く [s]
+    :param min_gap: これより短い途切れは前後の区間をつなぐ [s]
+    :param highpass_cutoff: activity_envelopeを参照 [Hz]
+    :return: 列 channel, onset, offset (サンプル番号，offsetは含まない), onset_time, offset_time, duration [s],
+             peak (区間内の包絡線の最大値) を持つ区間表
+    """
+    if fs <= 0:
+        raise ValueError("サンプリング周波数fsは正の値である必要があります．")
+    if off_factor > on_factor:
+        raise ValueError("終了の係数off_factorは開始の係数on_factor以下である必要があります．")
+
+    channel_names = None
+    if isinstance(data, pd.DataFrame):
+        numeric = data.select_dtypes(include=[np.number])
+        channel_names = np.array([str(c) for c in numeric.columns])
+        data = numeric.to_numpy()
+    values = np.asarray(data, dtype=np.float64)
+    if channel_names is None:
+        channel_names = np.array([f"ch{i + 1}" for i in range(values.shape[1])])
+
+    if len(values) == 0:
+        return pd.DataFrame(columns=SEGMENT_COLUMNS)
+
+    envelope = activity_envelope(values, fs, window_size, highpass_cutoff)
+    active = _hysteresis(envelope,
+                         baseline.level + on_factor * baseline.spread,
+                         baseline.level + off_factor * baseline.spread)
+    channels, starts, stops = _segments(active, int(round(min_duration * fs)), int(round(min_gap * fs)))
+
+    # 区間内の最大値: チャンネル優先に並べた包絡線に対して [開始, 終了) ごとにまとめて求める
+    flat = np.append(envelope.T.ravel(), 0.0)
+    offsets = channels * len(envelope)
+    bounds = np.column_stack((offsets + starts, offsets + stops)).ravel()
+    peaks = np.maximum.reduceat(flat, bounds)[::2] if len(bounds) else np.empty(0)
+
+    return pd.DataFrame({
+        "channel": channel_names[channels],
+        "onset": starts,
+        "offset": stops,
+        "onset_time": starts / fs,
+        "offset_time": stops / fs,
+        "duration": (stops - starts) / fs,
+        "peak": peaks,
+    }, columns=SEGMENT_COLUMNS)
+
+
+def detect_corpus_onsets(corpus: pd.DataFrame, fs: float, window_size: int = 40, on_factor: float = 5.0,
+                         off_factor: float = 2.5, min_duration: float = 0.1, min_gap: float = 0.05,
+                         highpass_cutoff: float | None = None) -> pd.DataFrame:
+    """
+    load_corpusで読み込んだデータセット全体について，被験者ごとに安静時(neut)の記録から基線を推定し，
+    全記録の活動区間を検出する．
+
+    :param corpus: load_corpusの返り値 (neutの記録を含む必要がある)
+    :param fs: サンプリング周波数 [Hz]
+    :param window_size: RMSエンベロープのウィンドウサイズ [-]
+    :param on_factor: 活動開始のしきい値の係数 [-]
+    :param off_factor: 活動終了のしきい値の係数 [-]
+    :param min_duration: これより短い区間は除く [s]
+    :param min_gap: これより短い途切れは前後の区間をつなぐ [s]
+    :param highpass_cutoff: activity_envelopeを参照 [Hz]
+    :return: 列 subject, gesture, gesture_class と detect_onsetsの列を持つ区間表
+    """
+    tables = []
+    for subject, subject_data in corpus.groupby(level="subject", sort=False):
+        gestures = subject_data.index.get_level_values("gesture")
+        neutral = subject_data[gestures == BASELINE_GESTURE]
+        if neutral.empty:
+            print(f"⚠️ 被験者 {subject} には安静時 ({BASELINE_GESTURE}) の記録がないためスキップします。")
+            continue
+
+        # 安静時の記録が複数ある場合は，記録ごとの包絡線をつなげて基線を推定する
+        envelopes = [activity_envelope(recording.to_numpy(dtype=np.float64), fs, window_size, highpass_cutoff)
+                     for _, recording in neutral.groupby(level="gesture", sort=False)]
+        baseline = estimate_baseline(np.concatenate(envelopes))
+
+        for (gesture, gesture_class), recording in subject_data.groupby(level=["gesture", "gesture_class"],
+                                                                        sort=False):
+            table = detect_onsets(recording, fs, baseline, window_size=window_size, on_factor=on_factor,
+                                  off_factor=off_factor, min_duration=min_duration, min_gap=min_gap,
+                                  highpass_cutoff=highpass_cutoff)
+            table.insert(0, "gesture_class", gesture_class)
+            table.insert(0, "gesture", gesture)
+            table.insert(0, "subject", subject)
+            tables.append(table)
+
+    if not tables:
+        return pd.DataFrame(columns=["subject", "gesture", "gesture_class"] + SEGMENT_COLUMNS)
+    return pd.concat(tables, ignore_index=True)
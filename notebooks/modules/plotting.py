@@ -1,20 +1,183 @@
-import pandas as pd
-import plotly.express as px
-
-
-def plot_data(df: pd.DataFrame, title: str = "Signal Data"):
-    """
-    データフレームをインタラクティブなグラフとして描画する．
-    :param df: 描画するデータフレーム [-]
-    :param title: グラフのタイトル
-    """
-    if df.empty:
-        return px.line(title="データがありません")
-
-    fig = px.line(df, x=df.index,y=df.columns, title=title)
-    fig.update_layout(
-        xaxis_title = 'Time',
-        yaxis_title = 'Value',
-        legend_title = 'Signals'
-    )
-    return fig
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from .profiling import profiled
+
+
+# --- 描画用の間引き ---
+# 長い信号の全サンプルをそのまま描画するとJSONのサイズと描画時間がデータ長に比例して増えるため，
+# 各トレースを画面の横幅程度の点数に間引く．どちらの方法もピークを残すように点を選ぶ．
+DECIMATION_METHODS = ["m4", "lttb"]
+
+
+def _numeric_axis(index: pd.Index) -> np.ndarray:
+    """インデックスを間引きの計算に使える数値配列に変換する"""
+    if isinstance(index, pd.DatetimeIndex):
+        return index.asi8.astype(np.float64)
+    if pd.api.types.is_numeric_dtype(index):
+        return np.asarray(index, dtype=np.float64)
+    return np.arange(len(index), dtype=np.float64)
+
+
+def downsample_m4(values: np.ndarray, n_bins: int) -> list[np.ndarray]:
+    """
+    M4法で間引くサンプル番号を選ぶ．
+    サンプルをn_bins個の区間に分け，各区間の最初・最後・最小・最大の4点を残す．
+
+    :param values: 入力配列 (サンプル数 × チャンネル数) [-]
+    :param n_bins: 区間の数 (横方向のピクセル数程度) [-]
+    :return: チャンネルごとの残すサンプル番号 (昇順) のリスト
+    """
+    n_samples, n_channels = values.shape
+    if n_samples <= 4 * n_bins:
+        return [np.arange(n_samples)] * n_channels
+
+    # 全区間が同じ長さになるよう末尾の値で埋めてから (区間数 × 区間長 × チャンネル数) に変形する
+    bin_size = -(-n_samples // n_bins)
+    # 区間長を切り上げた分だけ区間数を減らし，サンプルを含まない区間を作らない
+    n_bins = -(-n_samples // bin_size)
+    padded = np.concatenate((values, np.repeat(values[-1:], n_bins * bin_size - n_samples, axis=0)))
+    bins = padded.reshape(n_bins, bin_size, n_channels)
+
+    starts = np.arange(n_bins)[:, np.newaxis] * bin_size
+    first = np.broadcast_to(starts, (n_bins, n_channels))
+    last = np.broadcast_to(np.minimum(starts + bin_size - 1, n_samples - 1), (n_bins, n_channels))
+    lowest = np.minimum(starts + np.argmin(bins, axis=1), n_samples - 1)
+    highest = np.minimum(starts + np.argmax(bins, axis=1), n_samples - 1)
+
+    selected = np.concatenate((first, last, lowest, highest))
+    return [np.unique(selected[:, c]) for c in range(n_channels)]
+
+
+def downsample_lttb(x: np.ndarray, values: np.ndarray, n_out: int) -> list[np.ndarray]:
+    """
+    LTTB (Largest-Triangle-Three-Buckets) 法で間引くサンプル番号を選ぶ．
+    各区間から，前に選んだ点と次の区間の平均点とで作る三角形の面積が最大になる点を残す．
+    区間ごとのループはあるが，チャンネル方向はまとめて計算する．
+
+    :param x: 横軸の値 [-]
+    :param values: 入力配列 (サンプル数 × チャンネル数) [-]
+    :param n_out: 残す点数 (3以上) [-]
+    :return: チャンネルごとの残すサンプル番号 (昇順) のリスト
+    """
+    n_samples, n_channels = values.shape
+    if n_out < 3:
+        raise ValueError("LTTB法で残す点数n_outは3以上である必要があります．")
+    if n_samples <= n_out:
+        return [np.arange(n_samples)] * n_channels
+
+    channels = np.arange(n_channels)
+    selected = np.empty((n_out, n_channels), dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n_samples - 1
+
+    every = (n_samples - 2) / (n_out - 2)
+    previous = np.zeros(n_channels, dtype=np.int64)
+    for i in range(n_out - 2):
+        # 次の区間の平均点
+        avg_start = int(np.floor((i + 1) * every)) + 1
+        avg_end = min(int(np.floor((i + 2) * every)) + 1, n_samples)
+        avg_x = x[avg_start:avg_end].mean()
+        avg_y = values[avg_start:avg_end].mean(axis=0)
+
+        # 現在の区間の各点について三角形の面積(の2倍)を求める
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+        prev_x = x[previous]
+        prev_y = values[previous, channels]
+        area = np.abs((prev_x - avg_x) * (values[start:end] - prev_y)
+                      - (prev_x - x[start:end, np.newaxis]) * (avg_y - prev_y))
+
+        previous = start + np.argmax(area, axis=0)
+        selected[i + 1] = previous
+
+    return [selected[:, c] for c in range(n_channels)]
+
+
+def decimate_frame(df: pd.DataFrame, max_points: int, method: str = "m4") -> pd.DataFrame:
+    """
+    データフレームの各列をmax_points点程度に間引き，描画用の縦持ちデータフレームを返す．
+
+    :param df: 入力データ [-]
+    :param max_points: 1トレースあたりの最大点数 [-]
+    :param method: 間引きの方法. "m4" または "lttb" [-]
+    :return: 列 x, variable, value を持つ縦持ちデータフレーム
+    """
+    if method not in DECIMATION_METHODS:
+        raise ValueError("methodは 'm4' または 'lttb' である必要があります．")
+    if not isinstance(max_points, int) or max_points < 4:
+        raise ValueError("最大点数max_pointsは4以上の整数である必要があります．")
+
+    values = df.to_numpy(dtype=np.float64)
+    if method == "m4":
+        indices = downsample_m4(values, max_points // 4)
+    else:
+        indices = downsample_lttb(_numeric_axis(df.index), values, max_points)
+
+    frames = [
+        pd.DataFrame({"x": df.index[idx], "variable": column, "value": values[idx, c]})
+        for c, (column, idx) in enumerate(zip(df.columns, indices))
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _trace_arrays(df: pd.DataFrame, max_points: int | None, method: str) -> list[tuple[str, np.ndarray, np.ndarray]]:
+    """各トレースの (名前, x, y) を返す．max_pointsを指定した場合は間引く"""
+    numeric = df.select_dtypes(include=[np.number])
+    values = numeric.to_numpy(dtype=np.float64)
+    x = np.asarray(numeric.index)
+    if max_points is None or len(df) <= max_points:
+        return [(str(column), x, values[:, c]) for c, column in enumerate(numeric.columns)]
+
+    long_df = decimate_frame(numeric, max_points, method=method)
+    return [(str(column), group["x"].to_numpy(), group["value"].to_numpy())
+            for column, group in long_df.groupby("variable", sort=False)]
+
+
+def _can_reuse(fig, names: list[str], webgl: bool) -> bool:
+    """既存の図のトレース構成が同じで，データだけを差し替えられるか"""
+    trace_type = "scattergl" if webgl else "scatter"
+    return (fig is not None
+            and [trace.name for trace in fig.data] == names
+            and all(trace.type == trace_type for trace in fig.data))
+
+
+@profiled
+def plot_data(df: pd.DataFrame, title: str = "Signal Data", max_points: int | None = None,
+              method: str = "m4", webgl: bool = False, fig=None):
+    """
+    データフレームをインタラクティブなグラフとして描画する．
+    :param df: 描画するデータフレーム [-]
+    :param title: グラフのタイトル
+    :param max_points: 1トレースあたりの最大点数．指定すると各列をピークを残して間引いてから描画する．
+                       表示範囲を狭めてから呼び直すと，その範囲で改めて間引かれる．図をplotly上でズームしても
+                       この関数は呼ばれないため，間引かれた点のまま拡大される [-]
+    :param method: 間引きの方法. "m4" または "lttb" [-]
+    :param webgl: Trueの場合，WebGLで描画するScattergl トレースを使う (点数の多い図でも操作が滑らかになる)
+    :param fig: 以前にplot_dataが返した図．トレース構成が同じ場合は新しく作らず，データとタイトルだけを更新して返す
+    """
+    if df.empty:
+        return px.line(title="データがありません")
+
+    traces = _trace_arrays(df, max_points, method)
+    if _can_reuse(fig, [name for name, _, _ in traces], webgl):
+        # レイアウト・凡例・トレースを作り直さず，データだけを差し替える
+        with fig.batch_update():
+            for trace, (_, x, y) in zip(fig.data, traces):
+                trace.x = x
+                trace.y = y
+            fig.layout.title.text = title
+        return fig
+
+    # 新しい図も上で求めた(間引き済みの)トレースから作り，間引きを2回行わない
+    render_mode = "webgl" if webgl else "svg"
+    long_df = pd.concat([pd.DataFrame({"x": x, "variable": name, "value": y}) for name, x, y in traces],
+                        ignore_index=True)
+    fig = px.line(long_df, x="x", y="value", color="variable", title=title, render_mode=render_mode)
+    fig.update_layout(
+        xaxis_title = 'Time',
+        yaxis_title = 'Value',
+        legend_title = 'Signals'
+    )
+    return fig
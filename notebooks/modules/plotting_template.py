@@ -1,16 +1,16 @@
-import pandas as pd
-import plotly.express as px
-
-# --- 課題2: データ描画関数の実装 ---
-def plot_data(df: pd.DataFrame, title: str = "Signal Data"):
-    """
-    データフレームをインタラクティブなグラフとして描画する．
-
-    ヒント: plotly.express (px) の `line` 関数が便利です．
-           x軸とy軸に何を指定すれば良いか考えてみましょう．
-
-    :param df: 描画するデータフレーム [-]
-    :param title: グラフのタイトル
-    """
-    # === ここに処理を書いてみよう ===
+import pandas as pd
+import plotly.express as px
+
+# --- 課題2: データ描画関数の実装 ---
+def plot_data(df: pd.DataFrame, title: str = "Signal Data"):
+    """
+    データフレームをインタラクティブなグラフとして描画する．
+
+    ヒント: plotly.express (px) の `line` 関数が便利です．
+           x軸とy軸に何を指定すれば良いか考えてみましょう．
+
+    :param df: 描画するデータフレーム [-]
+    :param title: グラフのタイトル
+    """
+    # === ここに処理を書いてみよう ===
     pass  # この行は実装後に削除してください
\ No newline at end of file
@@ -0,0 +1,198 @@
+import functools
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+"""
+このファイルには処理時間を計測するための軽量なプロファイラを書きます．
+apply_* 関数・load_data・plot_data などに @profiled を付けると，プロファイラが有効な間だけ
+呼び出しごとの処理時間・入出力のサイズが記録されます．無効な間はほとんど負荷がかかりません．
+確保したメモリ量 (tracemalloc) は処理が遅くなるため，enable(trace_memory=True) で明示した場合だけ記録します．
+
+環境変数による有効化:
+    BIOSIGNAL_PROFILE=1                         プロファイラを有効にする
+    BIOSIGNAL_PROFILE_OUTPUT=profile.jsonl      有効にした上で，記録を1行1件のJSONとしてファイルに追記する
+    BIOSIGNAL_PROFILE_MEMORY=1                  有効にした上で，確保メモリ量も記録する
+"""
+
+PROFILE_ENV_VAR = "BIOSIGNAL_PROFILE"
+PROFILE_OUTPUT_ENV_VAR = "BIOSIGNAL_PROFILE_OUTPUT"
+PROFILE_MEMORY_ENV_VAR = "BIOSIGNAL_PROFILE_MEMORY"
+PROFILE_COLUMNS = ["name", "depth", "seconds", "input_bytes", "input_shape", "output_bytes", "output_shape",
+                   "allocated_bytes"]
+
+
+def _describe(obj) -> tuple[int | None, tuple | None]:
+    """計測対象の引数・返り値の (バイト数, 形状) を返す．サイズを測れない場合は (None, None)"""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=False).sum()), obj.shape
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes, obj.shape
+    if isinstance(obj, tuple) and obj and isinstance(obj[-1], np.ndarray):
+        # apply_spectrogram のように配列のタプルを返す場合は最後の (最も大きい) 配列を見る
+        return obj[-1].nbytes, obj[-1].shape
+    samples = getattr(obj, "samples", None)
+    if isinstance(samples, np.ndarray):
+        return samples.nbytes, samples.shape
+    if isinstance(obj, str) and os.path.isfile(obj):
+        return os.path.getsize(obj), None
+    return None, None
+
+
+class Profiler:
+    """
+    呼び出しごとの処理時間・入出力サイズ・確保メモリ量を記録するプロファイラ．
+
+    使用例:
+        profiler.enable()
+        with profiler.capture() as records:
+            processed = pipeline.run(raw_data)
+        print(profiler.to_frame(records))
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.output_path = None
+        self.records: list[dict] = []
+        self._captures: list[list[dict]] = []
+        self._stack: list[dict] = []
+
+    def enable(self, trace_memory: bool = False, output_path: str | None = None) -> None:
+        """
+        プロファイラを有効にする．
+
+        :param trace_memory: Trueの場合，tracemallocで各呼び出しの確保メモリ量(ピーク)を記録する (処理は遅くなる)．
+                             Falseの場合 allocated_bytes は None になる
+        :param output_path: 指定した場合，記録を1行1件のJSONとしてこのファイルに追記する
+        """
+        self.enabled = True
+        self.trace_memory = trace_memory
+        if output_path is not None:
+            self.output_path = output_path
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self) -> None:
+        """プロファイラを無効にする (tracemallocを開始していれば停止する)"""
+        self.enabled = False
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.trace_memory = False
+
+    def clear(self) -> None:
+        """これまでの記録を消去する"""
+        self.records.clear()
+
+    @contextmanager
+    def capture(self):
+        """ブロック内で記録された呼び出しだけを集めたリストを返す (アプリの1回の操作分の内訳に使う)"""
+        captured = []
+        self._captures.append(captured)
+        try:
+            yield captured
+        finally:
+            self._captures.remove(captured)
+
+    @contextmanager
+    def section(self, name: str, data=None):
+        """
+        ブロックの処理時間を1件の記録として計測する．プロファイラが無効な場合は何もしない．
+
+        :param name: 記録の名前
+        :param data: 入力サイズとして記録するデータ (省略可)
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        frame = {"name": name, "depth": len(self._stack), "child_peak": 0}
+        frame["input_bytes"], frame["input_shape"] = _describe(data)
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            # 親の区間のピークを退避してからピークをリセットし，この区間のピークだけを測る
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]["child_peak"] = max(self._stack[-1]["child_peak"], peak)
+            tracemalloc.reset_peak()
+            frame["start_memory"] = current
+        self._stack.append(frame)
+
+        t0 = time.perf_counter()
+        try:
+            yield frame
+        finally:
+            seconds = time.perf_counter() - t0
+            self._stack.pop()
+            allocated = None
+            if tracing and tracemalloc.is_tracing():
+                peak = max(tracemalloc.get_traced_memory()[1], frame["child_peak"])
+                allocated = max(0, peak - frame["start_memory"])
+                if self._stack:
+                    self._stack[-1]["child_peak"] = max(self._stack[-1]["child_peak"], peak)
+            output_bytes, output_shape = _describe(frame.get("output"))
+            self._emit({
+                "name": name,
+                "depth": frame["depth"],
+                "seconds": seconds,
+                "input_bytes": frame["input_bytes"],
+                "input_shape": frame["input_shape"],
+                "output_bytes": output_bytes,
+                "output_shape": output_shape,
+                "allocated_bytes": allocated,
+            })
+
+    def _emit(self, record: dict) -> None:
+        self.records.append(record)
+        for captured in self._captures:
+            captured.append(record)
+        if self.output_path is not None:
+            with open(self.output_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({**record, "time": time.time()}, ensure_ascii=False, default=list) + "\n")
+
+    def to_frame(self, records: list[dict] | None = None) -> pd.DataFrame:
+        """
+        記録をデータフレームに変換する．
+
+        :param records: 変換する記録．Noneの場合は全ての記録
+        :return: 列 name, depth, seconds, input_bytes, input_shape, output_bytes, output_shape, allocated_bytes
+        """
+        return pd.DataFrame(self.records if records is None else records, columns=PROFILE_COLUMNS)
+
+
+# アプリ全体で共有するプロファイラ
+profiler = Profiler()
+_trace_memory = os.environ.get(PROFILE_MEMORY_ENV_VAR, "").lower() in ("1", "true", "yes")
+if (os.environ.get(PROFILE_ENV_VAR, "").lower() in ("1", "true", "yes") or os.environ.get(PROFILE_OUTPUT_ENV_VAR)
+        or _trace_memory):
+    profiler.enable(trace_memory=_trace_memory, output_path=os.environ.get(PROFILE_OUTPUT_ENV_VAR) or None)
+
+
+def profiled(func=None, *, name: str | None = None):
+    """
+    関数の呼び出しをプロファイラに記録するデコレータ．最初の引数を入力サイズ，返り値を出力サイズとして記録する．
+
+    :param name: 記録の名前．省略時は関数の修飾名 (例: "apply_fft", "Pipeline.run")
+    """
+    if func is None:
+        return functools.partial(profiled, name=name)
+    record_name = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return func(*args, **kwargs)
+        # メソッドの場合はselfではなく次の引数を入力とみなす
+        offset = 1 if "." in func.__qualname__ else 0
+        data = args[offset] if len(args) > offset else next(iter(kwargs.values()), None)
+        with profiler.section(record_name, data) as frame:
+            result = func(*args, **kwargs)
+            frame["output"] = result
+        return result
+
+    return wrapper
@@ -0,0 +1,251 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .data_loader import build_corpus_index, read_frame
+from .onset import BASELINE_GESTURE
+from .signal_processing import apply_fft, centered_rolling_mean
+
+"""
+このファイルにはデータセットの信号品質を検査(QC)するプログラムを書きます．
+記録ごとに全チャンネルを配列演算でまとめて処理し，飽和(クリッピング)の割合，同じ値が続く区間(フラットライン)，
+電源ノイズ(50 Hz)のパワーの割合，基線の揺れ(ドリフト)，被験者の安静時(neut)の記録に対するSNRを求めます．
+全記録をプロセスプールで並列に検査してチャンネルごとの表にまとめ，しきい値を超えたチャンネルに印を付けます．
+学習を始める前に実行し，問題のあるチャンネルを確認します．
+
+使い方 (notebooksディレクトリで実行):
+    python -m modules.qc --data-dir ../data/15Subjects-7Gestures --output qc_report.csv
+"""
+
+# アームバンドのADCが出力する値の範囲 (8ビット) [-]
+ADC_RANGE = (-128, 127)
+
+QC_METRIC_COLUMNS = ["n_samples", "rms", "clip_ratio", "flat_max_seconds", "flat_ratio", "line_ratio", "drift",
+                     "snr_db"]
+QC_REPORT_COLUMNS = ["subject", "gesture", "gesture_class", "channel"] + QC_METRIC_COLUMNS + ["qc_flags", "bad"]
+
+# 印を付けるしきい値 (指標名 → (比較, しきい値))
+QC_THRESHOLDS = {
+    "clip_ratio": (">", 0.02),        # ADCの上下限に張り付いたサンプルの割合 [-]
+    "flat_max_seconds": (">", 0.5),   # 同じ値が続いた最長の時間 [s]
+    "line_ratio": (">", 0.2),         # 全パワー(直流を除く)に対する電源周波数付近のパワーの割合 [-]
+    "drift": (">", 10.0),             # 1秒移動平均の最大値と最小値の差 [-]
+    "snr_db": ("<", -3.0),            # 安静時に対するRMSの比．安静時より静かな場合は電極の接触不良を疑う [dB]
+}
+QC_FLAG_NAMES = {
+    "clip_ratio": "clipping",
+    "flat_max_seconds": "flatline",
+    "line_ratio": "line_noise",
+    "drift": "drift",
+    "snr_db": "low_snr",
+}
+
+
+def _flat_runs(values: np.ndarray, min_samples: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    チャンネルごとに同じ値が続く区間を求める．
+
+    :return: (最長の区間のサンプル数, min_samples以上続いた区間に含まれるサンプル数の合計) (それぞれチャンネル数)
+    """
+    n_samples, n_channels = values.shape
+    longest = np.ones(n_channels, dtype=np.int64)
+    in_runs = np.zeros(n_channels, dtype=np.int64)
+    if n_samples < 2:
+        return longest, in_runs
+
+    # 前のサンプルと同じ値かどうかを，チャンネルごとに両端をFalseで挟んで立ち上がりと立ち下がりを求める
+    padded = np.zeros((n_channels, n_samples + 1), dtype=np.int8)
+    padded[:, 1:-1] = (values[1:] == values[:-1]).T
+    edges = np.diff(padded, axis=1)
+    channels, starts = np.nonzero(edges == 1)
+    _, stops = np.nonzero(edges == -1)
+    # 「前と同じ」がk個続く区間は k+1 サンプルの平坦区間
+    lengths = stops - starts + 1
+
+    np.maximum.at(longest, channels, lengths)
+    long_runs = lengths >= min_samples
+    in_runs += np.bincount(channels[long_runs], weights=lengths[long_runs], minlength=n_channels).astype(np.int64)
+    return longest, in_runs
+
+
+def recording_quality(data: pd.DataFrame, fs: float, line_freq: float = 50.0, line_bandwidth: float = 1.0,
+                      flat_min_duration: float = 0.1, drift_window: float = 1.0) -> pd.DataFrame:
+    """
+    1つの記録について，チャンネルごとの品質の指標を求める (SNRは安静時の記録が必要なためqc_reportで求める)．
+
+    :param data: 入力データ (数値列のみを使う) [-]
+    :param fs: サンプリング周波数 [Hz]
+    :param line_freq: 電源周波数 [Hz]
+    :param line_bandwidth: 電源周波数の前後この幅のパワーを電源ノイズとみなす [Hz]
+    :param flat_min_duration: flat_ratioに数える平坦区間の最短の長さ [s]
+    :param drift_window: ドリフトを求める移動平均のウィンドウの長さ [s]
+    :return: インデックスがチャンネル名，列が n_samples, rms, clip_ratio, flat_max_seconds, flat_ratio,
+             line_ratio, drift のデータフレーム
+    """
+    if fs <= 0:
+        raise ValueError("サンプリング周波数fsは正の値である必要があります．")
+    if not 0 < line_freq < fs / 2:
+        raise ValueError("電源周波数line_freqは0より大きくナイキスト周波数(fs/2)未満である必要があります．")
+
+    numeric = data.select_dtypes(include=[np.number])
+    values = numeric.to_numpy()
+    n_samples = len(values)
+    if n_samples == 0:
+        raise ValueError("品質の検査には1サンプル以上のデータが必要です．")
+
+    centered = values.astype(np.float64)
+    centered -= centered.mean(axis=0)
+    rms = np.sqrt(np.mean(np.square(centered), axis=0))
+
+    clip_ratio = np.mean((values <= ADC_RANGE[0]) | (values >= ADC_RANGE[1]), axis=0)
+
+    longest, in_runs = _flat_runs(values, max(2, int(round(flat_min_duration * fs))))
+
+    # apply_fftの振幅スペクトルからパワーを求め，直流成分を除いた全パワーに対する電源周波数付近の割合を求める
+    power = np.square(apply_fft(numeric, fs).to_numpy())
+    freqs = np.fft.fftfreq(n_samples, 1 / fs)[:n_samples // 2]
+    line_band = np.abs(freqs - line_freq) <= line_bandwidth
+    total = power[1:].sum(axis=0)
+    line_ratio = np.divide(power[line_band].sum(axis=0), total, out=np.zeros_like(total), where=total > 0)
+
+    window_size = min(n_samples, max(1, int(round(drift_window * fs))))
+    trend = centered_rolling_mean(values.astype(np.float64), window_size)
+    drift = np.ptp(trend, axis=0)
+
+    return pd.DataFrame({
+        "n_samples": n_samples,
+        "rms": rms,
+        "clip_ratio": clip_ratio,
+        "flat_max_seconds": longest / fs,
+        "flat_ratio": in_runs / n_samples,
+        "line_ratio": line_ratio,
+        "drift": drift,
+    }, index=pd.Index([str(c) for c in numeric.columns], name="channel"))
+
+
+def _file_quality(path: str, fs: float, use_cache: bool, options: dict) -> pd.DataFrame:
+    """1つの記録を読み込んで品質の指標を返す(プロセスプールで実行する)"""
+    return recording_quality(read_frame(path, use_cache), fs, **options)
+
+
+def _flag(report: pd.DataFrame, thresholds: dict) -> pd.DataFrame:
+    """しきい値を超えた指標の名前をqc_flags列に，1つでも超えたかどうかをbad列に入れる"""
+    hits = {}
+    for metric, (comparison, limit) in thresholds.items():
+        if comparison not in [">", "<"]:
+            raise ValueError(f"{metric} の比較は '>' または '<' である必要があります．")
+        values = report[metric]
+        hits[QC_FLAG_NAMES.get(metric, metric)] = (values > limit) if comparison == ">" else (values < limit)
+
+    hit_frame = pd.DataFrame(hits, index=report.index).fillna(False).astype(bool)
+    names = np.array(hit_frame.columns)
+    report["qc_flags"] = [",".join(names[row]) for row in hit_frame.to_numpy()]
+    report["bad"] = hit_frame.any(axis=1).to_numpy()
+    return report
+
+
+def qc_report(data_dir: str = "data/15Subjects-7Gestures", fs: float = 200.0, subjects: list[int] | None = None,
+              gestures: list[str] | None = None, n_workers: int | None = None, use_cache: bool = True,
+              thresholds: dict | None = None, line_freq: float = 50.0, line_bandwidth: float = 1.0,
+              flat_min_duration: float = 0.1, drift_window: float = 1.0) -> pd.DataFrame:
+    """
+    データセットの記録をプロセスプールで並列に検査し，チャンネルごとの品質の表を返す．
+    SNRは同じ被験者・チャンネルの安静時(neut)の記録のRMSに対する比で，安静時の記録がない被験者はNaNになる．
+
+    :param data_dir: データセットのルートディレクトリ
+    :param fs: サンプリング周波数 [Hz]
+    :param subjects: 検査する被験者番号のリスト．Noneの場合は全員
+    :param gestures: 検査するジェスチャ名のリスト．Noneの場合は全て (SNRを求めるにはneutを含める)
+    :param n_workers: 並列に検査するプロセス数．Noneの場合はCPUコア数
+    :param use_cache: Trueの場合，最新のバイナリキャッシュがあればそれを使う
+    :param thresholds: 印を付けるしきい値 (指標名 → (">" または "<", しきい値))．Noneの場合はQC_THRESHOLDS
+    :param line_freq: 電源周波数 [Hz]
+    :param line_bandwidth: 電源周波数の前後この幅のパワーを電源ノイズとみなす [Hz]
+    :param flat_min_duration: flat_ratioに数える平坦区間の最短の長さ [s]
+    :param drift_window: ドリフトを求める移動平均のウィンドウの長さ [s]
+    :return: 列がQC_REPORT_COLUMNSのデータフレーム (1行が1記録の1チャンネル)
+    """
+    thresholds = QC_THRESHOLDS if thresholds is None else thresholds
+    index = build_corpus_index(data_dir)
+    if subjects is not None:
+        index = index[index["subject"].isin(subjects)]
+    if gestures is not None:
+        index = index[index["gesture"].isin(gestures)]
+    if index.empty:
+        return pd.DataFrame(columns=QC_REPORT_COLUMNS)
+
+    options = {"line_freq": line_freq, "line_bandwidth": line_bandwidth, "flat_min_duration": flat_min_duration,
+               "drift_window": drift_window}
+    paths = index["path"].tolist()
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, len(paths)))
+
+    if n_workers == 1:
+        tables = [_file_quality(path, fs, use_cache, options) for path in paths]
+    else:
+        n = len(paths)
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            tables = list(executor.map(_file_quality, paths, [fs] * n, [use_cache] * n, [options] * n,
+                                       chunksize=4))
+
+    keys = list(index[["subject", "gesture", "gesture_class"]].itertuples(index=False, name=None))
+    report = pd.concat(tables, keys=keys, names=["subject", "gesture", "gesture_class", "channel"]).reset_index()
+
+    # 同じ被験者・チャンネルの安静時の記録のRMSに対するSNRを求める
+    neutral = report.loc[report["gesture"] == BASELINE_GESTURE, ["subject", "channel", "rms"]]
+    neutral = neutral.groupby(["subject", "channel"], as_index=False)["rms"].mean()
+    report = report.merge(neutral.rename(columns={"rms": "neutral_rms"}), on=["subject", "channel"], how="left")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        report["snr_db"] = 20 * np.log10(report["rms"] / report["neutral_rms"])
+    # 安静時の記録どうしのSNRは意味がないので，しきい値の判定から外す
+    report.loc[report["gesture"] == BASELINE_GESTURE, "snr_db"] = np.nan
+
+    report = _flag(report.drop(columns="neutral_rms"), thresholds)
+    return report[QC_REPORT_COLUMNS]
+
+
+def bad_channels(report: pd.DataFrame) -> pd.DataFrame:
+    """
+    qc_reportの表から印が付いたチャンネルだけを，記録ごとにまとめて返す．
+
+    :param report: qc_reportの返り値
+    :return: 列 subject, gesture, channels (印が付いたチャンネル名のリスト), qc_flags (理由の一覧) のデータフレーム
+    """
+    flagged = report[report["bad"]]
+    if flagged.empty:
+        return pd.DataFrame(columns=["subject", "gesture", "channels", "qc_flags"])
+    return flagged.groupby(["subject", "gesture"], sort=True).agg(
+        channels=("channel", list),
+        qc_flags=("qc_flags", lambda flags: sorted(set(",".join(flags).split(",")))),
+    ).reset_index()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="データセット全体の信号品質を検査する")
+    parser.add_argument("--data-dir", default="../data/15Subjects-7Gestures")
+    parser.add_argument("--fs", type=float, default=200.0)
+    parser.add_argument("--n-workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="品質の表を保存するCSVファイルのパス")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    qc = qc_report(args.data_dir, fs=args.fs, n_workers=args.n_workers)
+    elapsed = time.perf_counter() - t0
+    if args.output is not None:
+        qc.to_csv(args.output, index=False)
+        print(f"✅ 品質の表を {args.output} に保存しました。")
+
+    flagged_recordings = bad_channels(qc)
+    n_recordings = len(qc.groupby(["subject", "gesture"]))
+    if flagged_recordings.empty:
+        print(f"✅ {n_recordings} 件の記録に問題のあるチャンネルはありませんでした。({elapsed:.1f} 秒)")
+    else:
+        print(flagged_recordings.to_string(index=False))
+        print(f"⚠️ {n_recordings} 件の記録のうち {len(flagged_recordings)} 件で "
+              f"{int(qc['bad'].sum())} チャンネルに印が付きました。({elapsed:.1f} 秒)")
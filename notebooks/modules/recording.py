@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+
+"""
+このファイルには信号を保持するコンテナ (Recording) を書きます．
+サンプル配列・サンプリング周波数・開始時刻をまとめて持ち，時間やサンプル番号で指定した区間を
+コピーせずにビューとして切り出せます．signal_processing.py の apply_* 関数はデータフレームの代わりに
+Recording もそのまま受け取れます．
+"""
+
+
+class Recording:
+    """
+    サンプル配列 (サンプル数 × チャンネル数)，サンプリング周波数 fs，開始時刻 t0 を持つ信号コンテナ．
+
+    時間軸は通常 t0 + i / fs の等間隔とみなすが，load_data(time_axis="seconds") で再構成した時間軸のような
+    不等間隔の時刻配列 times を与えることもできる．区間の切り出しは二分探索 (等間隔の場合は計算) で
+    O(log n) で行い，サンプル配列はコピーせずビューを返す．
+
+    使用例:
+        recording = Recording.from_frame(raw_data, fs=200)
+        view = recording.between(1.0, 3.0)  # 1秒から3秒までのビュー (コピーなし)
+        filtered = apply_lowpass_filter(view, cutoff=20, fs=200)
+    """
+
+    def __init__(self, samples: np.ndarray, fs: float, t0: float = 0.0,
+                 channels: list[str] | None = None, times: np.ndarray | None = None):
+        """
+        :param samples: サンプル配列 (サンプル数 × チャンネル数)．1次元の場合は1チャンネルとして扱う [-]
+        :param fs: サンプリング周波数 [Hz]
+        :param t0: 先頭サンプルの時刻 [s]
+        :param channels: チャンネル名のリスト．省略時は "ch1", "ch2", ...
+        :param times: 各サンプルの時刻 (単調増加)．省略時は t0 + i / fs [s]
+        """
+        samples = np.asarray(samples)
+        if samples.ndim == 1:
+            samples = samples[:, np.newaxis]
+        if samples.ndim != 2:
+            raise ValueError("サンプル配列samplesは (サンプル数 × チャンネル数) の2次元配列である必要があります．")
+        if fs <= 0:
+            raise ValueError("サンプリング周波数fsは正の値である必要があります．")
+        if channels is None:
+            channels = [f"ch{i + 1}" for i in range(samples.shape[1])]
+        if len(channels) != samples.shape[1]:
+            raise ValueError("チャンネル名channelsの数はチャンネル数と一致する必要があります．")
+        if times is not None:
+            times = np.asarray(times, dtype=np.float64)
+            if times.shape != (samples.shape[0],):
+                raise ValueError("時刻timesの長さはサンプル数と一致する必要があります．")
+            if len(times):
+                t0 = float(times[0])
+
+        self.samples = samples
+        self.fs = float(fs)
+        self.t0 = float(t0)
+        self.channels = list(channels)
+        self._times = times
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, fs: float) -> "Recording":
+        """
+        データフレームの数値列からRecordingを作る．
+        インデックスが数値(経過時間 [s])の場合はそれを時刻として使い，そうでなければ0秒開始の等間隔とする．
+
+        :param data: 入力データ [-]
+        :param fs: サンプリング周波数 [Hz]
+        """
+        numeric = data.select_dtypes(include=[np.number])
+        times = None
+        if pd.api.types.is_numeric_dtype(data.index) and len(data):
+            times = data.index.to_numpy(dtype=np.float64)
+        return cls(numeric.to_numpy(), fs, channels=[str(c) for c in numeric.columns], times=times)
+
+    def __len__(self) -> int:
+        return self.samples.shape[0]
+
+    def __repr__(self) -> str:
+        return (f"Recording(n_samples={self.n_samples}, n_channels={self.n_channels}, "
+                f"fs={self.fs}, t0={self.t0}, duration={self.duration:.3f})")
+
+    @property
+    def n_samples(self) -> int:
+        return self.samples.shape[0]
+
+    @property
+    def n_channels(self) -> int:
+        return self.samples.shape[1]
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.samples.shape
+
+    @property
+    def empty(self) -> bool:
+        """サンプルがない場合True (データフレームの empty と同じ)"""
+        return self.samples.size == 0
+
+    @property
+    def times(self) -> np.ndarray:
+        """各サンプルの時刻 [s]"""
+        if self._times is not None:
+            return self._times
+        return self.t0 + np.arange(self.n_samples) / self.fs
+
+    @property
+    def duration(self) -> float:
+        """先頭から末尾のサンプルまでの時間 [s]"""
+        if self.n_samples == 0:
+            return 0.0
+        return self._time_at(self.n_samples - 1) - self.t0
+
+    def _time_at(self, index: int) -> float:
+        if self._times is not None:
+            return float(self._times[index])
+        return self.t0 + index / self.fs
+
+    def index_at(self, time: float, side: str = "left") -> int:
+        """
+        時刻をサンプル番号に変換する (np.searchsortedと同じ規則)．
+
+        :param time: 時刻 [s]
+        :param side: "left" の場合は time 以上の最初のサンプル，"right" の場合は time より後の最初のサンプル
+        :return: サンプル番号 (0 以上 n_samples 以下)
+        """
+        if side not in ["left", "right"]:
+            raise ValueError("sideは 'left' または 'right' である必要があります．")
+        if self._times is not None:
+            return int(np.searchsorted(self._times, time, side=side))
+
+        # 等間隔の場合は計算で求め，丸め誤差の分だけ前後を確認する
+        n = self.n_samples
+        index = int(np.clip(np.ceil((time - self.t0) * self.fs), 0, n))
+
+        def before(i):
+            t = self._time_at(i)
+            return t < time if side == "left" else t <= time
+
+        while index > 0 and not before(index - 1):
+            index -= 1
+        while index < n and before(index):
+            index += 1
+        return index
+
+    def window(self, start: int, stop: int) -> "Recording":
+        """
+        サンプル番号 [start, stop) の区間をコピーせずに切り出す．
+
+        :param start: 先頭のサンプル番号 [-]
+        :param stop: 末尾の次のサンプル番号 [-]
+        :return: 元の配列を共有するRecording
+        """
+        start, stop, _ = slice(start, stop).indices(self.n_samples)
+        stop = max(start, stop)
+        if self._times is None:
+            return Recording(self.samples[start:stop], self.fs, t0=self.t0 + start / self.fs, channels=self.channels)
+        return Recording(self.samples[start:stop], self.fs, t0=self.t0, channels=self.channels,
+                         times=self._times[start:stop])
+
+    def between(self, start_time: float, end_time: float) -> "Recording":
+        """
+        時刻 start_time 以上 end_time 以下の区間をコピーせずに切り出す．
+
+        :param start_time: 開始時刻 [s]
+        :param end_time: 終了時刻 [s]
+        :return: 元の配列を共有するRecording
+        """
+        return self.window(self.index_at(start_time, "left"), self.index_at(end_time, "right"))
+
+    def with_samples(self, samples: np.ndarray) -> "Recording":
+        """時間軸とチャンネル名が同じで，サンプル配列だけを置き換えたRecordingを返す"""
+        return Recording(samples, self.fs, t0=self.t0, channels=self.channels, times=self._times)
+
+    def copy(self) -> "Recording":
+        """サンプル配列を複製したRecordingを返す"""
+        return self.with_samples(self.samples.copy())
+
+    def to_frame(self) -> pd.DataFrame:
+        """経過時間 [s] をインデックスとするデータフレームに変換する"""
+        return pd.DataFrame(self.samples, index=pd.Index(self.times, name="time"), columns=self.channels)
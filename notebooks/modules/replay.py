@@ -0,0 +1,213 @@
+import asyncio
+import contextlib
+import inspect
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from .data_loader import build_corpus_index, load_data
+
+"""
+このファイルには記録を実機のアームバンドの代わりに再生するシミュレータを書きます．
+load_dataで読み込んだ記録を，再構成した時間軸に合わせてチャンクごとに1倍速・N倍速・最大速度で送り出し，
+asyncioで多数の仮想的な被験者(ストリーム)を同時に再生します．ストリーミング処理や推論サーバの負荷試験に使い，
+送出の遅れ(ジッタ)と処理のスループットを集計します．
+
+使い方 (notebooksディレクトリで実行):
+    python -m modules.replay --n-streams 50 --speed 10
+"""
+
+REPLAY_CHUNK_SIZE = 20  # 1チャンクのサンプル数 (200 Hz で 0.1 秒)
+REPLAY_STATS_COLUMNS = ["stream", "path", "n_chunks", "n_samples", "elapsed_seconds", "jitter_p50_ms",
+                        "jitter_p99_ms", "jitter_max_ms", "consumer_p50_ms", "consumer_p99_ms",
+                        "samples_per_second"]
+
+
+class ReplaySource:
+    """
+    1つの記録をチャンクに分けて，記録されたときと同じ間隔(のspeed倍)で送り出す再生源．
+    """
+
+    def __init__(self, samples: np.ndarray, times: np.ndarray, chunk_size: int = REPLAY_CHUNK_SIZE,
+                 speed: float | None = 1.0, loop: bool = False):
+        """
+        :param samples: サンプル配列 (サンプル数 × チャンネル数) [-]
+        :param times: 各サンプルの経過時間 (単調増加) [s]
+        :param chunk_size: 1チャンクのサンプル数 [-]
+        :param speed: 再生速度の倍率．Noneの場合は待たずに最大速度で送り出す [-]
+        :param loop: Trueの場合，記録の最後まで送ったら先頭に戻って繰り返す (時刻は続きから数える)
+        """
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise ValueError("チャンクサイズchunk_sizeは正の整数である必要があります．")
+        if speed is not None and speed <= 0:
+            raise ValueError("再生速度speedは正の値かNoneである必要があります．")
+        if len(samples) != len(times):
+            raise ValueError("サンプル配列samplesと時刻timesの長さが一致する必要があります．")
+        self.samples = samples
+        self.times = np.asarray(times, dtype=np.float64)
+        self.chunk_size = chunk_size
+        self.speed = speed
+        self.loop = loop
+        self.jitters: list[float] = []
+
+    @classmethod
+    def from_file(cls, filepath: str, **kwargs) -> "ReplaySource":
+        """
+        load_dataで記録を読み込み，再構成した時間軸で再生する再生源を作る．
+
+        :param filepath: CSVファイルのパス
+        :param kwargs: ReplaySourceの引数 (chunk_size, speed, loop)
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = load_data(filepath, time_axis="seconds")
+        if df.empty:
+            raise ValueError(f"{filepath} を読み込めませんでした．")
+        return cls(df.select_dtypes(include=[np.number]).to_numpy(), df.index.to_numpy(), **kwargs)
+
+    async def chunks(self):
+        """
+        チャンク (サンプル数 × チャンネル数) を順に送り出す非同期ジェネレータ．
+        チャンクは最後のサンプルの時刻に送り出し，予定時刻からの遅れをjittersに記録する．
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        duration = self.times[-1] - self.times[0] + (self.times[1] - self.times[0] if len(self.times) > 1 else 0)
+        offset = 0.0
+        while True:
+            for begin in range(0, len(self.samples), self.chunk_size):
+                stop = min(begin + self.chunk_size, len(self.samples))
+                if self.speed is None:
+                    # 最大速度でも他のストリームに処理を譲る
+                    await asyncio.sleep(0)
+                else:
+                    # 予定時刻は開始時刻からの絶対時刻で決め，待ち時間の誤差が累積しないようにする
+                    due = start + (offset + self.times[stop - 1] - self.times[0]) / self.speed
+                    delay = due - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    self.jitters.append(max(0.0, loop.time() - due))
+                yield self.samples[begin:stop]
+            if not self.loop:
+                return
+            offset += duration
+
+
+async def _consume(stream: int, path: str, source: ReplaySource, consumer, duration: float | None) -> dict:
+    """1つのストリームを再生し，チャンクごとにconsumerを呼んで統計を返す"""
+    consumer_seconds = []
+    n_chunks = 0
+    n_samples = 0
+    t0 = time.perf_counter()
+    async for chunk in source.chunks():
+        t = time.perf_counter()
+        if consumer is not None:
+            result = consumer(stream, chunk)
+            if inspect.isawaitable(result):
+                await result
+        consumer_seconds.append(time.perf_counter() - t)
+        n_chunks += 1
+        n_samples += len(chunk)
+        if duration is not None and time.perf_counter() - t0 >= duration:
+            break
+    elapsed = time.perf_counter() - t0
+
+    jitters = np.array(source.jitters) * 1000
+    consumer_ms = np.array(consumer_seconds) * 1000
+    return {
+        "stream": stream,
+        "path": path,
+        "n_chunks": n_chunks,
+        "n_samples": n_samples,
+        "elapsed_seconds": elapsed,
+        "jitter_p50_ms": float(np.percentile(jitters, 50)) if len(jitters) else None,
+        "jitter_p99_ms": float(np.percentile(jitters, 99)) if len(jitters) else None,
+        "jitter_max_ms": float(jitters.max()) if len(jitters) else None,
+        "consumer_p50_ms": float(np.percentile(consumer_ms, 50)) if len(consumer_ms) else None,
+        "consumer_p99_ms": float(np.percentile(consumer_ms, 99)) if len(consumer_ms) else None,
+        "samples_per_second": n_samples / elapsed if elapsed > 0 else None,
+    }
+
+
+async def replay_many(paths: list[str], consumer=None, n_streams: int | None = None,
+                      chunk_size: int = REPLAY_CHUNK_SIZE, speed: float | None = 1.0, loop: bool = False,
+                      duration: float | None = None) -> pd.DataFrame:
+    """
+    複数の仮想的な被験者(ストリーム)を同時に再生する．ストリームiはpaths[i % len(paths)]の記録を再生する．
+
+    :param paths: 再生する記録のパスのリスト
+    :param consumer: チャンクごとに consumer(ストリーム番号, チャンク) として呼ばれる関数 (コルーチン関数も可)．
+                     Noneの場合は再生だけを行う
+    :param n_streams: 同時に再生するストリーム数．Noneの場合はlen(paths)
+    :param chunk_size: 1チャンクのサンプル数 [-]
+    :param speed: 再生速度の倍率．Noneの場合は最大速度 [-]
+    :param loop: Trueの場合，記録を繰り返し再生する (durationと組み合わせて使う)
+    :param duration: 指定した場合，この時間が経過したストリームから再生を終える [s]
+    :return: ストリームごとの統計 (列はREPLAY_STATS_COLUMNS)
+    """
+    if not paths:
+        raise ValueError("再生する記録のパスpathsが空です．")
+    n_streams = len(paths) if n_streams is None else n_streams
+
+    # 同じ記録を再生するストリームは読み込んだ配列を共有する
+    loaded = {}
+    for path in dict.fromkeys(paths[i % len(paths)] for i in range(n_streams)):
+        loaded[path] = ReplaySource.from_file(path)
+
+    tasks = []
+    for stream in range(n_streams):
+        path = paths[stream % len(paths)]
+        base = loaded[path]
+        source = ReplaySource(base.samples, base.times, chunk_size=chunk_size, speed=speed, loop=loop)
+        tasks.append(_consume(stream, path, source, consumer, duration))
+    return pd.DataFrame(await asyncio.gather(*tasks), columns=REPLAY_STATS_COLUMNS)
+
+
+def summarize_replay(stats: pd.DataFrame) -> dict:
+    """
+    replay_manyの統計を全ストリームについてまとめる．
+
+    :param stats: replay_manyの返り値
+    :return: ストリーム数・合計スループット・ジッタと処理時間の最悪値を持つ辞書
+    """
+    return {
+        "n_streams": len(stats),
+        "total_samples": int(stats["n_samples"].sum()),
+        "total_samples_per_second": float(stats["samples_per_second"].sum()),
+        "jitter_p50_ms": float(stats["jitter_p50_ms"].median()) if stats["jitter_p50_ms"].notna().any() else None,
+        "jitter_p99_ms": float(stats["jitter_p99_ms"].max()) if stats["jitter_p99_ms"].notna().any() else None,
+        "consumer_p99_ms": float(stats["consumer_p99_ms"].max()),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .signal_processing import Pipeline
+    from .streaming import StreamingProcessor
+
+    parser = argparse.ArgumentParser(description="記録を再生してストリーミング処理の負荷を測る")
+    parser.add_argument("--data-dir", default="../data/15Subjects-7Gestures")
+    parser.add_argument("--n-streams", type=int, default=15)
+    parser.add_argument("--speed", type=float, default=1.0, help="再生速度の倍率 (0以下で最大速度)")
+    parser.add_argument("--chunk-size", type=int, default=REPLAY_CHUNK_SIZE)
+    parser.add_argument("--duration", type=float, default=10.0, help="各ストリームを再生する時間 [s]")
+    args = parser.parse_args()
+
+    # 各ストリームに前処理のストリーミングプロセッサを割り当てる
+    pipeline = Pipeline(200).add_highpass(20.0).add_notch(50.0).add_rectification().add_rms_envelope(40)
+    processors = {}
+
+    def process_chunk(stream: int, chunk: np.ndarray) -> None:
+        if stream not in processors:
+            processors[stream] = StreamingProcessor(pipeline, chunk.shape[1])
+        processors[stream].process(chunk)
+
+    index = build_corpus_index(args.data_dir)
+    replay_stats = asyncio.run(replay_many(index["path"].tolist(), process_chunk, n_streams=args.n_streams,
+                                           chunk_size=args.chunk_size,
+                                           speed=args.speed if args.speed > 0 else None,
+                                           loop=True, duration=args.duration))
+    print(replay_stats.drop(columns="path").to_string(index=False))
+    print(summarize_replay(replay_stats))
@@ -0,0 +1,382 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+import joblib
+import numpy as np
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from .features import FEATURE_NAMES, window_features
+from .signal_processing import Pipeline
+from .streaming import StreamingProcessor
+from .training import build_feature_table, default_classifier, default_preprocessing
+
+"""
+このファイルにはジェスチャ推定の推論サーバを書きます．
+クライアント(アームバンド)ごとに生のEMGのチャンクを受け取り，ストリーミング処理で前処理した直近のウィンドウを
+推論キューに入れます．複数のクライアントから同時に届いたウィンドウはマイクロバッチにまとめ，
+特徴量の計算と分類器の予測を1回のベクトル化された呼び出しで行います．
+
+使い方 (notebooksディレクトリで実行):
+    python -m modules.server --train --model model.joblib     # 学習してモデルを保存し，サーバを起動
+    python -m modules.server --model model.joblib --port 8000  # 保存済みのモデルでサーバを起動
+
+エンドポイント:
+    WebSocket /ws       JSON {"samples": [[ch1, ..., ch8], ...]} またはint16のリトルエンディアンのバイト列を送ると
+                        {"prediction": ラベル, "latency_ms": サーバ内の処理時間} が返る
+    POST /predict       JSON {"stream_id": ID, "samples": [[...], ...]} に対して同じ形式で返す
+    DELETE /streams/ID  /predictで使ったストリームの前処理の状態を破棄する
+    GET /metrics        レイテンシのp50/p99・スループット・平均バッチサイズ
+"""
+
+# マイクロバッチの最大サイズと，最初のウィンドウが届いてから待つ最大時間
+MAX_BATCH_SIZE = 64
+MAX_BATCH_WAIT = 0.002  # [s]
+# 統計に使う直近のレイテンシの数
+METRICS_WINDOW = 10_000
+# /predictで保持するストリームの最大数と，最後のリクエストから破棄するまでの時間
+MAX_HTTP_SESSIONS = 1024
+SESSION_IDLE_TIMEOUT = 300.0  # [s]
+
+
+class InferenceModel:
+    """
+    推論に必要な前処理・特徴量の設定と学習済みの分類器をまとめたもの．
+    前処理はStreamingProcessorで因果的に行うため，学習時(ゼロ位相のfiltfilt)とは位相がわずかに異なる．
+    """
+
+    def __init__(self, classifier, pipeline: Pipeline, fs: float, window_size: int,
+                 features: list[str] | None = None, threshold: float = 0.0, n_channels: int = 8):
+        """
+        :param classifier: 学習済みのscikit-learnの分類器
+        :param pipeline: 前処理のパイプライン
+        :param fs: サンプリング周波数 [Hz]
+        :param window_size: 特徴量のウィンドウサイズ [-]
+        :param features: 特徴量名のリスト．Noneの場合はFEATURE_NAMES
+        :param threshold: ゼロ交差数・傾き符号変化数のしきい値 [-]
+        :param n_channels: チャンネル数 [-]
+        """
+        self.classifier = classifier
+        self.pipeline = pipeline
+        self.fs = fs
+        self.window_size = window_size
+        self.features = FEATURE_NAMES if features is None else list(features)
+        self.threshold = threshold
+        self.n_channels = n_channels
+
+    @classmethod
+    def train(cls, data_dir: str = "data/15Subjects-7Gestures", fs: float = 200.0, window_size: int = 40,
+              step: int = 20, classifier=None, target: str = "gesture_class") -> "InferenceModel":
+        """
+        データセットの全被験者で分類器を学習する (特徴量はbuild_feature_tableのキャッシュを使う)．
+
+        :param data_dir: データセットのルートディレクトリ
+        :param fs: サンプリング周波数 [Hz]
+        :param window_size: 特徴量のウィンドウサイズ [-]
+        :param step: ウィンドウをずらす間隔 [-]
+        :param classifier: scikit-learnの分類器．Noneの場合はdefault_classifier
+        :param target: 予測するラベルの列 [-]
+        """
+        pipeline = default_preprocessing(fs)
+        X, labels = build_feature_table(data_dir, fs=fs, window_size=window_size, step=step, pipeline=pipeline)
+        classifier = default_classifier() if classifier is None else classifier
+        classifier.fit(X, labels[target].to_numpy())
+        return cls(classifier, pipeline, fs, window_size, n_channels=X.shape[1] // len(FEATURE_NAMES))
+
+    def save(self, path: str) -> None:
+        """モデルをjoblib形式で保存する"""
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path: str) -> "InferenceModel":
+        """save()で保存したモデルを読み込む"""
+        return joblib.load(path)
+
+    def predict_windows(self, windows: np.ndarray) -> np.ndarray:
+        """
+        前処理済みのウィンドウをまとめて分類する．
+
+        :param windows: ウィンドウの配列 (ウィンドウ数 × ウィンドウサイズ × チャンネル数) [-]
+        :return: 予測ラベルの配列
+        """
+        X = window_features(np.swapaxes(windows, 1, 2), self.fs, features=self.features, threshold=self.threshold)
+        return self.classifier.predict(X)
+
+
+class StreamSession:
+    """1つのクライアントのストリーミング前処理の状態と，直近のウィンドウ"""
+
+    def __init__(self, model: InferenceModel):
+        self.model = model
+        self.processor = StreamingProcessor(model.pipeline, model.n_channels)
+        self.recent = np.empty((0, model.n_channels))
+        self.last_used = time.monotonic()
+
+    def push(self, chunk: np.ndarray) -> np.ndarray | None:
+        """
+        チャンクを前処理し，直近のウィンドウを返す．サンプルがウィンドウサイズに満たない間はNone．
+
+        :param chunk: 生のサンプル (サンプル数 × チャンネル数) [-]
+        """
+        self.last_used = time.monotonic()
+        processed = self.processor.process(chunk)
+        self.recent = np.concatenate((self.recent, processed))[-self.model.window_size:]
+        if len(self.recent) < self.model.window_size:
+            return None
+        return self.recent
+
+
+class LatencyMetrics:
+    """直近のレイテンシとスループットを記録する"""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.started = time.perf_counter()
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.n_predictions = 0
+        self.n_samples = 0
+
+    def record_request(self, latency: float, n_samples: int) -> None:
+        self.latencies.append(latency)
+        self.n_samples += n_samples
+
+    def record_batch(self, batch_size: int) -> None:
+        self.batch_sizes.append(batch_size)
+        self.n_predictions += batch_size
+
+    def summary(self) -> dict:
+        """レイテンシのパーセンタイル [ms] とスループットを返す"""
+        elapsed = time.perf_counter() - self.started
+        latencies = np.array(self.latencies) * 1000
+        return {
+            "n_requests": len(latencies),
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+            "max_ms": float(latencies.max()) if len(latencies) else None,
+            "predictions_per_second": self.n_predictions / elapsed,
+            "samples_per_second": self.n_samples / elapsed,
+            "mean_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else None,
+            "uptime_seconds": elapsed,
+        }
+
+
+class MicroBatcher:
+    """
+    推論要求を待ち行列に集め，最大 max_batch 件または max_wait 秒ごとにまとめて分類する．
+    """
+
+    def __init__(self, model: InferenceModel, metrics: LatencyMetrics, max_batch: int = MAX_BATCH_SIZE,
+                 max_wait: float = MAX_BATCH_WAIT):
+        self.model = model
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, window: np.ndarray):
+        """ウィンドウを待ち行列に入れ，予測ラベルを待つ"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((window, future))
+        return await future
+
+    async def _collect(self) -> list:
+        """最初の要求を待ち，その後はmax_waitの間に届いた要求をmax_batch件まで集める"""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            windows = np.stack([window for window, _ in batch])
+            try:
+                # 特徴量の計算と予測は別スレッドで行い，その間も要求を受け付ける
+                predictions = await asyncio.to_thread(self.model.predict_windows, windows)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.metrics.record_batch(len(batch))
+            for (_, future), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(prediction)
+
+
+def _parse_samples(samples, n_channels: int) -> np.ndarray:
+    """JSONのリスト，またはint16のバイト列をサンプル配列 (サンプル数 × チャンネル数) に変換する"""
+    if isinstance(samples, (bytes, bytearray)):
+        values = np.frombuffer(samples, dtype="<i2")
+    else:
+        values = np.asarray(samples, dtype=np.float64)
+    if values.size % n_channels:
+        raise ValueError(f"サンプル数はチャンネル数({n_channels})の倍数である必要があります．")
+    return values.reshape(-1, n_channels).astype(np.float64)
+
+
+def create_app(model: InferenceModel, max_batch: int = MAX_BATCH_SIZE, max_wait: float = MAX_BATCH_WAIT,
+               max_sessions: int = MAX_HTTP_SESSIONS, idle_timeout: float = SESSION_IDLE_TIMEOUT) -> Starlette:
+    """
+    推論サーバのStarletteアプリケーションを作る．
+
+    :param model: 推論に使うモデル
+    :param max_batch: マイクロバッチの最大サイズ [-]
+    :param max_wait: マイクロバッチを集める最大の待ち時間 [s]
+    :param max_sessions: /predictで保持するストリームの最大数．超えた場合は最も長く使われていないものから破棄する [-]
+    :param idle_timeout: /predictのストリームをこの時間使われなかったら破棄する [s]
+    """
+    if not isinstance(max_sessions, int) or max_sessions <= 0:
+        raise ValueError("ストリームの最大数max_sessionsは正の整数である必要があります．")
+    metrics = LatencyMetrics()
+    batcher = MicroBatcher(model, metrics, max_batch=max_batch, max_wait=max_wait)
+    # 使われた順に並べ，先頭が最も長く使われていないストリーム
+    sessions: OrderedDict[str, StreamSession] = OrderedDict()
+
+    def get_session(stream_id: str) -> StreamSession:
+        """ストリームの状態を返す．なければ作り，古いストリームと上限を超えた分を破棄する"""
+        now = time.monotonic()
+        while sessions:
+            oldest_id, oldest = next(iter(sessions.items()))
+            idle = now - oldest.last_used > idle_timeout
+            full = stream_id not in sessions and len(sessions) >= max_sessions
+            if not (idle or full):
+                break
+            del sessions[oldest_id]
+
+        session = sessions.get(stream_id)
+        if session is None:
+            session = sessions[stream_id] = StreamSession(model)
+        sessions.move_to_end(stream_id)
+        return session
+
+    async def infer(session: StreamSession, samples) -> dict:
+        t0 = time.perf_counter()
+        chunk = _parse_samples(samples, model.n_channels)
+        window = session.push(chunk)
+        prediction = None if window is None else await batcher.submit(window)
+        latency = time.perf_counter() - t0
+        metrics.record_request(latency, len(chunk))
+        return {
+            "prediction": None if prediction is None else str(prediction),
+            "latency_ms": latency * 1000,
+        }
+
+    async def predict(request: Request) -> JSONResponse:
+        try:
+            body = await request.json()
+            stream_id = str(body.get("stream_id", "default"))
+            samples = body["samples"]
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            return JSONResponse({"error": f"リクエストの形式が正しくありません: {e!r}"}, status_code=400)
+        try:
+            return JSONResponse(await infer(get_session(stream_id), samples))
+        except (ValueError, TypeError) as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+    async def close_stream(request: Request) -> JSONResponse:
+        closed = sessions.pop(request.path_params["stream_id"], None) is not None
+        return JSONResponse({"closed": closed}, status_code=200 if closed else 404)
+
+    async def websocket_endpoint(websocket: WebSocket) -> None:
+        await websocket.accept()
+        # 接続ごとに前処理の状態を持つ
+        session = StreamSession(model)
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                # 不正なメッセージにはエラーを返し，接続は閉じない
+                try:
+                    if message.get("bytes") is not None:
+                        samples = message["bytes"]
+                    else:
+                        samples = json.loads(message["text"])["samples"]
+                    response = await infer(session, samples)
+                except (ValueError, KeyError, TypeError) as e:
+                    response = {"error": f"メッセージを処理できません: {e!r}"}
+                await websocket.send_json(response)
+        except WebSocketDisconnect:
+            pass
+
+    async def metrics_endpoint(request: Request) -> JSONResponse:
+        return JSONResponse({**metrics.summary(), "n_sessions": len(sessions)})
+
+    async def health(request: Request) -> JSONResponse:
+        return JSONResponse({"status": "ok"})
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await batcher.start()
+        yield
+        await batcher.stop()
+
+    app = Starlette(
+        routes=[
+            Route("/predict", predict, methods=["POST"]),
+            Route("/streams/{stream_id}", close_stream, methods=["DELETE"]),
+            Route("/metrics", metrics_endpoint),
+            Route("/health", health),
+            WebSocketRoute("/ws", websocket_endpoint),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.model = model
+    app.state.metrics = metrics
+    app.state.batcher = batcher
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="ジェスチャ推定の推論サーバ")
+    parser.add_argument("--model", default="model.joblib", help="モデルファイルのパス")
+    parser.add_argument("--train", action="store_true", help="データセットで学習してモデルを保存してから起動する")
+    parser.add_argument("--data-dir", default="../data/15Subjects-7Gestures")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_BATCH_WAIT * 1000)
+    args = parser.parse_args()
+
+    if args.train:
+        InferenceModel.train(args.data_dir).save(args.model)
+        print(f"✅ モデルを保存しました: {args.model}")
+    inference_model = InferenceModel.load(args.model)
+    uvicorn.run(create_app(inference_model, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000),
+                host=args.host, port=args.port)
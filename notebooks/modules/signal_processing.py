@@ -1,301 +1,1029 @@
-import numpy as np
-import pandas as pd
-from scipy.signal import butter, filtfilt, iirnotch, resample
-from scipy.fft import fft, fftfreq
-
-"""
-このファイルには信号処理のプログラムを書きます．
-今回はデータフレームを受け取り，信号処理を施し，信号処理済みのデータフフレームを返す関数を作る形で実装します．
-今回扱った以外の信号処理を追加したい場合も，入力と出力の型をPandasのデータフレームにすれば問題なく動作します．
-"""
-
-def apply_lowpass_filter(data: pd.DataFrame, cutoff: float, fs:float, order: int = 4) -> pd.DataFrame:
-    """
-    データフレームの各列にローパスフィルタを適用し，処理後のデータフレームを返す．
-
-    :param data: 入力データ [-]
-    :param cutoff: カットオフ周波数 [Hz]
-    :param fs: サンプリング周波数 [Hz]
-    :param order: フィルタの次数 [-]
-    :return: フィルタ処理後のデータ [-]
-    """
-    # --- 安全性チェック ---
-    if data.empty:
-        return data.copy()
-    if fs <= 0:
-        raise ValueError("サンプリング周波数fsは正の値である必要があります．")
-    if not 0 < cutoff < fs / 2:
-        raise ValueError("カットオフ周波数cutoffは0とナイキスト周波数(fs/2)の間である必要があります．")
-    if not isinstance(order, int) or order <= 0:
-        raise ValueError("フィルタの次数orderは正の整数である必要があります．")
-
-    # 数値列のみを処理対象とする
-    numeric_cols = data.select_dtypes(include=[np.number]).columns
-    if len(numeric_cols) == 0:
-        return data.copy() # 処理対象の列がない場合はそのまま返す
-
-    # フィルタ設計
-    nyq = 0.5 * fs
-    normal_cutoff = cutoff / nyq
-    b, a = butter(order, normal_cutoff, btype="low", analog=False)
-
-    # フィルタ適用
-    result = data.copy()
-    result[numeric_cols] = data[numeric_cols].apply(lambda col: filtfilt(b, a, col))
-
-    return result
-
-
-def apply_highpass_filter(data: pd.DataFrame, cutoff: float, fs: float, order: int = 4) -> pd.DataFrame:
-    """
-    データフレームの各列にローパスフィルタを適用し，処理後のデータフレームを返す．
-
-    :param data: 入力データ [-]
-    :param cutoff: カットオフ周波数 [Hz]
-    :param fs: サンプリング周波数 [Hz]
-    :param order: フィルタの次数 [-]
-    :return: フィルタ処理後のデータ [-]
-    """
-    # --- 安全性チェック ---
-    if data.empty:
-        return data.copy()
-    if fs <= 0:
-        raise ValueError("サンプリング周波数fsは正の値である必要があります．")
-    if not 0 < cutoff < fs / 2:
-        raise ValueError("カットオフ周波数cutoffは0とナイキスト周波数(fs/2)の間である必要があります．")
-    if not isinstance(order, int) or order <= 0:
-        raise ValueError("フィルタの次数orderは正の整数である必要があります．")
-
-    # 数値列のみを処理対象とする
-    numeric_cols = data.select_dtypes(include=[np.number]).columns
-    if len(numeric_cols) == 0:
-        return data.copy()
-
-    # フィルタ設計
-    nyq = 0.5 * fs
-    normal_cutoff = cutoff / nyq
-    b, a = butter(order, normal_cutoff, btype="high", analog=False)
-
-    # フィルタ適用
-    result = data.copy()
-    result[numeric_cols] = data[numeric_cols].apply(lambda col: filtfilt(b, a, col))
-
-    return result
-
-
-def apply_notch_filter(data: pd.DataFrame, fs: float, notch_freq: float = 50.0, quality: float = 30) -> pd.DataFrame:
-    """
-    ノッチフィルタで商用電源ノイズ（50Hz）を除去
-
-    :param data: 入力データ [-]
-    :param fs: サンプリング周波数 [Hz]
-    :param notch_freq: 除去したい周波数 [Hz]
-    :param quality: Q値の鋭さ
-    :return: フィルタ処理後のデータ [-]
-    """
-    # --- 安全性チェック ---
-    if data.empty:
-        return data.copy()
-    if fs <= 0:
-        raise ValueError("サンプリング周波数fsは正の値である必要があります．")
-    if not 0 < notch_freq < fs / 2:
-        raise ValueError("除去したい周波数notch_freqは0とナイキスト周波数(fs/2)の間である必要があります．")
-    if quality <= 0:
-        raise ValueError("Q値qualityは正の値である必要があります．")
-
-    # 数値列のみを処理対象とする
-    numeric_cols = data.select_dtypes(include=[np.number]).columns
-    if len(numeric_cols) == 0:
-        return data.copy()
-
-    # ノッチフィルタの設計
-    b, a = iirnotch(notch_freq, quality, fs)
-
-    # フィルタ適用
-    result = data.copy()
-    result[numeric_cols] = data[numeric_cols].apply(lambda col: filtfilt(b, a, col))
-
-    return result
-
-
-def apply_moving_average(data: pd.DataFrame, window_size: int) -> pd.DataFrame:
-    """
-    データフレームの各列に移動平均を適用し，処理後のデータフレームを返す．
-
-    :param data:入力データ [-]
-    :param window_size: 移動平均のウィンドウサイズ [-]
-    :return: 平滑処理後のデータ [-]
-    """
-    # --- 安全性チェック ---
-    if data.empty:
-        return data.copy()
-    if not isinstance(window_size, int) or window_size <= 0:
-        raise ValueError("ウィンドウサイズwindow_sizeは正の整数である必要があります．")
-
-    # 数値列のみを処理対象とする
-    numeric_cols = data.select_dtypes(include=[np.number]).columns
-    if len(numeric_cols) == 0:
-        return data.copy()
-
-
-    # 移動平均を適用
-    result = data.copy()
-    result[numeric_cols] = data[numeric_cols].rolling(
-        window=window_size,
-        center=True,
-        min_periods=1
-    ).mean()
-
-    return result
-
-
-def apply_rms_envelope(data: pd.DataFrame, window_size: int) -> pd.DataFrame:
-    """
-    RMSエンベロープを適用し，処理後のデータフレームを返す．．
-
-    :param data: 入力データ [-]
-    :param window_size: 移動RMSのウィンドウサイズ [-]
-    :return: RMSエンベロープ [-]
-    """
-    # --- 安全性チェック ---
-    if data.empty:
-        return data.copy()
-    if not isinstance(window_size, int) or window_size <= 0:
-        raise ValueError("ウィンドウサイズwindow_sizeは正の整数である必要があります．")
-
-    # 数値列のみを処理対象とする
-    numeric_cols = data.select_dtypes(include=[np.number]).columns
-    if len(numeric_cols) == 0:
-        return data.copy()
-
-    # 移動RMSウィンドウ
-    result = data.copy()
-    result[numeric_cols] = data[numeric_cols].rolling(window=window_size, center=True, min_periods=1).apply(
-        lambda x: np.sqrt(np.mean(x**2)),
-        raw=True # 生のNumpy配列をラムダ関数に渡すことで高速化
-    )
-    return result
-
-
-def apply_rectification(data: pd.DataFrame, method: str = "full") -> pd.DataFrame:
-    """
-    全波整流または半波整流を適用し，処理後のデータフレームを返す．
-
-    :param data: 入力データ [-]
-    :param method: 整流の方法. "full" (全波) または "half" (半波) [-]
-    :return: 整流後のデータ [-]
-    """
-    # --- 安全性チェック ---
-    if data.empty:
-        return data.copy()
-    if method not in ["full", "half"]:
-        raise ValueError("methodは 'full' または 'half' である必要があります．")
-
-    # 数値列のみを処理対象とする
-    numeric_cols = data.select_dtypes(include=[np.number]).columns
-    if len(numeric_cols) == 0:
-        return data.copy()
-
-    result = data.copy()
-    if method == "full":
-        result[numeric_cols] = data[numeric_cols].abs()
-    elif method == "half":
-        result[numeric_cols] = data[numeric_cols].clip(lower=0)
-
-    return result
-
-
-def apply_resampling(data: pd.DataFrame, original_fs: float, target_fs: float) -> pd.DataFrame:
-    """
-    データフレームの各列を指定したサンプリング周波数でリサンプリングし，処理後のデータフレームを返す．
-    :param data: 入力データ [-]
-    :param original_fs: 元のサンプリング周波数 [Hz]
-    :param target_fs: 目標のサンプリング周波数 [Hz]
-    :return: リサンプリング処理後のデータ [-]
-    """
-    # --- 安全性チェック ---
-    if data.empty:
-        return data.copy()
-    if original_fs <= 0 or target_fs <= 0:
-        raise ValueError("サンプリング周波数は正の値である必要があります．")
-
-    if original_fs == target_fs:
-        return data.copy()
-
-    # 元のサンプル数
-    original_length = len(data)
-
-    # 新しいサンプル数
-    new_length = int(original_length * target_fs / original_fs)
-
-    # サンプル数が変わらない場合はそのまま返す
-    if new_length == original_length:
-        return data.copy()
-
-    # 数値列のみを取得
-    numeric_columns = data.select_dtypes(include=[np.number]).columns
-
-    # 結果用のデータフレームを作成
-    result = pd.DataFrame()
-
-    # 各数値列にリサンプリングを適用
-    for col in numeric_columns:
-        resampled_signal = resample(data[col].values, new_length)
-        result[col] = resampled_signal
-
-    # 数値インデックスを再設定
-    new_time_interval = 1.0 / target_fs
-    result.index = np.arange(new_length) * new_time_interval
-
-    return result
-
-
-def apply_fft(data: pd.DataFrame, fs: float, return_magnitude: bool = True) -> pd.DataFrame:
-    """
-    データフレームの各列にFFTを適用し，周波数領域のデータフレームを返す．
-
-    :param data: 入力データ(時間領域) [-]
-    :param fs: サンプリング周波数 [Hz]
-    :param return_magnitude: Trueの場合振幅スペクトル，Falseの場合複素数スペクトルを返す [-]
-    :return: FFT処理後のデータ(周波数領域) [-]
-    """
-
-    # --- 安全性チェック ---
-    if data.empty:
-        return data.copy()
-    if fs <= 0:
-        raise ValueError("サンプリング周波数fsは正の値である必要があります．")
-
-    # 数値列のみを取得
-    numeric_columns = data.select_dtypes(include=[np.number]).columns
-
-    # 結果用のデータフレームを作成
-    result = pd.DataFrame()
-
-    # データ長を取得
-    n_samples= len(data)
-
-    # 周波数軸を作成(正の周波数のみ)
-    freqs = fftfreq(n_samples, 1 / fs)[:n_samples // 2]
-
-    # 各数値列にFFTを適用
-    for col in numeric_columns:
-        # FFTを実行
-        fft_values = fft(data[col].values)
-
-        # 正の周波数成分のみを取得
-        fft_positive = fft_values[:n_samples // 2]
-
-        if return_magnitude:
-            # 振幅スペクトルを計算
-            magnitude = np.abs(fft_positive)
-            magnitude[1:] *= 2 # 直流成分以外を2倍にして片側スペクトルに変換
-            result[col] = magnitude
-        else:
-            # 複素数スペクトルをそのまま返す
-            result[col] = fft_positive
-
-    # 周波数軸をインデックスに設定
-    result.index = freqs
-
-    return result
\ No newline at end of file
+from collections import OrderedDict
+from fractions import Fraction
+from functools import lru_cache
+from typing import Hashable, NamedTuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import butter, firwin, get_window, iirnotch, resample, resample_poly, sosfilt, sosfilt_zi, tf2sos
+from scipy.fft import fft, fftfreq, rfft, rfftfreq
+
+from .profiling import profiled
+from .recording import Recording
+
+"""
+このファイルには信号処理のプログラムを書きます．
+今回はデータフレームを受け取り，信号処理を施し，信号処理済みのデータフフレームを返す関数を作る形で実装します．
+今回扱った以外の信号処理を追加したい場合も，入力と出力の型をPandasのデータフレームにすれば問題なく動作します．
+apply_* 関数はデータフレームの代わりに Recording (recording.py) も受け取り，その場合はサンプル配列を直接処理して
+Recording を返します．
+"""
+
+
+# --- フィルタ設計のキャッシュ ---
+# インタラクティブアプリではウィジェットが変わるたびに同じパラメータでフィルタが設計されるため，
+# 設計結果を (種類, カットオフ, 次数, fs) をキーとしたLRUキャッシュに保持する．
+FILTER_DESIGN_CACHE_SIZE = 128
+
+
+class FilterDesign(NamedTuple):
+    """設計済みフィルタの係数 (読み取り専用配列)"""
+    sos: np.ndarray  # 2次セクション係数 (セクション数 × 6)
+    b: np.ndarray    # 伝達関数の分子係数
+    a: np.ndarray    # 伝達関数の分母係数
+    zi: np.ndarray   # sosfilt_ziによる初期状態 (セクション数 × 2)
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array = np.ascontiguousarray(array, dtype=np.float64)
+    array.setflags(write=False)
+    return array
+
+
+@lru_cache(maxsize=FILTER_DESIGN_CACHE_SIZE)
+def _design_filter_cached(filter_type: str, cutoff: float, order: float, fs: float) -> FilterDesign:
+    if filter_type == "notch":
+        # ノッチフィルタでは次数の代わりにQ値をキーに用いる
+        b, a = iirnotch(cutoff, order, fs)
+        sos = tf2sos(b, a)
+    else:
+        normal_cutoff = cutoff / (0.5 * fs)
+        b, a = butter(int(order), normal_cutoff, btype=filter_type, analog=False)
+        sos = butter(int(order), normal_cutoff, btype=filter_type, analog=False, output="sos")
+
+    return FilterDesign(sos=_readonly(sos), b=_readonly(b), a=_readonly(a), zi=_readonly(sosfilt_zi(sos)))
+
+
+def design_filter(filter_type: str, cutoff: float, fs: float, order: int = 4, quality: float = 30) -> FilterDesign:
+    """
+    フィルタを設計し，SOS係数・伝達関数係数・初期状態ベクトルを返す．
+    同じパラメータでの設計結果はLRUキャッシュから返される．
+
+    :param filter_type: フィルタの種類. "low", "high" または "notch" [-]
+    :param cutoff: カットオフ周波数 (ノッチフィルタでは除去したい周波数) [Hz]
+    :param fs: サンプリング周波数 [Hz]
+    :param order: フィルタの次数 (ノッチフィルタでは無視される) [-]
+    :param quality: Q値の鋭さ (ノッチフィルタのみ使用) [-]
+    :return: 設計済みフィルタ (配列は読み取り専用)
+    """
+    if filter_type not in ["low", "high", "notch"]:
+        raise ValueError("filter_typeは 'low', 'high' または 'notch' である必要があります．")
+    if filter_type == "notch":
+        return _design_filter_cached(filter_type, float(cutoff), float(quality), float(fs))
+    return _design_filter_cached(filter_type, float(cutoff), int(order), float(fs))
+
+
+def filter_design_cache_info():
+    """
+    フィルタ設計キャッシュのヒット・ミス統計を返す．
+
+    :return: functools.lru_cacheのCacheInfo (hits, misses, maxsize, currsize)
+    """
+    return _design_filter_cached.cache_info()
+
+
+def clear_filter_design_cache() -> None:
+    """フィルタ設計キャッシュと統計を消去する．"""
+    _design_filter_cached.cache_clear()
+
+
+def _sosfiltfilt(sos: np.ndarray, zi: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    事前に計算した初期状態ベクトルziを用いて，2次元配列の axis=0 方向にゼロ位相フィルタを適用する．
+    `scipy.signal.sosfiltfilt` (padtype="odd") と同じ処理だが，ziを毎回計算し直さない．
+
+    :param sos: 2次セクション係数 [-]
+    :param zi: sosfilt_zi(sos) の結果 [-]
+    :param values: 入力配列 (サンプル数 × チャンネル数) [-]
+    :return: フィルタ処理後の配列 [-]
+    """
+    ntaps = 2 * sos.shape[0] + 1
+    ntaps -= min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum())
+    edge = 3 * ntaps
+    if values.shape[0] <= edge:
+        raise ValueError(f"データ長はフィルタのパディング長({edge})より長い必要があります．")
+
+    # 奇対称拡張で両端をパディング
+    ext = np.concatenate((
+        2 * values[:1] - values[edge:0:-1],
+        values,
+        2 * values[-1:] - values[-2:-(edge + 2):-1],
+    ))
+
+    # sosfiltは書き込み可能な係数配列を要求するため，キャッシュ済みの読み取り専用配列を複製する
+    # (係数は入力と同じ型にそろえ，float32の入力をfloat32のまま処理する)
+    sos = np.array(sos, dtype=values.dtype)
+    zi = zi.astype(values.dtype)[:, :, np.newaxis]
+    y, _ = sosfilt(sos, ext, axis=0, zi=zi * ext[0])
+    y, _ = sosfilt(sos, y[::-1], axis=0, zi=zi * y[-1])
+    return y[::-1][edge:-edge]
+
+
+def _apply_iir(data: pd.DataFrame | Recording, design: FilterDesign) -> pd.DataFrame | Recording:
+    """設計済みフィルタをデータフレームの数値列(またはRecordingのサンプル配列)にまとめて適用する"""
+    if isinstance(data, Recording):
+        return data.with_samples(_sosfiltfilt(design.sos, design.zi, data.samples.astype(np.float64)))
+
+    numeric_cols = data.select_dtypes(include=[np.number]).columns
+    if len(numeric_cols) == 0:
+        return data.copy() # 処理対象の列がない場合はそのまま返す
+
+    values = data[numeric_cols].to_numpy(dtype=np.float64)
+    result = data.copy()
+    result[numeric_cols] = _sosfiltfilt(design.sos, design.zi, values)
+    return result
+
+
+def centered_rolling_mean(values: np.ndarray, window_size: int, step: int = 1) -> np.ndarray:
+    """
+    2次元配列の各列に中心化移動平均(min_periods=1)を累積和で計算する．
+    pandasの`rolling(window, center=True, min_periods=1).mean()`と同じ窓の取り方をする．
+
+    :param values: 入力配列 (サンプル数 × チャンネル数) [-]
+    :param window_size: ウィンドウサイズ [-]
+    :param step: 出力するサンプルの間隔．2以上の場合はstepごとの値のみを計算する [-]
+    :return: 移動平均 (行数は ceil(サンプル数 / step))．入力がfloat32の場合はfloat32 [-]
+    """
+    n_samples = values.shape[0]
+    cumsum = np.zeros((n_samples + 1,) + values.shape[1:], dtype=np.float64)
+    np.cumsum(values, axis=0, out=cumsum[1:])
+
+    # サンプルiの窓は [i - window_size//2, i + (window_size-1)//2]
+    idx = np.arange(0, n_samples, step)
+    lo = np.clip(idx - window_size // 2, 0, n_samples)
+    hi = np.clip(idx + (window_size - 1) // 2 + 1, 0, n_samples)
+    counts = (hi - lo).reshape((-1,) + (1,) * (values.ndim - 1))
+
+    # 累積和は桁落ちを避けるため常にfloat64で計算し，出力だけを入力の型に戻す
+    result = (cumsum[hi] - cumsum[lo]) / counts
+    return result.astype(np.float32) if values.dtype == np.float32 else result
+
+
+def centered_rolling_rms(values: np.ndarray, window_size: int, step: int = 1) -> np.ndarray:
+    """
+    2次元配列の各列に中心化移動RMS(min_periods=1)を累積和で計算する．O(n)で窓長に依存しない．
+
+    :param values: 入力配列 (サンプル数 × チャンネル数) [-]
+    :param window_size: ウィンドウサイズ [-]
+    :param step: 出力するサンプルの間隔 [-]
+    :return: 移動RMS [-]
+    """
+    mean_square = centered_rolling_mean(np.square(values, dtype=np.float64), window_size, step)
+    # 累積和の差による丸め誤差で僅かに負になる場合があるため0で下限を切る
+    np.maximum(mean_square, 0, out=mean_square)
+    rms = np.sqrt(mean_square)
+    return rms.astype(np.float32) if values.dtype == np.float32 else rms
+
+@profiled
+def apply_lowpass_filter(data: pd.DataFrame | Recording, cutoff: float, fs:float, order: int = 4) -> pd.DataFrame | Recording:
+    """
+    データフレームの各列にローパスフィルタを適用し，処理後のデータフレームを返す．
+
+    :param data: 入力データ [-]
+    :param cutoff: カットオフ周波数 [Hz]
+    :param fs: サンプリング周波数 [Hz]
+    :param order: フィルタの次数 [-]
+    :return: フィルタ処理後のデータ [-]
+    """
+    # --- 安全性チェック ---
+    if data.empty:
+        return data.copy()
+    if fs <= 0:
+        raise ValueError("サンプリング周波数fsは正の値である必要があります．")
+    if not 0 < cutoff < fs / 2:
+        raise ValueError("カットオフ周波数cutoffは0とナイキスト周波数(fs/2)の間である必要があります．")
+    if not isinstance(order, int) or order <= 0:
+        raise ValueError("フィルタの次数orderは正の整数である必要があります．")
+
+    # フィルタ設計(キャッシュ済み)と適用
+    design = design_filter("low", cutoff, fs, order=order)
+    return _apply_iir(data, design)
+
+
+@profiled
+def apply_highpass_filter(data: pd.DataFrame | Recording, cutoff: float, fs: float, order: int = 4) -> pd.DataFrame | Recording:
+    """
+    データフレームの各列にローパスフィルタを適用し，処理後のデータフレームを返す．
+
+    :param data: 入力データ [-]
+    :param cutoff: カットオフ周波数 [Hz]
+    :param fs: サンプリング周波数 [Hz]
+    :param order: フィルタの次数 [-]
+    :return: フィルタ処理後のデータ [-]
+    """
+    # --- 安全性チェック ---
+    if data.empty:
+        return data.copy()
+    if fs <= 0:
+        raise ValueError("サンプリング周波数fsは正の値である必要があります．")
+    if not 0 < cutoff < fs / 2:
+        raise ValueError("カットオフ周波数cutoffは0とナイキスト周波数(fs/2)の間である必要があります．")
+    if not isinstance(order, int) or order <= 0:
+        raise ValueError("フィルタの次数orderは正の整数である必要があります．")
+
+    # フィルタ設計(キャッシュ済み)と適用
+    design = design_filter("high", cutoff, fs, order=order)
+    return _apply_iir(data, design)
+
+
+@profiled
+def apply_notch_filter(data: pd.DataFrame | Recording, fs: float, notch_freq: float = 50.0, quality: float = 30) -> pd.DataFrame | Recording:
+    """
+    ノッチフィルタで商用電源ノイズ（50Hz）を除去
+
+    :param data: 入力データ [-]
+    :param fs: サンプリング周波数 [Hz]
+    :param notch_freq: 除去したい周波数 [Hz]
+    :param quality: Q値の鋭さ
+    :return: フィルタ処理後のデータ [-]
+    """
+    # --- 安全性チェック ---
+    if data.empty:
+        return data.copy()
+    if fs <= 0:
+        raise ValueError("サンプリング周波数fsは正の値である必要があります．")
+    if not 0 < notch_freq < fs / 2:
+        raise ValueError("除去したい周波数notch_freqは0とナイキスト周波数(fs/2)の間である必要があります．")
+    if quality <= 0:
+        raise ValueError("Q値qualityは正の値である必要があります．")
+
+    # ノッチフィルタの設計(キャッシュ済み)と適用
+    design = design_filter("notch", notch_freq, fs, quality=quality)
+    return _apply_iir(data, design)
+
+
+@profiled
+def apply_moving_average(data: pd.DataFrame | Recording, window_size: int) -> pd.DataFrame | Recording:
+    """
+    データフレームの各列に移動平均を適用し，処理後のデータフレームを返す．
+
+    :param data:入力データ [-]
+    :param window_size: 移動平均のウィンドウサイズ [-]
+    :return: 平滑処理後のデータ [-]
+    """
+    # --- 安全性チェック ---
+    if data.empty:
+        return data.copy()
+    if not isinstance(window_size, int) or window_size <= 0:
+        raise ValueError("ウィンドウサイズwindow_sizeは正の整数である必要があります．")
+
+    if isinstance(data, Recording):
+        return data.with_samples(centered_rolling_mean(data.samples.astype(np.float64), window_size))
+
+    # 数値列のみを処理対象とする
+    numeric_cols = data.select_dtypes(include=[np.number]).columns
+    if len(numeric_cols) == 0:
+        return data.copy()
+
+
+    # 移動平均を適用
+    result = data.copy()
+    result[numeric_cols] = data[numeric_cols].rolling(
+        window=window_size,
+        center=True,
+        min_periods=1
+    ).mean()
+
+    return result
+
+
+@profiled
+def apply_rms_envelope(data: pd.DataFrame | Recording, window_size: int, decimation: int = 1) -> pd.DataFrame | Recording:
+    """
+    RMSエンベロープを適用し，処理後のデータフレームを返す．
+    累積和を用いて計算するため，窓長に関係なくO(n)で処理できる．
+
+    :param data: 入力データ [-]
+    :param window_size: 移動RMSのウィンドウサイズ [-]
+    :param decimation: 間引き率．2以上の場合はdecimationサンプルごとのエンベロープ値のみを返す [-]
+    :return: RMSエンベロープ [-]
+    """
+    # --- 安全性チェック ---
+    if data.empty:
+        return data.copy()
+    if not isinstance(window_size, int) or window_size <= 0:
+        raise ValueError("ウィンドウサイズwindow_sizeは正の整数である必要があります．")
+    if not isinstance(decimation, int) or decimation <= 0:
+        raise ValueError("間引き率decimationは正の整数である必要があります．")
+
+    if isinstance(data, Recording):
+        envelope = centered_rolling_rms(data.samples, window_size, step=decimation)
+        if decimation == 1:
+            return data.with_samples(envelope)
+        times = data.times[::decimation] if data._times is not None else None
+        return Recording(envelope, data.fs / decimation, t0=data.t0, channels=data.channels, times=times)
+
+    # 数値列のみを処理対象とする
+    numeric_cols = data.select_dtypes(include=[np.number]).columns
+    if len(numeric_cols) == 0:
+        return data.copy()
+
+    # 移動RMSウィンドウ
+    result = data.iloc[::decimation].copy()
+    values = data[numeric_cols].to_numpy(dtype=np.float64)
+    result[numeric_cols] = centered_rolling_rms(values, window_size, step=decimation)
+    return result
+
+
+@profiled
+def apply_rectification(data: pd.DataFrame | Recording, method: str = "full") -> pd.DataFrame | Recording:
+    """
+    全波整流または半波整流を適用し，処理後のデータフレームを返す．
+
+    :param data: 入力データ [-]
+    :param method: 整流の方法. "full" (全波) または "half" (半波) [-]
+    :return: 整流後のデータ [-]
+    """
+    # --- 安全性チェック ---
+    if data.empty:
+        return data.copy()
+    if method not in ["full", "half"]:
+        raise ValueError("methodは 'full' または 'half' である必要があります．")
+
+    if isinstance(data, Recording):
+        if method == "full":
+            return data.with_samples(np.abs(data.samples))
+        return data.with_samples(np.clip(data.samples, 0, None))
+
+    # 数値列のみを処理対象とする
+    numeric_cols = data.select_dtypes(include=[np.number]).columns
+    if len(numeric_cols) == 0:
+        return data.copy()
+
+    result = data.copy()
+    if method == "full":
+        result[numeric_cols] = data[numeric_cols].abs()
+    elif method == "half":
+        result[numeric_cols] = data[numeric_cols].clip(lower=0)
+
+    return result
+
+
+# --- リサンプリング ---
+# "fft" はscipy.signal.resample (FFTによる周期的な補間)，"polyphase" はresample_poly (有理数比の多相フィルタ)．
+# 多相フィルタは信号長に依存せず高速で，FFT法のような端の回り込みが起きない．
+RESAMPLING_METHODS = ["fft", "polyphase"]
+RESAMPLING_MAX_DENOMINATOR = 1000
+
+
+def _resampling_ratio(original_fs: float, target_fs: float) -> tuple[int, int]:
+    """target_fs / original_fs を既約分数 up / down で近似する"""
+    ratio = Fraction(target_fs / original_fs).limit_denominator(RESAMPLING_MAX_DENOMINATOR)
+    if ratio.numerator == 0:
+        raise ValueError("目標のサンプリング周波数target_fsが元のサンプリング周波数に対して小さすぎます．")
+    return ratio.numerator, ratio.denominator
+
+
+@lru_cache(maxsize=FILTER_DESIGN_CACHE_SIZE)
+def _polyphase_taps(up: int, down: int) -> np.ndarray:
+    """resample_polyの既定と同じアンチエイリアスFIRフィルタ (カイザー窓，β=5) の係数"""
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    return _readonly(firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)))
+
+
+def _resampled_index(index: pd.Index, n_samples: int, target_fs: float) -> pd.Index:
+    """元の時間インデックスの開始時刻を保ち，間隔を 1 / target_fs にした時間インデックスを返す"""
+    offsets = np.arange(n_samples) / target_fs
+    if isinstance(index, pd.DatetimeIndex) and len(index):
+        return pd.DatetimeIndex(index[0] + pd.to_timedelta(offsets, unit="s"), name=index.name)
+    if pd.api.types.is_numeric_dtype(index) and len(index):
+        return pd.Index(float(index[0]) + offsets, name=index.name)
+    return pd.Index(offsets, name=index.name)
+
+
+@profiled
+def apply_resampling(data: pd.DataFrame | Recording, original_fs: float, target_fs: float,
+                     method: str = "fft") -> pd.DataFrame | Recording:
+    """
+    データフレームの各列を指定したサンプリング周波数でリサンプリングし，処理後のデータフレームを返す．
+    :param data: 入力データ [-]
+    :param original_fs: 元のサンプリング周波数 [Hz]
+    :param target_fs: 目標のサンプリング周波数 [Hz]
+    :param method: リサンプリングの方法. "fft" または "polyphase" [-]
+                   "polyphase" の場合，周波数比を有理数 up / down で近似して全チャンネルをまとめて処理し，
+                   時間インデックスは元の開始時刻を保ったまま新しい間隔に置き換える
+    :return: リサンプリング処理後のデータ [-]
+    """
+    # --- 安全性チェック ---
+    if method not in RESAMPLING_METHODS:
+        raise ValueError("methodは 'fft' または 'polyphase' である必要があります．")
+    if data.empty:
+        return data.copy()
+    if original_fs <= 0 or target_fs <= 0:
+        raise ValueError("サンプリング周波数は正の値である必要があります．")
+
+    if original_fs == target_fs:
+        return data.copy()
+
+    if method == "polyphase":
+        up, down = _resampling_ratio(original_fs, target_fs)
+        if isinstance(data, Recording):
+            values = data.samples.astype(np.float64)
+        else:
+            numeric_columns = data.select_dtypes(include=[np.number]).columns
+            values = data[numeric_columns].to_numpy(dtype=np.float64)
+
+        # 全チャンネルをまとめて時間方向(axis=0)に処理する．フィルタ係数は (up, down) ごとにキャッシュされる
+        resampled = resample_poly(values, up, down, axis=0, window=_polyphase_taps(up, down))
+        if isinstance(data, Recording):
+            return Recording(resampled, target_fs, t0=data.t0, channels=data.channels)
+        return pd.DataFrame(resampled, index=_resampled_index(data.index, len(resampled), target_fs),
+                            columns=numeric_columns)
+
+    # 元のサンプル数
+    original_length = len(data)
+
+    # 新しいサンプル数
+    new_length = int(original_length * target_fs / original_fs)
+
+    # サンプル数が変わらない場合はそのまま返す
+    if new_length == original_length:
+        return data.copy()
+
+    if isinstance(data, Recording):
+        resampled = resample(data.samples.astype(np.float64), new_length, axis=0)
+        return Recording(resampled, target_fs, t0=data.t0, channels=data.channels)
+
+    # 数値列のみを取得
+    numeric_columns = data.select_dtypes(include=[np.number]).columns
+
+    # 結果用のデータフレームを作成
+    result = pd.DataFrame()
+
+    # 各数値列にリサンプリングを適用
+    for col in numeric_columns:
+        resampled_signal = resample(data[col].values, new_length)
+        result[col] = resampled_signal
+
+    # 数値インデックスを再設定
+    new_time_interval = 1.0 / target_fs
+    result.index = np.arange(new_length) * new_time_interval
+
+    return result
+
+
+@profiled
+def apply_fft(data: pd.DataFrame | Recording, fs: float, return_magnitude: bool = True) -> pd.DataFrame:
+    """
+    データフレームの各列にFFTを適用し，周波数領域のデータフレームを返す．
+
+    :param data: 入力データ(時間領域) [-]
+    :param fs: サンプリング周波数 [Hz]
+    :param return_magnitude: Trueの場合振幅スペクトル，Falseの場合複素数スペクトルを返す [-]
+    :return: FFT処理後のデータ(周波数領域) [-]
+    """
+
+    # Recordingは時間領域のデータフレームに変換して処理する(結果は周波数領域のデータフレーム)
+    if isinstance(data, Recording):
+        data = data.to_frame()
+
+    # --- 安全性チェック ---
+    if data.empty:
+        return data.copy()
+    if fs <= 0:
+        raise ValueError("サンプリング周波数fsは正の値である必要があります．")
+
+    # 数値列のみを取得
+    numeric_columns = data.select_dtypes(include=[np.number]).columns
+
+    # 結果用のデータフレームを作成
+    result = pd.DataFrame()
+
+    # データ長を取得
+    n_samples= len(data)
+
+    # 周波数軸を作成(正の周波数のみ)
+    freqs = fftfreq(n_samples, 1 / fs)[:n_samples // 2]
+
+    # 各数値列にFFTを適用
+    for col in numeric_columns:
+        # FFTを実行
+        fft_values = fft(data[col].values)
+
+        # 正の周波数成分のみを取得
+        fft_positive = fft_values[:n_samples // 2]
+
+        if return_magnitude:
+            # 振幅スペクトルを計算
+            magnitude = np.abs(fft_positive)
+            magnitude[1:] *= 2 # 直流成分以外を2倍にして片側スペクトルに変換
+            result[col] = magnitude
+        else:
+            # 複素数スペクトルをそのまま返す
+            result[col] = fft_positive
+
+    # 周波数軸をインデックスに設定
+    result.index = freqs
+
+    return result
+
+
+# --- スペクトル推定 (Welch法・スペクトログラム) ---
+# 1回のrfftで全チャンネル・複数セグメントをまとめて変換する．一度に変換するセグメント数を
+# SPECTRUM_BLOCK_SEGMENTSで制限し，長い記録でもメモリ使用量が一定に収まるようにする．
+SPECTRUM_BLOCK_SEGMENTS = 512
+
+
+@lru_cache(maxsize=32)
+def _cached_window(window: str, nperseg: int) -> np.ndarray:
+    """窓関数の配列をキャッシュして返す(読み取り専用)"""
+    return _readonly(get_window(window, nperseg))
+
+
+def _segment_power(values: np.ndarray, fs: float, nperseg: int, noverlap: int, window: str):
+    """
+    セグメントごとの片側パワースペクトル密度をブロック単位で順に返すジェネレータ．
+    scipy.signal.welch / spectrogram (detrend="constant", scaling="density") と同じ正規化を行う．
+
+    :return: (先頭セグメント番号, パワー (セグメント数 × チャンネル数 × 周波数数)) を順に返す
+    """
+    win = _cached_window(window, nperseg)
+    scale = 1.0 / (fs * np.sum(win ** 2))
+    segments = sliding_window_view(values, nperseg, axis=0)[::nperseg - noverlap]
+
+    for start in range(0, len(segments), SPECTRUM_BLOCK_SEGMENTS):
+        block = segments[start:start + SPECTRUM_BLOCK_SEGMENTS]
+        # 各セグメントの平均を除去してから窓関数を掛ける
+        block = (block - block.mean(axis=-1, keepdims=True)) * win
+        spectrum = rfft(block, axis=-1, workers=-1)
+        power = np.square(spectrum.real) + np.square(spectrum.imag)
+        power *= scale
+        # 直流成分(とナイキスト周波数)以外を2倍にして片側スペクトルに変換
+        if nperseg % 2:
+            power[..., 1:] *= 2
+        else:
+            power[..., 1:-1] *= 2
+        yield start, power
+
+
+def _spectrum_params(data: pd.DataFrame, fs: float, nperseg: int, noverlap: int | None):
+    """Welch法・スペクトログラムの共通の安全性チェックとパラメータの調整"""
+    if fs <= 0:
+        raise ValueError("サンプリング周波数fsは正の値である必要があります．")
+    if not isinstance(nperseg, int) or nperseg <= 0:
+        raise ValueError("セグメント長npersegは正の整数である必要があります．")
+    # データがセグメント長より短い場合はデータ長に合わせる
+    nperseg = min(nperseg, len(data))
+    if noverlap is None:
+        noverlap = nperseg // 2
+    if not 0 <= noverlap < nperseg:
+        raise ValueError("重なり長noverlapは0以上nperseg未満である必要があります．")
+    numeric_columns = data.select_dtypes(include=[np.number]).columns
+    values = data[numeric_columns].to_numpy(dtype=np.float64)
+    return values, numeric_columns, nperseg, noverlap
+
+
+@profiled
+def apply_welch(data: pd.DataFrame | Recording, fs: float, nperseg: int = 256, noverlap: int | None = None,
+                window: str = "hann") -> pd.DataFrame:
+    """
+    Welch法でデータフレームの各列のパワースペクトル密度を推定し，周波数領域のデータフレームを返す．
+    重なりのあるセグメントのスペクトルを平均するため，apply_fftより雑音の少ないスペクトルが得られる．
+
+    :param data: 入力データ(時間領域) [-]
+    :param fs: サンプリング周波数 [Hz]
+    :param nperseg: セグメント長 [-]
+    :param noverlap: セグメントの重なり長．Noneの場合はnperseg // 2 [-]
+    :param window: 窓関数の名前 [-]
+    :return: パワースペクトル密度(周波数領域) [-^2/Hz]
+    """
+    if isinstance(data, Recording):
+        data = data.to_frame()
+
+    # --- 安全性チェック ---
+    if data.empty:
+        return data.copy()
+    values, numeric_columns, nperseg, noverlap = _spectrum_params(data, fs, nperseg, noverlap)
+
+    # セグメントごとのパワーを足し合わせて平均する
+    total = np.zeros((len(numeric_columns), nperseg // 2 + 1))
+    n_segments = 0
+    for _, power in _segment_power(values, fs, nperseg, noverlap, window):
+        total += power.sum(axis=0)
+        n_segments += len(power)
+
+    return pd.DataFrame((total / n_segments).T, index=rfftfreq(nperseg, 1 / fs), columns=numeric_columns)
+
+
+@profiled
+def apply_spectrogram(data: pd.DataFrame | Recording, fs: float, nperseg: int = 256, noverlap: int | None = None,
+                      window: str = "hann") -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    データフレームの各列のスペクトログラム(短時間フーリエ変換によるパワースペクトル密度の時間変化)を計算する．
+
+    :param data: 入力データ(時間領域) [-]
+    :param fs: サンプリング周波数 [Hz]
+    :param nperseg: セグメント長 [-]
+    :param noverlap: セグメントの重なり長．Noneの場合はnperseg // 2 [-]
+    :param window: 窓関数の名前 [-]
+    :return: (周波数 [Hz], 各セグメント中心の時刻 [s], パワースペクトル密度 (チャンネル数 × 周波数数 × セグメント数))
+    """
+    if isinstance(data, Recording):
+        data = data.to_frame()
+
+    # --- 安全性チェック ---
+    if data.empty:
+        return np.empty(0), np.empty(0), np.empty((data.shape[1], 0, 0))
+    values, numeric_columns, nperseg, noverlap = _spectrum_params(data, fs, nperseg, noverlap)
+
+    step = nperseg - noverlap
+    n_segments = (len(values) - nperseg) // step + 1
+    result = np.empty((len(numeric_columns), nperseg // 2 + 1, n_segments))
+    for start, power in _segment_power(values, fs, nperseg, noverlap, window):
+        result[:, :, start:start + len(power)] = power.transpose(1, 2, 0)
+
+    times = (np.arange(n_segments) * step + nperseg / 2) / fs
+    return rfftfreq(nperseg, 1 / fs), times, result
+
+
+class StageCache:
+    """
+    パイプラインの各ステージの出力を保持するLRUキャッシュ．
+
+    キーは (記録ID, ステージのパラメータ, 上流のキー) の連鎖になっているため，あるステージのパラメータを
+    変えても，それより上流のステージはキャッシュから返され，下流のステージだけが再計算される．
+    Pipeline.processで使う場合，hitsはキャッシュから再開した回数，missesは再計算したステージの数を数える．
+    """
+
+    def __init__(self, maxsize: int = 32):
+        """
+        :param maxsize: 保持するステージ出力の最大数 [-]
+        """
+        if not isinstance(maxsize, int) or maxsize <= 0:
+            raise ValueError("最大数maxsizeは正の整数である必要があります．")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """キーに対応するステージ出力があるか (統計とLRUの順序は変えない)"""
+        return key in self._entries
+
+    def get(self, key: Hashable) -> np.ndarray | None:
+        """キーに対応するステージ出力を返す．なければNone"""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: np.ndarray) -> None:
+        """ステージ出力を保存する．他のステージと共有されるため読み取り専用にする"""
+        value.setflags(write=False)
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """保持しているステージ出力と統計を消去する"""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# --- 演算精度 ---
+# "float32" の場合，パイプラインはfloat32の配列で処理し，中間結果とキャッシュのメモリを半分にする．
+# 移動平均・RMSの累積和はfloat64で計算する．極が単位円に近いIIRフィルタ(低いカットオフのハイパスなど)は
+# float32では係数の丸めで特性が変わるため，FLOAT32_MAX_POLE_RADIUSを超える場合はそのカスケードだけfloat64で処理する．
+PROCESSING_DTYPES = ["float64", "float32"]
+FLOAT32_MAX_POLE_RADIUS = 0.999
+
+
+# 1つのSOSカスケードに結合されるIIRフィルタのステージ
+IIR_STAGES = ("lowpass", "highpass", "notch")
+
+
+class FusedStage(NamedTuple):
+    """Pipeline.fused_stagesが返す実行単位"""
+    name: str     # "sos" (結合したIIRカスケード) または元のステージ名
+    params: dict  # "sos" の場合は {"sos": 係数, "zi": 初期状態}，それ以外は元のステージのパラメータ
+    key: tuple    # 含まれるステージの (名前, パラメータ) のタプル (ステージキャッシュのキーに使う)
+
+
+def _float32_safe(sos: np.ndarray) -> bool:
+    """SOSカスケードの全ての極の絶対値がFLOAT32_MAX_POLE_RADIUS以下か"""
+    radii = [np.abs(np.roots(section[3:])) for section in sos]
+    return max((r.max() for r in radii if r.size), default=0.0) <= FLOAT32_MAX_POLE_RADIUS
+
+
+class Pipeline:
+    """
+    複数の信号処理ステージを一度だけコンパイルし，まとめて実行するパイプライン．
+
+    連続するIIRフィルタ(ローパス・ハイパス・ノッチ)は1つのSOSカスケードに結合され，
+    全チャンネルを1つの連続した配列 (サンプル数 × チャンネル数，型はdtype) として axis=0 方向に処理する．
+    ステージ間で中間データフレームは作らない．
+    結合したカスケードはまとめて1回だけ両端をパディングするため，関数を1つずつ適用した場合とは
+    信号の両端付近の過渡応答がわずかに異なる．
+
+    使用例:
+        pipeline = Pipeline(fs=200).add_lowpass(5.0).add_notch(50.0).add_rms_envelope(40)
+        processed = pipeline.run(raw_data)
+    """
+
+    def __init__(self, fs: float, dtype: str = "float64"):
+        """
+        :param fs: サンプリング周波数 [Hz]
+        :param dtype: 演算精度. "float64" または "float32" [-]
+        """
+        if fs <= 0:
+            raise ValueError("サンプリング周波数fsは正の値である必要があります．")
+        if dtype not in PROCESSING_DTYPES:
+            raise ValueError("dtypeは 'float64' または 'float32' である必要があります．")
+        self.fs = fs
+        self.dtype = dtype
+        self._stages: list[tuple[str, dict]] = []
+        self._compiled = None
+        self._compiled_keys = None
+
+    def __len__(self) -> int:
+        return len(self._stages)
+
+    def __getstate__(self) -> dict:
+        # コンパイル済みの処理(ラムダ関数)はpickleできないため，ステージ定義だけを渡す
+        state = self.__dict__.copy()
+        state["_compiled"] = None
+        state["_compiled_keys"] = None
+        return state
+
+    @property
+    def stages(self) -> list[tuple[str, dict]]:
+        """追加されたステージの (名前, パラメータ) のリスト"""
+        return list(self._stages)
+
+    def with_dtype(self, dtype: str) -> "Pipeline":
+        """
+        同じステージを持ち，演算精度だけが異なるパイプラインを返す．
+
+        :param dtype: 演算精度. "float64" または "float32" [-]
+        """
+        pipeline = Pipeline(self.fs, dtype=dtype)
+        pipeline._stages = list(self._stages)
+        return pipeline
+
+    def _add(self, name: str, **params) -> "Pipeline":
+        self._stages.append((name, params))
+        self._compiled = None
+        return self
+
+    def add_lowpass(self, cutoff: float, order: int = 4) -> "Pipeline":
+        """
+        ローパスフィルタのステージを追加する．
+
+        :param cutoff: カットオフ周波数 [Hz]
+        :param order: フィルタの次数 [-]
+        """
+        if not 0 < cutoff < self.fs / 2:
+            raise ValueError("カットオフ周波数cutoffは0とナイキスト周波数(fs/2)の間である必要があります．")
+        if not isinstance(order, int) or order <= 0:
+            raise ValueError("フィルタの次数orderは正の整数である必要があります．")
+        return self._add("lowpass", cutoff=cutoff, order=order)
+
+    def add_highpass(self, cutoff: float, order: int = 4) -> "Pipeline":
+        """
+        ハイパスフィルタのステージを追加する．
+
+        :param cutoff: カットオフ周波数 [Hz]
+        :param order: フィルタの次数 [-]
+        """
+        if not 0 < cutoff < self.fs / 2:
+            raise ValueError("カットオフ周波数cutoffは0とナイキスト周波数(fs/2)の間である必要があります．")
+        if not isinstance(order, int) or order <= 0:
+            raise ValueError("フィルタの次数orderは正の整数である必要があります．")
+        return self._add("highpass", cutoff=cutoff, order=order)
+
+    def add_notch(self, notch_freq: float = 50.0, quality: float = 30) -> "Pipeline":
+        """
+        ノッチフィルタのステージを追加する．
+
+        :param notch_freq: 除去したい周波数 [Hz]
+        :param quality: Q値の鋭さ
+        """
+        if not 0 < notch_freq < self.fs / 2:
+            raise ValueError("除去したい周波数notch_freqは0とナイキスト周波数(fs/2)の間である必要があります．")
+        if quality <= 0:
+            raise ValueError("Q値qualityは正の値である必要があります．")
+        return self._add("notch", notch_freq=notch_freq, quality=quality)
+
+    def add_moving_average(self, window_size: int) -> "Pipeline":
+        """
+        移動平均のステージを追加する．
+
+        :param window_size: 移動平均のウィンドウサイズ [-]
+        """
+        if not isinstance(window_size, int) or window_size <= 0:
+            raise ValueError("ウィンドウサイズwindow_sizeは正の整数である必要があります．")
+        return self._add("moving_average", window_size=window_size)
+
+    def add_rectification(self, method: str = "full") -> "Pipeline":
+        """
+        整流のステージを追加する．
+
+        :param method: 整流の方法. "full" (全波) または "half" (半波) [-]
+        """
+        if method not in ["full", "half"]:
+            raise ValueError("methodは 'full' または 'half' である必要があります．")
+        return self._add("rectification", method=method)
+
+    def add_rms_envelope(self, window_size: int) -> "Pipeline":
+        """
+        RMSエンベロープのステージを追加する．
+
+        :param window_size: 移動RMSのウィンドウサイズ [-]
+        """
+        if not isinstance(window_size, int) or window_size <= 0:
+            raise ValueError("ウィンドウサイズwindow_sizeは正の整数である必要があります．")
+        return self._add("rms_envelope", window_size=window_size)
+
+    def _design(self, name: str, params: dict) -> FilterDesign:
+        """IIRステージのフィルタを設計する(キャッシュ済み)"""
+        if name == "lowpass":
+            return design_filter("low", params["cutoff"], self.fs, order=params["order"])
+        if name == "highpass":
+            return design_filter("high", params["cutoff"], self.fs, order=params["order"])
+        return design_filter("notch", params["notch_freq"], self.fs, quality=params["quality"])
+
+    def fused_stages(self) -> list[FusedStage]:
+        """
+        ステージ列を実行単位に分ける．連続するIIRステージ(IIR_STAGES)は1つのSOSカスケードに結合される．
+        compile・StreamingProcessor・chunked.pipeline_overlapはこの分け方を共有するため，
+        新しい種類のステージはここと各処理の分岐に追加する．
+
+        :return: 実行単位のリスト
+        """
+        fused = []
+        pending_iir = []
+        pending_keys = []
+
+        def flush_sos():
+            if not pending_iir:
+                return
+            if len(pending_iir) == 1:
+                sos, zi = pending_iir[0].sos, pending_iir[0].zi
+            else:
+                sos = np.vstack([design.sos for design in pending_iir])
+                zi = sosfilt_zi(sos)
+            fused.append(FusedStage("sos", {"sos": sos, "zi": zi}, tuple(pending_keys)))
+            pending_iir.clear()
+            pending_keys.clear()
+
+        for name, params in self._stages:
+            stage_key = (name, tuple(sorted(params.items())))
+            if name in IIR_STAGES:
+                pending_iir.append(self._design(name, params))
+                pending_keys.append(stage_key)
+                continue
+            flush_sos()
+            fused.append(FusedStage(name, dict(params), (stage_key,)))
+        flush_sos()
+        return fused
+
+    def compile(self) -> list:
+        """
+        ステージ列を実行可能な処理のリストにコンパイルする．
+        連続するIIRステージは1つのSOSカスケードに結合される (fused_stagesを参照)．
+
+        :return: 配列を受け取り配列を返す関数のリスト
+        """
+        if self._compiled is not None:
+            return self._compiled
+
+        ops = []
+        keys = []
+        for stage in self.fused_stages():
+            params = stage.params
+            if stage.name == "sos":
+                sos, zi = params["sos"], params["zi"]
+                if self.dtype == "float32" and not _float32_safe(sos):
+                    ops.append(lambda x, sos=sos, zi=zi:
+                               _sosfiltfilt(sos, zi, x.astype(np.float64)).astype(np.float32))
+                else:
+                    ops.append(lambda x, sos=sos, zi=zi: _sosfiltfilt(sos, zi, x))
+            elif stage.name == "moving_average":
+                ops.append(lambda x, w=params["window_size"]: centered_rolling_mean(x, w))
+            elif stage.name == "rectification":
+                if params["method"] == "full":
+                    ops.append(np.abs)
+                else:
+                    ops.append(lambda x: np.clip(x, 0, None))
+            elif stage.name == "rms_envelope":
+                ops.append(lambda x, w=params["window_size"]: centered_rolling_rms(x, w))
+            else:
+                raise ValueError(f"未対応のステージ {stage.name} です．")
+            keys.append(stage.key)
+
+        self._compiled = ops
+        self._compiled_keys = keys
+        return ops
+
+    def process(self, values: np.ndarray, cache: StageCache | None = None,
+                recording_id: Hashable | None = None) -> np.ndarray:
+        """
+        配列 (サンプル数 × チャンネル数) にパイプラインを適用する．
+        cacheとrecording_idを指定すると，ステージごとの出力をキャッシュし，変更のないステージを再計算しない．
+
+        :param values: 入力配列 [-]
+        :param cache: ステージ出力のキャッシュ
+        :param recording_id: 入力データを一意に識別するID (ファイルパスなど)．cacheを使う場合は必須
+        :return: 処理後の配列 (型はdtype)．キャッシュを使った場合は読み取り専用 [-]
+        """
+        if cache is not None and recording_id is None:
+            raise ValueError("cacheを使う場合はrecording_idを指定する必要があります．")
+
+        ops = self.compile()
+        if cache is None:
+            x = np.ascontiguousarray(values, dtype=self.dtype)
+            for op in ops:
+                x = op(x)
+            return x
+
+        # 上流から順にキーを連鎖させ，最も下流のキャッシュ済みステージから再開する
+        chain = [(recording_id, self.fs, self.dtype)]
+        for op_key in self._compiled_keys:
+            chain.append((chain[-1], op_key))
+
+        # 探索は統計を数えずに行い，再開したステージを1回のヒット，再計算したステージをそれぞれ1回のミスと数える
+        start = next((i for i in range(len(ops), 0, -1) if chain[i] in cache), 0)
+        if start > 0:
+            x = cache.get(chain[start])
+        else:
+            x = np.ascontiguousarray(values, dtype=self.dtype)
+        cache.misses += len(ops) - start
+
+        for i in range(start, len(ops)):
+            x = ops[i](x)
+            cache.put(chain[i + 1], x)
+        return x
+
+    @profiled
+    def run(self, data: pd.DataFrame | Recording, cache: StageCache | None = None,
+            recording_id: Hashable | None = None) -> pd.DataFrame | Recording:
+        """
+        データフレームの数値列(またはRecordingのサンプル配列)にパイプラインを適用し，処理後のデータを返す．
+
+        :param data: 入力データ [-]
+        :param cache: ステージ出力のキャッシュ (Pipeline.processを参照)
+        :param recording_id: 入力データを一意に識別するID
+        :return: 処理後のデータ (入力と同じ型) [-]
+        """
+        if data.empty:
+            return data.copy()
+
+        if isinstance(data, Recording):
+            # キャッシュ内の配列は読み取り専用だが，Recordingはそのまま共有する
+            return data.with_samples(self.process(data.samples, cache=cache, recording_id=recording_id))
+
+        numeric_cols = data.select_dtypes(include=[np.number]).columns
+        if len(numeric_cols) == 0 or len(self._stages) == 0:
+            return data.copy()
+
+        processed = self.process(data[numeric_cols].to_numpy(dtype=self.dtype), cache=cache,
+                                 recording_id=recording_id)
+        if not processed.flags.writeable:
+            # キャッシュ内の配列を書き換えられないよう複製する
+            processed = processed.copy()
+
+        if len(numeric_cols) == data.shape[1]:
+            # 作り直したデータフレームにも推定したサンプリング周波数などのattrsを引き継ぐ
+            result = pd.DataFrame(processed, index=data.index, columns=data.columns)
+            result.attrs = dict(data.attrs)
+            return result
+
+        result = data.copy()
+        result[numeric_cols] = processed
+        return result
+
+
+def precision_report(pipeline: Pipeline, values: np.ndarray | pd.DataFrame) -> pd.DataFrame:
+    """
+    パイプラインをfloat64で処理した結果を基準として，pipeline.dtypeで処理した結果との差をチャンネルごとに求める．
+
+    :param pipeline: 評価するパイプライン
+    :param values: 入力データ (サンプル数 × チャンネル数) [-]
+    :return: 列 max_abs_deviation (最大絶対誤差)，max_rel_deviation (基準の最大絶対値に対する比)，
+             reference_peak (基準の最大絶対値) を持つデータフレーム (行はチャンネル)
+    """
+    channels = None
+    if isinstance(values, pd.DataFrame):
+        numeric = values.select_dtypes(include=[np.number])
+        channels = [str(c) for c in numeric.columns]
+        values = numeric.to_numpy()
+
+    reference = pipeline.with_dtype("float64").process(values)
+    result = pipeline.process(values).astype(np.float64)
+    deviation = np.abs(result - reference).max(axis=0)
+    peak = np.abs(reference).max(axis=0)
+    return pd.DataFrame({
+        "max_abs_deviation": deviation,
+        "max_rel_deviation": deviation / np.where(peak > 0, peak, 1.0),
+        "reference_peak": peak,
+    }, index=channels)
@@ -0,0 +1,184 @@
+import numpy as np
+from scipy.signal import sosfilt
+
+from .signal_processing import Pipeline
+
+"""
+このファイルにはリアルタイム(ストリーミング)処理のプログラムを書きます．
+signal_processing.py の関数はゼロ位相の filtfilt を使うため，記録全体が揃っていないと処理できません．
+ここではチャンク(任意の長さのサンプル列)を受け取るたびに，フィルタの内部状態や移動窓を引き継ぎながら
+因果的に処理するストリーミングプロセッサを実装します．
+"""
+
+
+class _RingBuffer:
+    """
+    直近capacityサンプル分を保持する固定長のリングバッファ．
+    """
+
+    def __init__(self, capacity: int, n_channels: int):
+        self.capacity = capacity
+        self._storage = np.zeros((capacity, n_channels), dtype=np.float64)
+        self._pos = 0  # 次に書き込む位置(=最も古いサンプルの位置)
+
+    def oldest(self, n: int) -> np.ndarray:
+        """古い順にn個(n <= capacity)のサンプルを返す．未書き込みの位置は0．"""
+        idx = (self._pos + np.arange(n)) % self.capacity
+        return self._storage[idx]
+
+    def extend(self, values: np.ndarray) -> None:
+        """サンプル列を追記する．容量を超えた分は古いものから上書きされる．"""
+        values = values[-self.capacity:]
+        idx = (self._pos + np.arange(len(values))) % self.capacity
+        self._storage[idx] = values
+        self._pos = (self._pos + len(values)) % self.capacity
+
+    def clear(self) -> None:
+        self._storage.fill(0.0)
+        self._pos = 0
+
+
+class _CausalRollingMean:
+    """
+    末尾側の窓(過去window_sizeサンプル)による因果的な移動平均．min_periods=1相当．
+
+    窓内の和は逐次加算で更新する．チャンク内はnp.cumsum(逐次加算)で計算し，前回までの和を先頭に
+    連結してから累積するため，チャンクの分け方によらずビット単位で同じ結果になる．
+    """
+
+    def __init__(self, window_size: int, n_channels: int):
+        self.window_size = window_size
+        self._buffer = _RingBuffer(window_size, n_channels)
+        self._sum = np.zeros(n_channels, dtype=np.float64)
+        self._n_seen = 0
+
+    def process(self, values: np.ndarray) -> np.ndarray:
+        n = len(values)
+        w = self.window_size
+
+        # 窓から外れる値 (時刻 t - w のサンプル)．最初の窓が埋まるまでは0
+        outgoing = np.empty_like(values)
+        n_from_buffer = min(n, w)
+        outgoing[:n_from_buffer] = self._buffer.oldest(n_from_buffer)
+        outgoing[n_from_buffer:] = values[:n - n_from_buffer]
+
+        increments = np.empty((n + 1, values.shape[1]), dtype=np.float64)
+        increments[0] = self._sum
+        np.subtract(values, outgoing, out=increments[1:])
+        sums = np.cumsum(increments, axis=0)[1:]
+
+        counts = np.minimum(self._n_seen + np.arange(1, n + 1), w)[:, np.newaxis]
+
+        self._sum = sums[-1].copy()
+        self._n_seen += n
+        self._buffer.extend(values)
+        return sums / counts
+
+    def reset(self) -> None:
+        self._buffer.clear()
+        self._sum.fill(0.0)
+        self._n_seen = 0
+
+
+class _CausalRollingRms(_CausalRollingMean):
+    """
+    末尾側の窓による因果的な移動RMS．二乗値の移動平均の平方根として計算する．
+    """
+
+    def process(self, values: np.ndarray) -> np.ndarray:
+        mean_square = super().process(np.square(values))
+        # 逐次加減算の丸め誤差で僅かに負になる場合があるため0で下限を切る
+        np.maximum(mean_square, 0, out=mean_square)
+        return np.sqrt(mean_square)
+
+
+class _CausalSosFilter:
+    """
+    状態を引き継ぐ因果的なIIRフィルタ(SOSカスケード)．
+    最初のチャンクの先頭サンプルで定常状態に初期化し，立ち上がりの過渡応答を抑える．
+    """
+
+    def __init__(self, sos: np.ndarray, zi: np.ndarray):
+        # sosfiltは書き込み可能な係数配列を要求するため複製して保持する
+        self._sos = np.array(sos)
+        self._zi_unit = np.asarray(zi)[:, :, np.newaxis]
+        self._state = None
+
+    def process(self, values: np.ndarray) -> np.ndarray:
+        if self._state is None:
+            self._state = self._zi_unit * values[0]
+        y, self._state = sosfilt(self._sos, values, axis=0, zi=self._state)
+        return y
+
+    def reset(self) -> None:
+        self._state = None
+
+
+class StreamingProcessor:
+    """
+    Pipelineと同じステージ構成を，チャンク単位で因果的に処理するストリーミングプロセッサ．
+
+    IIRフィルタはsosfiltの内部状態を，移動平均・RMSエンベロープはリングバッファ上の窓を
+    呼び出し間で引き継ぐ．1つの大きなブロックで処理しても，小さなチャンクに分けて処理しても
+    出力はビット単位で一致する．
+    移動平均・RMSエンベロープは中心化窓ではなく過去window_sizeサンプルの窓で計算するため，
+    オフライン処理(Pipeline.run)の結果とは位相が異なる．
+
+    使用例:
+        pipeline = Pipeline(fs=200).add_highpass(5.0).add_notch(50.0).add_rms_envelope(40)
+        processor = StreamingProcessor(pipeline, n_channels=8)
+        for chunk in chunks:
+            envelope = processor.process(chunk)
+    """
+
+    def __init__(self, pipeline: Pipeline, n_channels: int):
+        """
+        :param pipeline: 処理内容を定義したパイプライン
+        :param n_channels: チャンネル数 [-]
+        """
+        if not isinstance(n_channels, int) or n_channels <= 0:
+            raise ValueError("チャンネル数n_channelsは正の整数である必要があります．")
+        self.fs = pipeline.fs
+        self.n_channels = n_channels
+        self._ops = self._build(pipeline)
+
+    def _build(self, pipeline: Pipeline) -> list:
+        # Pipeline.compileと同じ実行単位 (結合したIIRカスケードなど) を因果的な処理に置き換える
+        ops = []
+        for stage in pipeline.fused_stages():
+            params = stage.params
+            if stage.name == "sos":
+                ops.append(_CausalSosFilter(params["sos"], params["zi"]))
+            elif stage.name == "moving_average":
+                ops.append(_CausalRollingMean(params["window_size"], self.n_channels))
+            elif stage.name == "rectification":
+                ops.append(np.abs if params["method"] == "full" else (lambda x: np.clip(x, 0, None)))
+            elif stage.name == "rms_envelope":
+                ops.append(_CausalRollingRms(params["window_size"], self.n_channels))
+            else:
+                raise ValueError(f"未対応のステージ {stage.name} です．")
+        return ops
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """
+        チャンクを処理し，同じ長さの出力を返す．
+
+        :param chunk: 入力チャンク (サンプル数 × チャンネル数) [-]
+        :return: 処理後のチャンク (float64) [-]
+        """
+        x = np.ascontiguousarray(chunk, dtype=np.float64)
+        if x.ndim != 2 or x.shape[1] != self.n_channels:
+            raise ValueError(f"チャンクの形状は (サンプル数, {self.n_channels}) である必要があります．")
+        if len(x) == 0:
+            return x.copy()
+
+        for op in self._ops:
+            x = op.process(x) if hasattr(op, "process") else op(x)
+        return x
+
+    def reset(self) -> None:
+        """フィルタの状態と移動窓を初期化する．"""
+        for op in self._ops:
+            if hasattr(op, "reset"):
+                op.reset()
+
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import time
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
+from sklearn.metrics import accuracy_score, confusion_matrix
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from .data_loader import build_corpus_index, file_signature, read_frame
+from .features import FEATURE_NAMES, extract_features
+from .signal_processing import Pipeline
+
+"""
+このファイルにはジェスチャ分類器の学習と評価のプログラムを書きます．
+各記録に前処理(Pipeline)をかけてウィンドウごとの特徴量を求め，記録ごとにディスクへキャッシュします．
+評価は被験者を1人ずつテストに回す Leave-One-Subject-Out (LOSO) 交差検証で，15個のfoldを並列に実行します．
+分類器だけを変えて再実行する場合は，キャッシュした特徴量を読み込むだけで前処理はやり直しません．
+
+使い方 (notebooksディレクトリで実行):
+    python -m modules.training --data-dir ../data/15Subjects-7Gestures
+"""
+
+FEATURE_CACHE_DIRNAME = ".feature_cache"
+LABEL_COLUMNS = ["subject", "gesture", "gesture_class", "start"]
+
+
+class LosoResult(NamedTuple):
+    """LOSO交差検証の結果"""
+    accuracy: float              # 全foldの予測をまとめた正解率 [-]
+    folds: pd.DataFrame          # foldごとの結果 (列: subject, accuracy, n_train, n_test, fit_seconds,
+                                 #                   predict_seconds, wall_seconds)
+    confusion: pd.DataFrame      # 全foldを合計した混同行列 (行: 正解, 列: 予測)
+    fold_confusions: dict        # 被験者番号 → そのfoldの混同行列
+
+
+def default_preprocessing(fs: float) -> Pipeline:
+    """特徴量抽出の前に適用する既定の前処理 (20 Hz ハイパスと 50 Hz ノッチ)"""
+    return Pipeline(fs).add_highpass(20.0).add_notch(50.0)
+
+
+def default_classifier():
+    """既定の分類器 (標準化 + 線形判別分析)"""
+    return make_pipeline(StandardScaler(), LinearDiscriminantAnalysis())
+
+
+def _feature_config(pipeline: Pipeline, fs: float, window_size: int, step: int, features: list[str],
+                    threshold: float) -> dict:
+    """特徴量のキャッシュを区別する設定 (これが変わると別のキャッシュになる)"""
+    return {
+        "fs": fs,
+        "preprocessing": [[name, sorted(params.items())] for name, params in pipeline.stages],
+        "dtype": pipeline.dtype,
+        "window_size": window_size,
+        "step": step,
+        "features": list(features),
+        "threshold": threshold,
+    }
+
+
+def _recording_features(path: str, cache_path: str, pipeline: Pipeline, fs: float, window_size: int, step: int,
+                        features: list[str], threshold: float) -> np.ndarray:
+    """1つの記録の特徴量を返す．元のCSVより新しいキャッシュがあればそれを読み込む"""
+    signature = np.array(list(file_signature(path).values()), dtype=np.int64)
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if np.array_equal(cached["signature"], signature):
+                return cached["features"]
+
+    values = read_frame(path).select_dtypes(include=[np.number]).to_numpy()
+    matrix = extract_features(pipeline.process(values), fs, window_size, step, features=features,
+                              threshold=threshold)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    np.savez(cache_path, features=matrix, signature=signature)
+    return matrix
+
+
+def build_feature_table(data_dir: str = "data/15Subjects-7Gestures", fs: float = 200.0, window_size: int = 40,
+                        step: int = 20, pipeline: Pipeline | None = None, features: list[str] | None = None,
+                        threshold: float = 0.0, cache_dir: str | None = None,
+                        n_jobs: int = -1) -> tuple[np.ndarray, pd.DataFrame]:
+    """
+    データセットの全記録について，前処理をかけてウィンドウごとの特徴量を求める．
+    記録ごとの特徴量は設定ごとのディレクトリにキャッシュされ，2回目以降は読み込むだけになる．
+
+    :param data_dir: データセットのルートディレクトリ
+    :param fs: サンプリング周波数 [Hz]
+    :param window_size: 特徴量のウィンドウサイズ [-]
+    :param step: ウィンドウをずらす間隔 [-]
+    :param pipeline: 前処理のパイプライン．Noneの場合はdefault_preprocessing
+    :param features: 計算する特徴量名のリスト．Noneの場合はFEATURE_NAMES
+    :param threshold: ゼロ交差数・傾き符号変化数のしきい値 [-]
+    :param cache_dir: キャッシュの保存先．省略時は data_dir/.feature_cache
+    :param n_jobs: 並列に処理する記録の数 (joblibの指定と同じ．-1で全コア)
+    :return: (特徴量行列 float32, 各ウィンドウのラベル (列: subject, gesture, gesture_class, start))
+    """
+    pipeline = default_preprocessing(fs) if pipeline is None else pipeline
+    features = FEATURE_NAMES if features is None else list(features)
+    cache_dir = os.path.join(data_dir, FEATURE_CACHE_DIRNAME) if cache_dir is None else cache_dir
+
+    # 設定のハッシュをディレクトリ名にし，設定を変えた場合は別のキャッシュを使う
+    config = _feature_config(pipeline, fs, window_size, step, features, threshold)
+    config_json = json.dumps(config, sort_keys=True, default=str)
+    config_dir = os.path.join(cache_dir, hashlib.sha1(config_json.encode("utf-8")).hexdigest()[:12])
+    os.makedirs(config_dir, exist_ok=True)
+    with open(os.path.join(config_dir, "config.json"), "w", encoding="utf-8") as f:
+        f.write(config_json)
+
+    index = build_corpus_index(data_dir)
+    cache_paths = [
+        os.path.join(config_dir, os.path.relpath(path, data_dir).replace(os.sep, "/")[:-len(".csv")] + ".npz")
+        for path in index["path"]
+    ]
+    matrices = Parallel(n_jobs=n_jobs)(
+        delayed(_recording_features)(path, cache_path, pipeline, fs, window_size, step, features, threshold)
+        for path, cache_path in zip(index["path"], cache_paths)
+    )
+
+    labels = [
+        pd.DataFrame({
+            "subject": row.subject,
+            "gesture": row.gesture,
+            "gesture_class": row.gesture_class,
+            "start": np.arange(len(matrix)) * step,
+        })
+        for row, matrix in zip(index.itertuples(index=False), matrices)
+    ]
+    if not matrices:
+        return np.empty((0, 0), dtype=np.float32), pd.DataFrame(columns=LABEL_COLUMNS)
+    return np.vstack(matrices), pd.concat(labels, ignore_index=True)
+
+
+def _run_fold(classifier, X: np.ndarray, y: np.ndarray, test_mask: np.ndarray) -> dict:
+    """1つのfoldを学習・評価する"""
+    t0 = time.perf_counter()
+    model = clone(classifier)
+    model.fit(X[~test_mask], y[~test_mask])
+    t1 = time.perf_counter()
+    predicted = model.predict(X[test_mask])
+    t2 = time.perf_counter()
+    return {
+        "predicted": predicted,
+        "fit_seconds": t1 - t0,
+        "predict_seconds": t2 - t1,
+        "wall_seconds": t2 - t0,
+    }
+
+
+def evaluate_loso(X: np.ndarray, labels: pd.DataFrame, classifier=None, target: str = "gesture_class",
+                  n_jobs: int = -1) -> LosoResult:
+    """
+    被験者を1人ずつテストに回すLOSO交差検証で分類器を評価する．foldは並列に実行される．
+
+    :param X: 特徴量行列 (ウィンドウ数 × 特徴量数)
+    :param labels: build_feature_tableが返すラベル
+    :param classifier: scikit-learnの分類器 (foldごとにcloneされる)．Noneの場合はdefault_classifier
+    :param target: 予測するラベルの列. "gesture_class" (7クラス) または "gesture" [-]
+    :param n_jobs: 並列に実行するfoldの数 (joblibの指定と同じ．-1で全コア)
+    :return: 正解率・foldごとの結果・混同行列
+    """
+    if target not in ["gesture_class", "gesture"]:
+        raise ValueError("targetは 'gesture_class' または 'gesture' である必要があります．")
+    if len(X) != len(labels):
+        raise ValueError("特徴量行列Xとラベルlabelsの行数が一致する必要があります．")
+
+    classifier = default_classifier() if classifier is None else classifier
+    y = labels[target].to_numpy()
+    subjects = labels["subject"].to_numpy()
+    classes = np.unique(y)
+    fold_subjects = np.unique(subjects)
+
+    outcomes = Parallel(n_jobs=n_jobs)(
+        delayed(_run_fold)(classifier, X, y, subjects == subject) for subject in fold_subjects
+    )
+
+    rows = []
+    fold_confusions = {}
+    predicted_all = np.empty(len(y), dtype=y.dtype)
+    for subject, outcome in zip(fold_subjects, outcomes):
+        test_mask = subjects == subject
+        predicted_all[test_mask] = outcome["predicted"]
+        fold_confusions[subject] = pd.DataFrame(
+            confusion_matrix(y[test_mask], outcome["predicted"], labels=classes), index=classes, columns=classes)
+        rows.append({
+            "subject": subject,
+            "accuracy": accuracy_score(y[test_mask], outcome["predicted"]),
+            "n_train": int((~test_mask).sum()),
+            "n_test": int(test_mask.sum()),
+            "fit_seconds": outcome["fit_seconds"],
+            "predict_seconds": outcome["predict_seconds"],
+            "wall_seconds": outcome["wall_seconds"],
+        })
+
+    confusion = pd.DataFrame(confusion_matrix(y, predicted_all, labels=classes), index=classes, columns=classes)
+    return LosoResult(accuracy=float(accuracy_score(y, predicted_all)), folds=pd.DataFrame(rows),
+                      confusion=confusion, fold_confusions=fold_confusions)
+
+
+def run_loso(data_dir: str = "data/15Subjects-7Gestures", fs: float = 200.0, classifier=None,
+             target: str = "gesture_class", window_size: int = 40, step: int = 20, pipeline: Pipeline | None = None,
+             features: list[str] | None = None, threshold: float = 0.0, cache_dir: str | None = None,
+             n_jobs: int = -1) -> LosoResult:
+    """
+    特徴量の作成(キャッシュ済みなら読み込み)からLOSO評価までをまとめて実行する．
+    引数はbuild_feature_tableとevaluate_losoを参照．
+    """
+    X, labels = build_feature_table(data_dir, fs=fs, window_size=window_size, step=step, pipeline=pipeline,
+                                    features=features, threshold=threshold, cache_dir=cache_dir, n_jobs=n_jobs)
+    return evaluate_loso(X, labels, classifier=classifier, target=target, n_jobs=n_jobs)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="LOSO交差検証によるジェスチャ分類の評価")
+    parser.add_argument("--data-dir", default="../data/15Subjects-7Gestures")
+    parser.add_argument("--target", default="gesture_class", choices=["gesture_class", "gesture"])
+    parser.add_argument("--window-size", type=int, default=40)
+    parser.add_argument("--step", type=int, default=20)
+    parser.add_argument("--threshold", type=float, default=0.0, help="ゼロ交差数・傾き符号変化数のしきい値")
+    parser.add_argument("--cache-dir", default=None, help="特徴量キャッシュの保存先 (省略時は data_dir/.feature_cache)")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    result = run_loso(args.data_dir, target=args.target, window_size=args.window_size, step=args.step,
+                      threshold=args.threshold, cache_dir=args.cache_dir, n_jobs=args.n_jobs)
+    print(result.folds.to_string(index=False))
+    print(result.confusion.to_string())
+    print(f"✅ LOSO正解率: {result.accuracy:.3f} (合計 {time.perf_counter() - t0:.1f} 秒)")